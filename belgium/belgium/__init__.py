@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the modules shared by all countries, in standardbred next to the projects
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -6,11 +6,12 @@ from scrapy_splash import SplashRequest
 from base64 import b64decode
 
 from belgium.items import HorseItem, handle_racetime, handle_startmethod
+from standardbred.itemfactory import FastLoader
+from standardbred.frontier import Frontier
+from standardbred.splashwait import lua_script
 
 import json
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/belgium'
 BASE_URL = 'https://www.trotting.be/horses/Overview/?horseId={}'
 
 
@@ -18,7 +19,7 @@ def create_horse(horse_json, offspring_list=None):
     if horse_json['HorseId'] is None:
         return None
 
-    horse = ItemLoader(item=HorseItem())
+    horse = FastLoader(HorseItem)
 
     horse.add_value('name', horse_json['Name'])
     horse.add_value('link', str(horse_json['HorseId']))
@@ -62,33 +63,43 @@ class HorseCollector(Spider):
     def __init__(self, start_id, *args, **kwargs):
         super(HorseCollector, self).__init__(*args, **kwargs)
         self.start_id = start_id
-        self.lua_source = """
+        self.lua_source = lua_script("""
                           function main(splash, args)
                             splash.response_body_enabled = true
                             splash.private_mode_enabled = false
+                            track_requests(splash)
                             assert(splash:go(args.url))
-                            assert(splash:wait(3))
+                            wait_for_selector(splash, 'ul.nav-tabs li.active')
+                            wait_for_idle(splash)
                             local nextTab = splash:select('ul.nav-tabs li.active+li')
                             while nextTab do
                                 nextTab:mouse_click()
-                                assert(splash:wait(3))
+                                -- the tab is active when it has been clicked, its
+                                -- content is loaded when the requests have finished
+                                wait_for_class(splash, nextTab, 'active')
+                                wait_for_idle(splash)
                                 nextTab = splash:select('ul.nav-tabs li.active+li')
                             end
                             return splash:har()
                           end
-                          """
+                          """)
 
 
     def start_requests(self):
-        yield SplashRequest(
-                    url=BASE_URL.format(self.start_id),
-                    callback=self.parse,
-                    endpoint='execute',
-                    args={'lua_source': self.lua_source}
-        )
+        self.frontier = Frontier.from_crawler(self.crawler, self.start_id)
 
+        for horse_id in self.frontier.start(self.start_id):
+            yield SplashRequest(
+                        url=BASE_URL.format(horse_id),
+                        callback=self.parse,
+                        endpoint='execute',
+                        args={'lua_source': self.lua_source},
+                        cb_kwargs=dict(horse_id=horse_id),
+                        priority=self.frontier.priority(horse_id)
+            )
 
-    def parse(self, response):
+
+    def parse(self, response, horse_id):
         horse = ItemLoader(item=HorseItem())
 
         for entry in response.data['log']['entries']:
@@ -115,7 +126,7 @@ class HorseCollector(Spider):
                 horse_json = json.loads(b64decode(entry['response']['content']['text']))
 
                 for offspring_json in horse_json['BirthDeclarations']:
-                    offspring = ItemLoader(item=HorseItem())
+                    offspring = FastLoader(HorseItem)
 
                     offspring.add_value('link', str(offspring_json['FoalHorse']['HorseId']))
                     offspring.add_value('name', offspring_json['FoalHorse']['Name'])
@@ -125,7 +136,7 @@ class HorseCollector(Spider):
                     offspring.add_value('birthdate', offspring_json['FoalHorse']['DateOfBirth'])
                     offspring.add_value('breed', offspring_json['FoalHorse']['TypeText'])
 
-                    parent = ItemLoader(item=HorseItem())
+                    parent = FastLoader(HorseItem)
 
                     parent.add_value('link', str(offspring_json['PartnerHorse']['HorseId']))
                     parent.add_value('name', offspring_json['PartnerHorse']['Name'])
@@ -137,15 +148,17 @@ class HorseCollector(Spider):
                     offspring.add_value('dam' if parent.get_output_value('sex') == 'mare' else 'sire',
                         parent.load_item())
 
-                    filename = f'{offspring.get_output_value("link")}.json'
+                    offspring_id = offspring.get_output_value('link')
 
                     if (horse.get_output_value('sex') == 'mare' and
-                        not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', filename))):
+                        self.frontier.schedule(offspring_id, parent=horse_id, horse=offspring.load_item())):
                         yield SplashRequest(
-                                    url=BASE_URL.format(offspring.get_output_value('link')),
+                                    url=BASE_URL.format(offspring_id),
                                     callback=self.parse,
                                     endpoint='execute',
-                                    args={'lua_source': self.lua_source})
+                                    args={'lua_source': self.lua_source},
+                                    cb_kwargs=dict(horse_id=offspring_id),
+                                    priority=self.frontier.priority(offspring_id))
 
                     horse.add_value('offspring', offspring.load_item())
 
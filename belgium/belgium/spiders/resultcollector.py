@@ -1,7 +1,8 @@
 from scrapy.spiders import Spider
 from scrapy.http import JsonRequest
-from scrapy.loader import ItemLoader
 from belgium.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.assembly import RacedayAssembly
 
 from datetime import date, timedelta, datetime
 import json
@@ -24,6 +25,9 @@ class ResultCollector(Spider):
     """
     name = 'resultcollector'
     allowed_domains = ['trotting.be']
+    # the calendar is asked for a week at a time, monday to monday, wherever
+    # the date range starts, so 'scrapy reparse' can split a range in windows
+    reparse_window_days = 7
 
 
     def __init__(self, start_date='', end_date='', *args, **kwargs):
@@ -65,7 +69,7 @@ class ResultCollector(Spider):
         response_json = json.loads(response.body)
 
         for raceday_json in response_json['Items']:
-            raceday = ItemLoader(item=RacedayItem())
+            raceday = FastLoader(RacedayItem)
 
             raceday.add_value('racetrack', raceday_json['TrackName'])
             raceday.add_value('racetrack_code', raceday_json['Track_id'])
@@ -85,7 +89,7 @@ class ResultCollector(Spider):
         races = []
 
         for race_json in response_json:
-            race = ItemLoader(item=RaceItem())
+            race = FastLoader(RaceItem)
 
             race.add_value('link', race_json['RaceId'])
             race.add_value('race_name', race_json['Name'])
@@ -99,22 +103,25 @@ class ResultCollector(Spider):
 
             races.append(race)
 
-        yield JsonRequest(
-            url=RACE_URL.format(races[0].get_output_value('link')),
-            callback=self.parse_race,
-            cb_kwargs=dict(raceday=raceday),
-            meta={'races': races}
-        )
+        assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
 
+        for race in races:
+            yield JsonRequest(
+                url=RACE_URL.format(race.get_output_value('link')),
+                callback=self.parse_race,
+                errback=assembly.errback,
+                cb_kwargs=dict(race=race, assembly=assembly),
+                meta=assembly.meta(race.get_output_value('link'))
+            )
+
+        yield from assembly.start()
 
-    def parse_race(self, response, raceday):
-        response_json = json.loads(response.body)
 
-        race = response.meta['races'].pop(0)
-        races = response.meta['races']
+    def parse_race(self, response, race, assembly):
+        response_json = json.loads(response.body)
 
         for order, starter_json in enumerate(response_json['Participations'], 1):
-            starter = ItemLoader(item=RaceStarterItem())
+            starter = FastLoader(RaceStarterItem)
 
             starter.add_value('order', order)
             starter.add_value('distance', starter_json['Distance'])
@@ -129,7 +136,7 @@ class ResultCollector(Spider):
             if starter.get_output_value('started') and not starter.get_output_value('disqualified'):
                 starter.add_value('finish', starter_json['Version']['Place'])
 
-            horse = ItemLoader(item=HorseItem())
+            horse = FastLoader(HorseItem)
 
             horse.add_value('name', starter_json['Horse']['Name'])
             horse.add_value('link', str(starter_json['Horse']['HorseId']))
@@ -141,15 +148,4 @@ class ResultCollector(Spider):
 
             race.add_value('starters', starter.load_item())
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield JsonRequest(
-                url=RACE_URL.format(races[0].get_output_value('link')),
-                callback=self.parse_race,
-                cb_kwargs=dict(raceday=raceday),
-                meta={'races': races}
-            )
+        yield from assembly.add(race.get_output_value('link'), race)
@@ -1,7 +1,8 @@
 from scrapy.spiders import Spider
 from scrapy.http import JsonRequest
-from scrapy.loader import ItemLoader
 from belgium.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.assembly import RacedayAssembly
 
 from datetime import date, timedelta, datetime
 import json
@@ -61,7 +62,7 @@ class StartlistCollector(Spider):
         response_json = json.loads(response.body)
 
         for raceday_json in response_json['Items']:
-            raceday = ItemLoader(item=RacedayItem())
+            raceday = FastLoader(RacedayItem)
 
             raceday.add_value('racetrack', raceday_json['TrackName'])
             raceday.add_value('racetrack_code', raceday_json['Track_id'])
@@ -82,7 +83,7 @@ class StartlistCollector(Spider):
             races = []
 
             for race_json in response_json:
-                race = ItemLoader(item=RaceItem())
+                race = FastLoader(RaceItem)
 
                 race.add_value('link', race_json['RaceId'])
                 race.add_value('race_name', race_json['Name'])
@@ -96,22 +97,25 @@ class StartlistCollector(Spider):
 
                 races.append(race)
 
-            yield JsonRequest(
-                url=RACE_URL.format(races[0].get_output_value('link')),
-                callback=self.parse_race,
-                cb_kwargs=dict(raceday=raceday),
-                meta={'races': races}
-            )
+            assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
 
+            for race in races:
+                yield JsonRequest(
+                    url=RACE_URL.format(race.get_output_value('link')),
+                    callback=self.parse_race,
+                    errback=assembly.errback,
+                    cb_kwargs=dict(race=race, assembly=assembly),
+                    meta=assembly.meta(race.get_output_value('link'))
+                )
 
-    def parse_race(self, response, raceday):
-        response_json = json.loads(response.body)
+            yield from assembly.start()
 
-        race = response.meta['races'].pop(0)
-        races = response.meta['races']
+
+    def parse_race(self, response, race, assembly):
+        response_json = json.loads(response.body)
 
         for starter_json in response_json['Participations']:
-            starter = ItemLoader(item=RaceStarterItem())
+            starter = FastLoader(RaceStarterItem)
 
             starter.add_value('distance', starter_json['Distance'])
             starter.add_value('startnumber', starter_json['StartNumber'])
@@ -119,7 +123,7 @@ class StartlistCollector(Spider):
             starter.add_value('trainer', starter_json['Trainer']['Name'])
             starter.add_value('started', starter_json['Version']['PlaceText'])
 
-            horse = ItemLoader(item=HorseItem())
+            horse = FastLoader(HorseItem)
 
             horse.add_value('name', starter_json['Horse']['Name'])
             horse.add_value('link', str(starter_json['Horse']['HorseId']))
@@ -131,15 +135,4 @@ class StartlistCollector(Spider):
 
             race.add_value('starters', starter.load_item())
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield JsonRequest(
-                url=RACE_URL.format(races[0].get_output_value('link')),
-                callback=self.parse_race,
-                cb_kwargs=dict(raceday=raceday),
-                meta={'races': races}
-            )
+        yield from assembly.add(race.get_output_value('link'), race)
@@ -0,0 +1,250 @@
+"""
+Measures how long the spider callbacks take to parse, without downloading
+anything, by running them on the saved pages in the fixtures of every country,
+see fixtures.py in a country.
+
+    python bench.py                          all countries
+    python bench.py germany finland          only some countries
+    python bench.py --save                   store the result as the baseline
+    python bench.py -k parse_race            only fixtures or callbacks with parse_race in the name
+    python bench.py --capture                replace the pages with the ones in the replay archive
+
+Every fixture is run --repeat times and reported with the time per call, the
+items and requests it returned, items per second and the peak memory allocated
+by one call. When there is a baseline the time is compared with it, a fixture that
+takes more than --tolerance longer is a regression and the exit code is 1.
+The times depend on the machine, so the baseline is one per machine, in
+bench_baselines/<host>.json, and is not committed. Run --save on the commit
+to compare with first.
+"""
+from scrapy.crawler import CrawlerRunner
+from scrapy.http import Request
+from scrapy.utils.spider import iterate_spider_output
+
+from crawl import COUNTRIES, ROOT, country_settings
+from standardbred.replay import ResponseArchive
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+
+BASELINE = os.path.join(ROOT, 'bench_baselines', f'{platform.node() or "local"}.json')
+
+# the page a fixture is run on when fixture.json does not say, the one the
+# spiders get when they crawl
+PAGES = ['splash.json', 'splash.html', 'response.json', 'plain.html']
+
+
+def fixture_page(fixture):
+    if 'page' in fixture:
+        return fixture['page']
+
+    for page in PAGES:
+        if os.path.exists(os.path.join(fixture['path'], page)):
+            return page
+
+
+def run_callback(spider, fixtures, fixture, page, project):
+    """
+    Runs the callback once and returns the time it took and what it returned,
+    building the response is not part of the time.
+    """
+    response = fixtures.fixture_response(fixture, page, project)
+    callback = getattr(spider, fixture.get('callback', 'parse'))
+
+    start = time.perf_counter()
+    output = list(iterate_spider_output(callback(response, **response.request.cb_kwargs)))
+
+    return time.perf_counter() - start, output
+
+
+def measure_memory(spider, fixtures, fixture, page, project):
+    """
+    The peak memory, in bytes, allocated while the callback runs once.
+    """
+    response = fixtures.fixture_response(fixture, page, project)
+    callback = getattr(spider, fixture.get('callback', 'parse'))
+
+    tracemalloc.start()
+
+    try:
+        list(iterate_spider_output(callback(response, **response.request.cb_kwargs)))
+
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def capture_country(country, keyword):
+    """
+    Replaces the pages of the fixtures with the responses to their url in the
+    replay archive of the spider, see standardbred/replay.py, so the
+    callbacks are measured on pages from the site. splash.* pages are taken
+    from requests through Splash, the others from requests that were not. Only
+    responses with status 200 are used, fixture.json gets where the page is
+    from in source.
+    """
+    settings = country_settings(country)
+
+    fixtures = importlib.import_module(f'{country}.fixtures')
+
+    for fixture in fixtures.find_fixtures(settings.get('FIXTURES_DIRECTORY')):
+        name = f'{country}/{fixture["name"]}'
+        path = os.path.join(settings.get('REPLAY_DIRECTORY'), fixture['spider'])
+
+        if keyword and keyword not in name or not os.path.exists(os.path.join(path, 'index.jsonl')):
+            continue
+
+        archive = ResponseArchive(path)
+        captured = []
+
+        for page in PAGES:
+            if not os.path.exists(os.path.join(fixture['path'], page)):
+                continue
+
+            body = archive.latest(fixture['url'], page.startswith('splash'))
+
+            if body is None:
+                continue
+
+            with open(os.path.join(fixture['path'], page), 'wb') as outfile:
+                outfile.write(body)
+
+            captured.append(page)
+
+        if captured:
+            with open(os.path.join(fixture['path'], 'fixture.json')) as infile:
+                saved = json.load(infile)
+
+            saved['source'] = (f'captured from the replay archive {os.path.relpath(path, ROOT)}, '
+                               f'{", ".join(captured)}')
+
+            with open(os.path.join(fixture['path'], 'fixture.json'), 'w') as outfile:
+                json.dump(saved, outfile, indent=2, ensure_ascii=False)
+                outfile.write('\n')
+
+        yield name, captured
+
+
+def bench_country(country, repeat, keyword):
+    settings = country_settings(country)
+    settings.set('COLLECTED_INDEX', ':memory:')
+
+    fixtures = importlib.import_module(f'{country}.fixtures')
+    directory = settings.get('FIXTURES_DIRECTORY')
+
+    runner = CrawlerRunner(settings)
+
+    for fixture in fixtures.find_fixtures(directory):
+        callback = fixture.get('callback', 'parse')
+        name = f'{country}/{fixture["name"]}'
+
+        if keyword and keyword not in name and keyword not in callback:
+            continue
+
+        page = fixture_page(fixture)
+
+        if page is None:
+            print(f'{name}: no page, skipping it')
+            continue
+
+        spider = fixtures.create_spider(runner, fixture)
+
+        # the first run loads modules and fills caches
+        _, output = run_callback(spider, fixtures, fixture, page, country)
+
+        seconds = sum(run_callback(spider, fixtures, fixture, page, country)[0] for _ in range(repeat))
+
+        requests = sum(1 for x in output if isinstance(x, Request))
+
+        yield name, {
+            'callback': callback,
+            'page': page,
+            'seconds': seconds / repeat,
+            'items': len(output) - requests,
+            'requests': requests,
+            'items_per_second': (len(output) - requests) * repeat / seconds if seconds else None,
+            'peak_bytes': measure_memory(spider, fixtures, fixture, page, country)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the spider callbacks on saved pages.')
+
+    parser.add_argument('countries', nargs='*', metavar='country',
+                        help=f'the countries to measure, {", ".join(COUNTRIES)}, all if none are given')
+    parser.add_argument('-n', '--repeat', type=int, default=20,
+                        help='times every fixture is run, default 20')
+    parser.add_argument('-k', dest='keyword', help='only fixtures or callbacks with this in the name')
+    parser.add_argument('--baseline', default=BASELINE, help=f'the baseline, default {BASELINE}')
+    parser.add_argument('--save', action='store_true', help='store the result as the baseline')
+    parser.add_argument('--capture', action='store_true',
+                        help='replace the pages of the fixtures with the ones in the replay archive and exit')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='how much slower than the baseline is a regression, default 0.25 for 25%%')
+
+    args = parser.parse_args()
+
+    for country in args.countries:
+        if country not in COUNTRIES:
+            parser.error(f'unknown country {country}')
+
+    if args.capture:
+        for country in args.countries or COUNTRIES:
+            for name, captured in capture_country(country, args.keyword):
+                print(f'{name}: {", ".join(captured) if captured else "not in the replay archive, left as it is"}')
+
+        return
+
+    baseline = {}
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+
+    results = {}
+    regressions = []
+
+    for country in args.countries or COUNTRIES:
+        for name, result in bench_country(country, args.repeat, args.keyword):
+            results[name] = result
+
+            line = (f'{name} ({result["callback"]}, {result["page"]}): {result["seconds"] * 1000:.2f} ms, '
+                    f'{result["items"]} items, {result["requests"]} requests, '
+                    f'{result["items_per_second"] or 0:.0f} items/s, {result["peak_bytes"] / 1024:.0f} KiB peak')
+
+            if name in baseline:
+                change = result['seconds'] / baseline[name]['seconds'] - 1
+
+                line += f', {change:+.0%} from baseline'
+
+                if change > args.tolerance:
+                    line += ', REGRESSION'
+                    regressions.append(name)
+
+            print(line)
+
+    print(f'{len(results)} fixtures, {len(regressions)} regressions')
+
+    if args.save:
+        baseline.update(results)
+
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+
+        with open(args.baseline, 'w') as outfile:
+            json.dump(baseline, outfile, indent=2, sort_keys=True)
+
+        print(f'baseline saved to {args.baseline}')
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Runs the collectors of several countries at the same time in one process.
+
+    python crawl.py                                   results and startlists for all countries
+    python crawl.py sweden norway                     only some countries
+    python crawl.py -s resultcollector -a start_date=2020-01-01 -a end_date=2020-01-31
+
+Every country is crawled with its own settings, as if it was started with
+'scrapy crawl' in its own directory, so download delays, concurrency, Splash,
+middlewares and pipelines are those of the country. Only settings that belong
+to the process, like logging and the reactor, are shared.
+The pipelines of all countries write in the same threads and processes, see
+Workers in standardbred/workers.py, and a country's collectors share its
+collected index. The HTTP caches stay one per country, in the .scrapy of the
+project, the responses of one country are never those of another.
+"""
+from scrapy.crawler import Crawler, CrawlerProcess
+from scrapy.settings import Settings
+from scrapy.spiderloader import SpiderLoader
+
+import argparse
+import os
+import sys
+
+
+COUNTRIES = ['belgium', 'denmark', 'finland', 'france', 'germany', 'holland', 'norway', 'spain', 'sweden']
+SPIDERS = ['resultcollector', 'startlistcollector']
+
+# directories that are relative to the directory of the project, where
+# 'scrapy crawl' runs, HTTPCACHE_DIR is in its .scrapy like Scrapy has it
+PROJECT_DIRECTORIES = ['FIXTURES_DIRECTORY', 'FRONTIER_DIRECTORY', 'REPLAY_DIRECTORY']
+DATA_DIRECTORIES = ['HTTPCACHE_DIR']
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def country_settings(country):
+    """
+    The settings of a country, the same as 'scrapy crawl' would use. The
+    relative directories are made absolute the way they are in the directory
+    of the project, or every country would use the same ones here.
+    """
+    project = os.path.join(ROOT, country)
+
+    if project not in sys.path:
+        sys.path.insert(0, project)
+
+    settings = Settings()
+    settings.setmodule(f'{country}.settings', priority='project')
+
+    for name, directory in ([(x, project) for x in PROJECT_DIRECTORIES] +
+                            [(x, os.path.join(project, '.scrapy')) for x in DATA_DIRECTORIES]):
+        if settings.get(name) and not os.path.isabs(settings.get(name)):
+            settings.set(name, os.path.join(directory, settings.get(name)), priority='project')
+
+    return settings
+
+
+def create_crawlers(countries, spiders):
+    """
+    A crawler for every spider of every country, countries without the spider
+    are skipped, denmark has no startlistcollector.
+    """
+    crawlers = []
+
+    for country in countries:
+        settings = country_settings(country)
+        spider_loader = SpiderLoader.from_settings(settings)
+
+        for spider in spiders:
+            if spider not in spider_loader.list():
+                print(f'{country} has no {spider}, skipping it')
+                continue
+
+            crawlers.append(Crawler(spider_loader.load(spider), settings))
+
+    return crawlers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the collectors of several countries in one process.')
+
+    parser.add_argument('countries', nargs='*', metavar='country',
+                        help=f'the countries to crawl, {", ".join(COUNTRIES)}, all if none are given')
+    parser.add_argument('-s', '--spider', action='append', dest='spiders',
+                        help='spider to run for every country, can be repeated, '
+                             'resultcollector and startlistcollector if not given')
+    parser.add_argument('-a', action='append', dest='spider_arguments', default=[], metavar='NAME=VALUE',
+                        help='argument for every spider, can be repeated')
+    parser.add_argument('--loglevel', default='INFO')
+
+    args = parser.parse_args()
+
+    for country in args.countries:
+        if country not in COUNTRIES:
+            parser.error(f'unknown country {country}')
+
+    spider_arguments = dict(x.split('=', 1) for x in args.spider_arguments)
+
+    process = CrawlerProcess(Settings({'LOG_LEVEL': args.loglevel}))
+    crawlers = create_crawlers(args.countries or COUNTRIES, args.spiders or SPIDERS)
+
+    for crawler in crawlers:
+        process.crawl(crawler, **spider_arguments)
+
+    process.start()
+
+    # items were lost, see standardbred/workers.py
+    if any(x.stats.get_value('finish_reason') == 'write_failed' for x in crawlers):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
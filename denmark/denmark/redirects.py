@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+
+class RedirectCache(object):
+    """
+    Where the link to a raceday in the calendar redirects to, by date and
+    racetrack, stored in SQLite so a month that is collected again does not
+    have to follow the links again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS redirects ('
+                                'date TEXT NOT NULL, '
+                                'racetrack TEXT NOT NULL, '
+                                'url TEXT NOT NULL, '
+                                'PRIMARY KEY (date, racetrack))')
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('REDIRECT_CACHE'))
+
+
+    def get(self, date, racetrack):
+        row = self.connection.execute('SELECT url FROM redirects WHERE date = ? AND racetrack = ?',
+                                      (date, racetrack)).fetchone()
+
+        return row[0] if row else None
+
+
+    def add(self, date, racetrack, url):
+        self.connection.execute('INSERT OR REPLACE INTO redirects (date, racetrack, url) VALUES (?, ?, ?)',
+                                (date, racetrack, url))
@@ -3,14 +3,18 @@ from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from scrapy.selector import Selector
 from denmark.items import HorseItem
+from standardbred.assembly import Assembly
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree, DEPTH_FIRST
+from standardbred.splashwait import lua_script
 from w3lib.html import remove_tags
 
 from scrapy_splash import SplashRequest
 
-import os
 
 BASE_URL = 'http://195.198.34.45/trav/hast/visa/{}'
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/denmark'
+
+TABS = ['Afstamning', 'Væddeløbsresultater', 'Afkom']
 
 
 def handle_cell(cell):
@@ -31,30 +35,26 @@ def handle_cell(cell):
     return horse
 
 
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 class HorsecollectorSpider(Spider):
     """
     Collects horses from DTCs site.
     Takes a start_id and collects information about pedigree, racing career and
     offspring. If the horse is a mare and has offspring, those are also collected.
+    By default all tabs are clicked through in one render, with tabs='parallel'
+    every tab is rendered by its own request, at the same time, and the tabs
+    are joined in parse_tab. If a tab fails the horse is rendered again the
+    default way.
     """
     name = 'horsecollector'
     allowed_domains = ['195.198.34.45']
 
 
-    def __init__(self, start_id = '', *args, **kwargs):
+    def __init__(self, start_id = '', tabs = 'single', *args, **kwargs):
         super(HorsecollectorSpider, self).__init__(*args, **kwargs)
         self.id = start_id
+        self.parallel_tabs = tabs == 'parallel'
 
-        self.lua_source = """
+        self.lua_source = lua_script("""
                           treat = require('treat')
                           function main(splash, args)
                             local whichTabs = {
@@ -64,7 +64,7 @@ class HorsecollectorSpider(Spider):
                             }
                             local htmlList = {}
                             assert(splash:go(args.url))
-                            assert(splash:wait(5))
+                            wait_for_selector(splash, 'div.tab-row li.selected a')
                             local selectedTab = splash:select('div.tab-row li.selected a'):text()
                             if whichTabs[selectedTab] then
                                 htmlList[#htmlList + 1] = splash:html()
@@ -73,37 +73,127 @@ class HorsecollectorSpider(Spider):
                             for _, v in ipairs({'tab0', 'tab1', 'tab2', 'tab3'}) do
                                 selectedTab = splash:select('div.tab-row li.' .. v .. ' a')
                                 if selectedTab and whichTabs[selectedTab:text()] then
+                                    local tabText = selectedTab:text()
                                     selectedTab:mouse_click()
-                                    assert(splash:wait(5))
+                                    -- the tabs are replaced when the new tab has loaded
+                                    wait_for_text(splash, 'div.tab-row li.selected a', tabText)
                                     htmlList[#htmlList + 1] = splash:html()
-                                    whichTabs[selectedTab] = false
+                                    whichTabs[tabText] = false
                                 end
                             end
                             return treat.as_array(htmlList)
                           end
-                          """
+                          """)
+
+        # renders a single tab, the same list as above with only that tab, or
+        # an empty list if the horse does not have the tab
+        self.tab_lua_source = lua_script("""
+                          treat = require('treat')
+                          function main(splash, args)
+                            assert(splash:go(args.url))
+                            wait_for_selector(splash, 'div.tab-row li.selected a')
+                            if splash:select('div.tab-row li.selected a'):text() ~= args.tab then
+                                local tab = nil
+                                for _, v in ipairs({'tab0', 'tab1', 'tab2', 'tab3'}) do
+                                    local candidate = splash:select('div.tab-row li.' .. v .. ' a')
+                                    if candidate and candidate:text() == args.tab then
+                                        tab = candidate
+                                    end
+                                end
+                                if not tab then
+                                    return treat.as_array({})
+                                end
+                                tab:mouse_click()
+                                wait_for_text(splash, 'div.tab-row li.selected a', args.tab)
+                            end
+                            return treat.as_array({splash:html()})
+                          end
+                          """)
 
 
     def start_requests(self):
-        yield SplashRequest(
-            url = BASE_URL.format(self.id),
-            callback = self.parse,
-            endpoint = 'execute',
-            args= {
-                'wait': 5,
-                'lua_source': self.lua_source
-            }
-        )
-
-
-    def parse(self, response):
+        self.frontier = Frontier.from_crawler(self.crawler, self.id)
+
+        for horse_id in self.frontier.start(self.id):
+            yield from self.horse_requests(horse_id)
+
+
+    def horse_requests(self, horse_id, parallel=None):
+        if parallel is None:
+            parallel = self.parallel_tabs
+
+        if not parallel:
+            yield SplashRequest(
+                url = BASE_URL.format(horse_id),
+                callback = self.parse,
+                endpoint = 'execute',
+                args= {
+                    'wait': 5,
+                    'lua_source': self.lua_source
+                },
+                cb_kwargs = dict(horse_id=horse_id),
+                priority = self.frontier.priority(horse_id)
+            )
+
+            return
+
+        # if a tab fails the horse is rendered again by clicking through the
+        # tabs, once every tab is done
+        assembly = Assembly.from_spider(self, range(len(TABS)),
+                                        lambda tabs: [html for tab in tabs for html in tab],
+                                        dropped=lambda failed: self.horse_requests(horse_id, parallel=False))
+
+        for part, tab in enumerate(TABS):
+            yield SplashRequest(
+                url = BASE_URL.format(horse_id),
+                callback = self.parse_tab,
+                errback = self.tab_failed,
+                endpoint = 'execute',
+                args= {
+                    'lua_source': self.tab_lua_source,
+                    'tab': tab
+                },
+                cb_kwargs = dict(part=part, assembly=assembly, horse_id=horse_id),
+                meta = assembly.meta(part),
+                priority = self.frontier.priority(horse_id)
+            )
+
+
+    def parse_tab(self, response, part, assembly, horse_id):
+        yield from self.assembled(assembly.add(part, response.data), horse_id)
+
+
+    def tab_failed(self, failure):
+        assembly = failure.request.cb_kwargs['assembly']
+        horse_id = failure.request.cb_kwargs['horse_id']
+
+        yield from self.assembled(assembly.errback(failure), horse_id)
+
+
+    def assembled(self, results, horse_id):
+        """
+        The horse from the tabs of a finished assembly, or the request that
+        renders it again when a tab failed.
+        """
+        for result in results:
+            if isinstance(result, scrapy.Request):
+                yield result
+            else:
+                yield from self.parse_horse(BASE_URL.format(horse_id), result, horse_id)
+
+
+    def parse(self, response, horse_id):
+        yield from self.parse_horse(response.url, response.data, horse_id)
+
+
+    def parse_horse(self, url, html_list, horse_id):
         collect_basic = True
 
         horse = ItemLoader(item=HorseItem())
 
-        horse.add_value('link', response.url)
+        horse.add_value('link', url)
 
-        for html in response.data:
+        for html in html_list:
             horse_html = Selector(text=html)
             horse.selector = horse_html
 
@@ -128,15 +218,7 @@ class HorsecollectorSpider(Spider):
                 ancestors = [handle_cell(x) for x in
                     horse_html.xpath('//table[@id="horseDescent"]//td')]
 
-                add_parents(ancestors[1], ancestors[2], ancestors[3])
-                add_parents(ancestors[4], ancestors[5], ancestors[6])
-                add_parents(ancestors[8], ancestors[9], ancestors[10])
-                add_parents(ancestors[11], ancestors[12], ancestors[13])
-
-                add_parents(ancestors[0], ancestors[1], ancestors[4])
-                add_parents(ancestors[7], ancestors[8], ancestors[11])
-
-                add_parents(horse, ancestors[0], ancestors[7])
+                build_pedigree(horse, ancestors, DEPTH_FIRST)
 
             elif selected_tab_text == 'Væddeløbsresultater':
                 # Racing career
@@ -270,19 +352,10 @@ class HorsecollectorSpider(Spider):
 
                                 offspring.add_value('sire', sire.load_item())
 
-                            outfile = f'{offspring.get_output_value("link")}.json'
-
-                            if (not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', outfile)) and
-                                    offspring.get_output_value('link')):
-                                yield SplashRequest(
-                                    url = BASE_URL.format(offspring.get_output_value('link')),
-                                    callback = self.parse,
-                                    endpoint = 'execute',
-                                    args= {
-                                        'wait': 5,
-                                        'lua_source': self.lua_source
-                                    }
-                                )
+                            offspring_id = offspring.get_output_value('link')
+
+                            if offspring_id and self.frontier.schedule(offspring_id, parent=horse_id, horse=offspring.load_item()):
+                                yield from self.horse_requests(offspring_id)
 
 
                         else:
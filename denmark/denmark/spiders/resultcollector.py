@@ -1,17 +1,19 @@
 from scrapy.spiders import Spider
+from scrapy.http import Request
 from scrapy.loader import ItemLoader
 from scrapy.selector import Selector
 from denmark.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from denmark.redirects import RedirectCache
+from standardbred.splashwait import lua_script
 
 from scrapy_splash import SplashFormRequest, SplashRequest
 
-import os
 import calendar
 
 from base64 import b64decode
 from datetime import date, datetime, timedelta
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/denmark'
 BASE_URL = 'http://195.198.34.45'
 CALENDAR_URL = BASE_URL + '/trav/lobsdagsresultater'
 
@@ -20,35 +22,95 @@ class ResultcollectorSpider(Spider):
     """
     Collects results from DTCs site.
     Takes a start_date and an end_date in the form 'yyyy-mm-dd', these default to yesterday.
+    Every raceday is rendered once and the races are loaded by clicking their
+    tabs. By default the whole HAR of the render is returned, with
+    raceday='fragments' only the page and the race fragments the tabs load,
+    all tabs are clicked at once. The fragments have not been checked against
+    the site yet, it is the default when they have.
     """
     name = 'resultcollector'
     allowed_domains = ['195.198.34.45']
 
 
-    def __init__(self, start_date = '', end_date = '', *args, **kwargs):
+    def __init__(self, start_date = '', end_date = '', raceday = 'har', *args, **kwargs):
         super(ResultcollectorSpider, self).__init__(*args, **kwargs)
         self.today = date.today()
         self.start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date != '' else self.today - timedelta(days = 1)
         self.end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date != '' else self.today - timedelta(days = 1)
 
+        fragments_lua_source = lua_script("""
+                     treat = require('treat')
+                     function main(splash, args)
+                        local fragments = {}
+                        splash.images_enabled = false
+                        splash.response_body_enabled = true
+                        track_requests(splash)
+                        -- a tab loads its race as an ajax response in xml
+                        splash:on_response(function(response)
+                            local content_type = response.headers['Content-Type'] or ''
+                            if string.find(content_type, 'xml') then
+                                fragments[#fragments + 1] = {url=response.url,
+                                                             text=treat.as_string(response.body)}
+                            end
+                        end)
+                        assert(splash:go(args.url))
+                        wait_for_idle(splash)
+                        -- the first race is shown on the page
+                        table.insert(fragments, 1, {url=args.url, text=splash:html()})
+                        -- click all the other tabs at once and wait for them together
+                        splash:runjs([[
+                            var tabs = document.querySelectorAll('ul.tab a.large');
+                            for (var i = 1; i < tabs.length; i++) {
+                                tabs[i].click();
+                            }
+                        ]])
+                        wait_for_idle(splash)
+                        return treat.as_array(fragments)
+                     end
+                     """)
+
+        har_lua_source = lua_script("""
+                     function main(splash, args)
+                        splash.response_body_enabled = true
+                        track_requests(splash)
+                        splash:go(args.url)
+                        wait_for_idle(splash)
+                        local tabs = splash:select_all('ul.tab a.large')
+                        local count = 2
+                        while count <= #tabs do
+                            tabs[count]:mouse_click()
+                            -- the race is loaded when the tab is clicked
+                            wait_for_idle(splash)
+                            tabs = splash:select_all('ul.tab a.large')
+                            count = count + 1
+                        end
+                        return splash:har()
+                     end
+                     """)
+
+        self.raceday_lua_source = fragments_lua_source if raceday == 'fragments' else har_lua_source
+
 
     def start_requests(self):
         """
         Loop through all months between start_date and end_date, submit the form
-        if it is not the current year and month. Collect all links, check if the
-        date is in range, follow that link, record where it redirects to. Returns
-        a list of lists, each containing the response url, racetrack name and
-        the day of the month.
+        if it is not the current year and month. Collect all links and check if
+        the date is in range. Returns a list of lists, each containing the link,
+        racetrack name and the day of the month, and the cookies of the Splash
+        session. Where the links redirect to is found in parse.
         I did not want this function to do too much, so there is some overhead.
         """
-        lua_source = """
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+        self.redirects = RedirectCache.from_crawler(self.crawler)
+
+        lua_source = lua_script("""
                     treat = require('treat')
                     function main(splash, args)
                       list = {}
                       day_list = {}
                       url = "http://195.198.34.45/trav"
                       assert(splash:go(args.url))
-                      assert(splash:wait(0.5))
+                      wait_for_selector(splash, 'table.calendar')
                       if args.year ~= "" and args.month ~= "" then
                         form = splash:select('div#content form')
                         form_id = form:getAttribute('id')
@@ -56,7 +118,7 @@ class ResultcollectorSpider(Spider):
                         action_url = url .. string.sub(form_action, 2)
                         body = form_id .. '_hf_0=&track=0&year=' .. args.year .. '&month=' .. args.month
                         splash:go{url=action_url, http_method="POST", body=body}
-                        assert(splash:wait(3))
+                        wait_for_selector(splash, 'table.calendar')
                       end
                       days = splash:select_all('table.calendar tbody td.calendar_column')
                       for row, day in ipairs(days) do
@@ -70,13 +132,12 @@ class ResultcollectorSpider(Spider):
                         end
                       end
                       for ix, link in ipairs(day_list) do
-                        local resp = splash:http_get(link[1])
-                        assert(splash:wait(2))
-                        list[#list + 1] = treat.as_array({resp.url, link[2], link[3]})
+                        list[#list + 1] = treat.as_array(link)
                       end
-                      return treat.as_array(list)
+                      -- the links only work in the session they were listed in
+                      return {links = treat.as_array(list), cookies = splash:get_cookies()}
                     end
-                    """
+                    """)
 
         current_date = self.start_date
 
@@ -119,53 +180,103 @@ class ResultcollectorSpider(Spider):
 
     def parse(self, response):
         """
-        Gets the page for the raceday, clicks on the tab for each race. Returns
-        a har archive.
+        The links in the calendar redirect to the racedays. Where a link
+        redirects to is looked up in the redirect cache, links that are not in
+        it are followed with HEAD requests, all at the same time. The requests
+        send the cookies of the Splash session the calendar was rendered in,
+        a cookiejar for every month, the links belong to that session.
         """
-        lua_source = """
-                     function main(splash, args)
-                        splash.response_body_enabled = true
-                        splash:go(args.url)
-                        assert(splash:wait(2))
-                        local tabs = splash:select_all('ul.tab a.large')
-                        local count = 2
-                        while count <= #tabs do
-                            tabs[count]:mouse_click()
-                            assert(splash:wait(2))
-                            tabs = splash:select_all('ul.tab a.large')
-                            count = count + 1
-                        end
-                        return splash:har()
-                     end
-                     """
+        cookies = {x['name']: x['value'] for x in response.data['cookies']}
+        cookiejar = response.meta['date'].strftime('%Y-%m')
 
-        for rd in response.data:
+        for rd in response.data['links']:
             raceday = ItemLoader(item=RacedayItem())
 
             raceday.add_value('racetrack', rd[1])
             raceday.add_value('status', 'result')
-            raceday.add_value('link', rd[0])
             raceday.add_value('date', response.meta['date'].replace(day=rd[2]).strftime('%Y-%m-%d'))
             raceday.add_value('collection_date', self.today.strftime('%Y-%m-%d'))
 
             filename = '_'.join([raceday.get_output_value('date').replace('-', '_'),
                                 rd[1].lower().replace(' ', '_')]) + '.json'
 
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename)):
-                yield SplashRequest(
+            if self.collected.contains('result', filename):
+                continue
+
+            url = self.redirects.get(raceday.get_output_value('date'), rd[1])
+
+            if url:
+                self.crawler.stats.inc_value('redirects/cached')
+
+                yield self.raceday_request(url, raceday)
+
+            else:
+                yield Request(
                             url=rd[0],
-                            callback=self.parse_raceday,
+                            method='HEAD',
+                            cookies=cookies,
+                            callback=self.parse_redirect,
                             cb_kwargs=dict(raceday=raceday),
-                            endpoint='execute',
-                            args={'wait': 5,
-                                  'lua_source': lua_source}
+                            meta={'handle_httpstatus_list': [405, 501], 'cookiejar': cookiejar},
+                            dont_filter=True
                 )
 
 
-    def parse_raceday(self, response, raceday):
-        for entry in response.data['log']['entries']:
-            race_text = b64decode(entry['response']['content'].get('text', '')).decode('utf-8').strip()
+    def parse_redirect(self, response, raceday):
+        # the server does not answer HEAD, ask again with GET
+        if response.status in [405, 501]:
+            yield response.request.replace(method='GET', meta={'cookiejar': response.meta['cookiejar']})
+            return
+
+        # a link the server did not know in the session leads back to the
+        # calendar or the start page, that is not where the raceday is
+        if response.url.rstrip('/') in [BASE_URL, BASE_URL + '/trav', CALENDAR_URL]:
+            self.crawler.stats.inc_value('redirects/lost')
+            self.logger.warning(f'{response.request.url} did not lead to the raceday on '
+                                f'{raceday.get_output_value("date")} at {raceday.get_output_value("racetrack")}')
+            return
+
+        self.crawler.stats.inc_value('redirects/followed')
+
+        self.redirects.add(raceday.get_output_value('date'), raceday.get_output_value('racetrack'), response.url)
 
+        yield self.raceday_request(response.url, raceday)
+
+
+    def raceday_request(self, url, raceday):
+        """
+        Gets the page for the raceday, clicks on the tab for each race. Returns
+        the page and the race fragments, or a har archive.
+        """
+        raceday.add_value('link', url)
+
+        return SplashRequest(
+                    url=url,
+                    callback=self.parse_raceday,
+                    cb_kwargs=dict(raceday=raceday),
+                    endpoint='execute',
+                    args={'wait': 5,
+                          'lua_source': self.raceday_lua_source}
+        )
+
+
+    def race_texts(self, response):
+        """
+        The url and text of every page and race fragment in the render of a
+        raceday, either the fragments or the entries of a har archive.
+        """
+        if isinstance(response.data, dict):
+            for entry in response.data['log']['entries']:
+                yield (entry['response']['url'],
+                       b64decode(entry['response']['content'].get('text', '')).decode('utf-8').strip())
+
+        else:
+            for fragment in response.data:
+                yield fragment['url'], fragment['text'].strip()
+
+
+    def parse_raceday(self, response, raceday):
+        for url, race_text in self.race_texts(response):
             if len(race_text) > 0:
                 if race_text.startswith('<?xml'):
                     race_text = race_text[ race_text.find('![CDATA[') + 8 : race_text.find(']]') ]
@@ -182,8 +293,8 @@ class ResultcollectorSpider(Spider):
                 race.add_xpath('startmethod', '//td[contains(text()," m. ")]')
                 race.add_xpath('conditions', '//table[@class="info_text"]//td')
 
-                if 'loppId' in entry['response']['url']:
-                    race.add_value('link', entry['response']['url'])
+                if 'loppId' in url:
+                    race.add_value('link', url)
 
                 starter_rows = race_selector.xpath('//div[@class="clear"]//table[@class="latte"]//tr')[ 1: ]
 
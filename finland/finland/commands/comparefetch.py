@@ -0,0 +1,7 @@
+from standardbred.commands import comparefetch
+
+from finland import fixtures
+
+
+class Command(comparefetch.Command):
+    fixtures = fixtures
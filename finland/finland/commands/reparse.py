@@ -0,0 +1,5 @@
+from standardbred.commands import reparse
+
+
+class Command(reparse.Command):
+    pass
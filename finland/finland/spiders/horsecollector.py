@@ -6,6 +6,9 @@ from w3lib.html import remove_tags
 from scrapy_splash import SplashFormRequest, SplashRequest
 
 from finland.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree, DEPTH_FIRST
+from standardbred.splashwait import lua_script
 
 import datetime
 import re
@@ -69,15 +72,6 @@ def handle_cell(cell):
     return horse
 
 
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 def handle_racetime(time_string):
     if time_string is not None:
         splits = time_string.split('.')
@@ -115,7 +109,7 @@ class HorsecollectorSpider(Spider):
     def __init__(self, start_id = '', *args, **kwargs):
         super(HorsecollectorSpider, self).__init__(*args, **kwargs)
         self.id = start_id
-        self.lua_source = """
+        self.lua_source = lua_script("""
                             treat = require('treat')
                             function main(splash, args)
                                 local whichTabs = {
@@ -124,7 +118,7 @@ class HorsecollectorSpider(Spider):
                                     ['Ravikilpailuhistoria'] = true
                                 }
                                 assert(splash:go(args.url))
-                                assert(splash:wait(4))
+                                wait_for_selector(splash, 'span.selected_tab a')
                                 local htmlList = {}
                                 local selectedTab = splash:select('span.selected_tab a'):text()
                                 if whichTabs[selectedTab] then
@@ -134,30 +128,36 @@ class HorsecollectorSpider(Spider):
                                 for _, v in ipairs({'tab_1', 'tab_2', 'tab_3'}) do
                                     selectedTab = splash:select('span.' .. v .. ' a')
                                     if whichTabs[selectedTab:text()] then
+                                        local tabText = selectedTab:text()
                                         selectedTab:mouse_click()
-                                        assert(splash:wait(4))
+                                        wait_for_text(splash, 'span.selected_tab a', tabText)
                                         htmlList[#htmlList + 1] = splash:html()
-                                        whichTabs[selectedTab] = false
+                                        whichTabs[tabText] = false
                                     end
                                 end
                                 return treat.as_array(htmlList)
                             end
-                          """
+                          """)
 
 
     def start_requests(self):
-        yield SplashRequest(
-            url = BASE_URL.format(self.id),
-            callback = self.parse,
-            endpoint = 'execute',
-            args = {
-                'wait': 5,
-                'lua_source': self.lua_source
-            }
-        )
-
-
-    def parse(self, response):
+        self.frontier = Frontier.from_crawler(self.crawler, self.id)
+
+        for horse_id in self.frontier.start(self.id):
+            yield SplashRequest(
+                url = BASE_URL.format(horse_id),
+                callback = self.parse,
+                endpoint = 'execute',
+                args = {
+                    'wait': 5,
+                    'lua_source': self.lua_source
+                },
+                cb_kwargs = dict(horse_id=horse_id),
+                priority = self.frontier.priority(horse_id)
+            )
+
+
+    def parse(self, response, horse_id):
         horse = ItemLoader(item=HorseItem())
 
         for html in response.data:
@@ -182,29 +182,8 @@ class HorsecollectorSpider(Spider):
             elif 'FamilyInfo' in selected_tab:
                 pedigree = [handle_cell(x) for x in horse_html.xpath('//table[@class="familytree"]//td')]
 
-                # sires half of the pedigree
-                add_parents(pedigree[2], pedigree[3], pedigree[4])
-                add_parents(pedigree[5], pedigree[6], pedigree[7])
-                add_parents(pedigree[9], pedigree[10], pedigree[11])
-                add_parents(pedigree[12], pedigree[13], pedigree[14])
-
-                add_parents(pedigree[1], pedigree[2], pedigree[5])
-                add_parents(pedigree[8], pedigree[9], pedigree[12])
-
-                add_parents(pedigree[0], pedigree[1], pedigree[8])
-
-                # dams half of the pedigree
-                add_parents(pedigree[17], pedigree[18], pedigree[19])
-                add_parents(pedigree[20], pedigree[21], pedigree[22])
-                add_parents(pedigree[24], pedigree[25], pedigree[26])
-                add_parents(pedigree[27], pedigree[28], pedigree[29])
-
-                add_parents(pedigree[16], pedigree[17], pedigree[20])
-                add_parents(pedigree[23], pedigree[24], pedigree[27])
-
-                add_parents(pedigree[15], pedigree[16], pedigree[23])
-
-                add_parents(horse, pedigree[0], pedigree[15])
+                # the first 30 cells are four generations, 2 + 4 + 8 + 16, sire's half first
+                build_pedigree(horse, pedigree[:30], DEPTH_FIRST)
 
                 for offspring_row in horse_html.xpath('//table[@class="sortable no_wrap_table"]/tbody/tr'):
                     offspring = ItemLoader(item=HorseItem(), selector=offspring_row)
@@ -237,15 +216,20 @@ class HorsecollectorSpider(Spider):
 
                     horse.add_value('offspring', offspring.load_item())
 
-                    if horse.get_output_value('sex') == 'mare':
+                    offspring_id = offspring.get_output_value('link')
+
+                    if (horse.get_output_value('sex') == 'mare' and
+                            self.frontier.schedule(offspring_id, parent=horse_id, horse=offspring.load_item())):
                         yield SplashRequest(
-                            url = BASE_URL.format(offspring.get_output_value('link')),
+                            url = BASE_URL.format(offspring_id),
                             callback = self.parse,
                             endpoint = 'execute',
                             args = {
                                 'wait': 5,
                                 'lua_source': self.lua_source
-                            }
+                            },
+                            cb_kwargs = dict(horse_id=offspring_id),
+                            priority = self.frontier.priority(offspring_id)
                         )
 
             elif 'RacingHistory' in selected_tab:
@@ -1,18 +1,32 @@
 from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from finland.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from standardbred.splashwait import lua_script
+from standardbred.assembly import RacedayAssembly
 
 from scrapy_splash import SplashFormRequest, SplashRequest
 
 import datetime
 import re
-import os
 
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/finland'
 BASE_URL = 'http://heppa.hippos.fi'
 RACEDAY_URL = BASE_URL + '/heppa/app?page=racing%2FRaceResults&service=external&sp={}'
 RACE_URL = BASE_URL + '/heppa/app?page=racing%2FRaceResults&service=external&sp={}'
+SEARCH_URL = BASE_URL + '/heppa/app?page=racing%2FRaceCalendarSearch&service=external'
+
+
+def date_windows(start_date, end_date, days):
+    """
+    start_date to end_date as windows of days days.
+    """
+    while start_date <= end_date:
+        window_end = min(start_date + datetime.timedelta(days=days - 1), end_date)
+
+        yield start_date, window_end
+
+        start_date = window_end + datetime.timedelta(days=1)
 
 
 class ResultcollectorSpider(Spider):
@@ -24,6 +38,9 @@ class ResultcollectorSpider(Spider):
     gets them, removing any pony races.
     Gets one race at the time, all races are available in the last tab on the raceday
     page, easier but more time consuming doing it this way.
+    The date range is searched in windows of RESULT_WINDOW_DAYS days, which are
+    requested at the same time and parsed on their own, a window Splash fails
+    to render is searched again.
     """
     name = 'resultcollector'
     allowed_domains = ['hippos.fi']
@@ -37,7 +54,12 @@ class ResultcollectorSpider(Spider):
 
 
     def start_requests(self):
-        lua_source = """
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
+        self.window_days = self.settings.getint('RESULT_WINDOW_DAYS', 31)
+        self.window_retries = self.settings.getint('RESULT_WINDOW_RETRIES', 3)
+
+        self.search_lua_source = lua_script("""
                     function main(splash, args)
                         local base = 'http://heppa.hippos.fi'
                         local function search_for_splash()
@@ -52,22 +74,58 @@ class ResultcollectorSpider(Spider):
                         end
 
                         assert(splash:go(args.url))
-                        assert(splash:wait(1))
+                        wait_for_selector(splash, '#dateRangeEnd')
                         search_for_splash()
-                        assert(splash:wait(5))
+
+                        -- an error instead of a page without the table, so
+                        -- the window is searched again
+                        if not wait_for_selector(splash, 'table.sortable', args.wait) then
+                            error('render timeout')
+                        end
 
                         return splash:html()
                     end
-                    """
+                    """)
+
+        for start_date, end_date in date_windows(self.start_date, self.end_date, self.window_days):
+            yield self.search_request(start_date, end_date)
 
-        url = BASE_URL + '/heppa/app?page=racing%2FRaceCalendarSearch&service=external'
 
-        yield SplashRequest(url=url,
-                            callback=self.parse,
-                            endpoint='execute',
-                            args={'lua_source': lua_source,
-                                    'start_date': self.start_date.strftime('%d.%m.%Y'),
-                                    'end_date': self.end_date.strftime('%d.%m.%Y')})
+    def search_request(self, start_date, end_date, attempt=0):
+        """
+        The search for the racedays from start_date to end_date, a window of
+        the whole range, every window is parsed on its own.
+        """
+        return SplashRequest(url=SEARCH_URL,
+                             callback=self.parse,
+                             errback=self.search_failed,
+                             endpoint='execute',
+                             dont_filter=attempt > 0,
+                             meta={'window': (start_date, end_date, attempt)},
+                             args={'lua_source': self.search_lua_source,
+                                   'start_date': start_date.strftime('%d.%m.%Y'),
+                                   'end_date': end_date.strftime('%d.%m.%Y'),
+                                   'wait': 30})
+
+
+    def search_failed(self, failure):
+        """
+        Searches a window again when Splash could not render it, a render
+        timeout, a full render queue or a script error, until it has been
+        retried RESULT_WINDOW_RETRIES times.
+        """
+        start_date, end_date, attempt = failure.request.meta['window']
+        window = f'{start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}'
+
+        if attempt < self.window_retries:
+            self.logger.warning(f'search {window} failed ({failure.getErrorMessage()}), retrying')
+            self.crawler.stats.inc_value('windows/retried')
+
+            yield self.search_request(start_date, end_date, attempt + 1)
+            return
+
+        self.logger.error(f'search {window} failed {attempt + 1} times, giving up: {failure.getErrorMessage()}')
+        self.crawler.stats.inc_value('windows/failed')
 
 
     def parse(self, response):
@@ -95,7 +153,7 @@ class ResultcollectorSpider(Spider):
                 raceday.get_output_value('date').replace('-', '_'),
                 raceday.get_output_value('racetrack_code').lower()]) + '.json'
 
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename)):
+            if not self.collected.contains('result', filename):
                 yield SplashRequest(
                     url=RACEDAY_URL.format(raceday.get_output_value('link')),
                     callback=self.parse_raceday,
@@ -106,17 +164,22 @@ class ResultcollectorSpider(Spider):
         racelinks = response.xpath('//a[contains(text(),"lähtö") and not(contains(text(),"ponilähtö"))]/@href').getall()
 
         if len(racelinks) != 0:
-            yield SplashRequest(
-                url=BASE_URL + racelinks.pop(0),
-                callback=self.parse_race,
-                cb_kwargs=dict(raceday=raceday),
-                meta={
-                    'racelinks': racelinks
-                }
-            )
+            racelinks = [BASE_URL + x for x in racelinks]
+            assembly = RacedayAssembly.from_spider(self, raceday, racelinks)
+
+            for racelink in racelinks:
+                yield SplashRequest(
+                    url=racelink,
+                    callback=self.parse_race,
+                    errback=assembly.errback,
+                    cb_kwargs=dict(racelink=racelink, assembly=assembly),
+                    meta=assembly.meta(racelink)
+                )
+
+            yield from assembly.start()
 
 
-    def parse_race(self, response, raceday):
+    def parse_race(self, response, racelink, assembly):
         race = ItemLoader(item=RaceItem(), selector=response.xpath('//div[@class="full_column"][1]'))
 
         race.add_value('link', response.url)
@@ -182,17 +245,4 @@ class ResultcollectorSpider(Spider):
 
             race.add_value('starters', starter.load_item())
 
-        raceday.add_value('races', race.load_item())
-
-        if len(response.meta['racelinks']) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield SplashRequest(
-                url=BASE_URL + response.meta['racelinks'].pop(0),
-                callback=self.parse_race,
-                cb_kwargs=dict(raceday=raceday),
-                meta={
-                    'racelinks': response.meta['racelinks']
-                }
-            )
+        yield from assembly.add(racelink, race)
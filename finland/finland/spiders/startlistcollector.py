@@ -4,12 +4,12 @@ from scrapy_splash import SplashRequest
 from w3lib.html import remove_tags
 
 from finland.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import RacedayAssembly
 
 import datetime
-import os
 
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/finland'
 BASE_URL = 'https://heppa.hippos.fi'
 START_URL = f'{BASE_URL}/heppa/racing/RaceCalendar.html'
 RACEDAY_URL = BASE_URL + '/heppa/app?page=racing%2FRaceProgramMain&service=external&sp={}'
@@ -27,6 +27,8 @@ class StartlistcollectorSpider(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         yield SplashRequest(url=START_URL,
                             callback=self.parse_calendar)
 
@@ -49,7 +51,7 @@ class StartlistcollectorSpider(Spider):
                 raceday.get_output_value('date').replace('-', '_'),
                 raceday.get_output_value('racetrack_code').lower()]) + '.json'
 
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'startlist', filename)):
+            if not self.collected.contains('startlist', filename):
                 yield SplashRequest(url=RACEDAY_URL.format(raceday.get_output_value("link")),
                                     callback=self.parse_day,
                                     cb_kwargs=dict(raceday=raceday))
@@ -77,17 +79,19 @@ class StartlistcollectorSpider(Spider):
             races.append(race)
 
         if len(races) != 0:
-            yield SplashRequest(url=RACE_URL.format(races[0].get_output_value('link')),
-                                callback=self.parse_race,
-                                cb_kwargs=dict(raceday=raceday),
-                                meta = {'races': races})
+            assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
 
+            for race in races:
+                yield SplashRequest(url=RACE_URL.format(race.get_output_value('link')),
+                                    callback=self.parse_race,
+                                    errback=assembly.errback,
+                                    cb_kwargs=dict(raceday=raceday, race=race, assembly=assembly),
+                                    meta=assembly.meta(race.get_output_value('link')))
 
-    def parse_race(self, response, raceday):
-        races = response.meta['races']
+            yield from assembly.start()
 
-        race = races.pop(0)
 
+    def parse_race(self, response, raceday, race, assembly):
         starters = []
 
         rows = response.xpath('//table[@class="race_program"]//tr')[ : -1]
@@ -166,13 +170,4 @@ class StartlistcollectorSpider(Spider):
 
         race.add_value('starters', starters)
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield SplashRequest(url=RACE_URL.format(races[0].get_output_value('link')),
-                                callback=self.parse_race,
-                                cb_kwargs=dict(raceday=raceday),
-                                meta = {'races': races})
+        yield from assembly.add(race.get_output_value('link'), race)
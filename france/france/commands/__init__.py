@@ -0,0 +1,2 @@
+# This package contains the custom commands of the project, see COMMANDS_MODULE
+# in settings.py.
@@ -0,0 +1,7 @@
+from standardbred.commands import indexidentities
+
+from france.pipelines import JSON_DIRECTORY
+
+
+class Command(indexidentities.Command):
+    json_directory = JSON_DIRECTORY
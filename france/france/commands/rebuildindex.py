@@ -0,0 +1,7 @@
+from standardbred.commands import rebuildindex
+
+from france.pipelines import JSON_DIRECTORY
+
+
+class Command(rebuildindex.Command):
+    json_directory = JSON_DIRECTORY
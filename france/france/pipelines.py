@@ -1,52 +1,141 @@
 from france.items import RacedayItem, HorseItem
+from standardbred.collected import CollectedIndex, collected_key
+from standardbred.segments import SegmentWriter
+from standardbred.registry import Registry
+from standardbred.identity import IdentityIndex
+from standardbred.workers import WriterPool
 
-import json
 import os
 
-# from horses.db.connect import DB
-# from horses.horses.horse import insert_pedigree, insert_horse, insert_offspring, insert_result_summary, find_organisation
-
 JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/france'
 # ORGANISATION = 'LeTrot'
 
+
+def horse_key(horse):
+    """
+    The key of a horse in the registry and the identity index, the same as
+    the key of its json file, the part of the link after the first '/'. None
+    when the horse has no link.
+    """
+    if horse.get('link') in (None, ''):
+        return None
+
+    link = str(horse['link'])
+
+    return link.split('/')[1] if '/' in link else link
+
+
 class FrancePipeline(object):
+    def open_spider(self, spider):
+        self.collected = CollectedIndex.from_crawler(spider.crawler)
+
+        if spider.settings.get('OUTPUT_FORMAT') == 'segments':
+            self.segments = SegmentWriter.from_crawler(spider.crawler, JSON_DIRECTORY)
+        else:
+            self.segments = None
+
+        if spider.settings.get('OUTPUT_FORMAT') == 'registry':
+            self.registry = Registry.from_crawler(spider.crawler)
+        else:
+            self.registry = None
+
+        if spider.settings.get('IDENTITY_INDEX'):
+            self.identities = IdentityIndex.from_crawler(spider.crawler)
+        else:
+            self.identities = None
+
+        self.writer = WriterPool.from_crawler(spider.crawler)
+
+
+    def close_spider(self, spider):
+        closed = self.writer.close()
+
+        if self.segments:
+            closed.addCallback(lambda _: self.synced(self.segments.close()))
+
+        if self.registry:
+            closed.addCallback(lambda _: self.registry.close())
+
+        if self.identities:
+            closed.addCallback(lambda _: self.identities.close())
+
+        return closed
+
+
+    def write_json(self, outfile, item):
+        """
+        Writes the item to outfile, unless outfile already has the same json,
+        so a reparse only touches the files that changed. Runs in a thread of
+        the writer.
+        """
+        content = self.writer.dumps(item)
+
+        if os.path.exists(outfile):
+            with open(outfile) as f:
+                if f.read() == content:
+                    return 'unchanged'
+
+        with open(outfile, 'w') as f:
+            f.write(content)
+
+        return 'written'
+
+
+    def written(self, result, kind, filename, spider):
+        if result is not None:
+            spider.crawler.stats.inc_value(f'pipeline/{result}')
+
+        # only once it is on disk
+        self.collected.add(kind, filename)
+
+
+    def synced(self, keys):
+        """
+        Adds the items the segments have synced to the collected index, the
+        ones that have only been written could still be lost.
+        """
+        for kind, key in keys:
+            self.collected.add(kind, key)
+
+
+    def write_failed(self, failure, filename, spider):
+        spider.logger.error(f'Could not write {filename}: {failure.getErrorMessage()}')
+        spider.crawler.stats.inc_value('pipeline/failed')
+
+
+    def write(self, kind, filename, outfile, item, spider):
+        """
+        Hands the item to the writer, the filename is returned when the writer
+        has room for another item.
+        """
+        # racedays are still written as json
+        if self.registry and kind == 'horses':
+            written = self.writer.submit('registry', self.registry.add, item)
+        elif self.segments:
+            written = self.writer.submit('segments', self.segments.write, kind, filename, item)
+        else:
+            written = self.writer.submit(outfile, self.write_json, outfile, item)
+
+        if self.segments:
+            written.addCallbacks(self.synced, self.write_failed, errbackArgs=(filename, spider))
+        else:
+            written.addCallbacks(self.written, self.write_failed,
+                                 callbackArgs=(kind, filename, spider), errbackArgs=(filename, spider))
+
+        if self.identities and kind == 'horses':
+            indexed = self.writer.submit('identities', self.identities.add, item, collected_key(filename))
+            indexed.addErrback(self.write_failed, filename, spider)
+
+        return self.writer.room().addCallback(lambda _: filename)
+
+
     def process_item(self, item, spider):
         if isinstance(item, RacedayItem):
             filename    = '_'.join([item['date'].replace('-', '_'), item['racetrack_code']]) + '.json'
             outfile     = os.path.join(JSON_DIRECTORY, item['status'], filename)
-            json.dump(dict(item),
-                      open(outfile, 'w'),
-                      indent = 4
-                      )
-            return filename
+            return self.write(item['status'], filename, outfile, item, spider)
 
         elif isinstance(item, HorseItem):
             filename    = item['link'].split('/')[1] + '.json'
             outfile     = os.path.join(JSON_DIRECTORY, 'horses', filename)
-            json.dump(dict(item),
-                      open(outfile, 'w'),
-                      indent = 4
-                      )
-            return filename
-
-
-# class DBPipeline(object):
-#     def open_spider(self, spider):
-#         self.db = DB().connect()
-#
-#         self.organisation = find_organisation(self.db, ORGANISATION)
-#
-#     def close_spider(self, spider):
-#         self.db.close()
-#
-#     def process_item(self, item, spider):
-#         if isinstance(item, HorseItem):
-#             horse = insert_pedigree(self.db, self.organisation, item)
-#
-#             if item.get('offspring'):
-#                 insert_offspring(self.db, self.organisation, item['offspring'], horse)
-#
-#             if item.get('start_summary'):
-#                 insert_result_summary(self.db, self.organisation, item['start_summary'], horse)
-#
-#         return item
+            return self.write('horses', filename, outfile, item, spider)
@@ -5,12 +5,12 @@ from w3lib.html import remove_tags
 from scrapy_splash import SplashRequest
 
 from france.items import HorseItem
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree, BREADTH_FIRST
 
 import datetime
 import json
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/france'
 
 BASE_URL = 'https://www.letrot.com/stats/fiche-cheval/{}/'
 
@@ -23,41 +23,10 @@ def parse_pedigree(html, horse):
     cells = html.xpath('//div[@class="root"]//a[contains(@id,"_")]')
     cells = {x.attrib['id']: handle_cell(x) for x in cells}
 
-    add_parents(cells.get('4_1', None), cells.get('5_1', None), cells.get('5_2', None))
-    add_parents(cells.get('4_2', None), cells.get('5_3', None), cells.get('5_4', None))
-    add_parents(cells.get('4_3', None), cells.get('5_5', None), cells.get('5_6', None))
-    add_parents(cells.get('4_4', None), cells.get('5_7', None), cells.get('5_8', None))
-    add_parents(cells.get('4_5', None), cells.get('5_9', None), cells.get('5_10', None))
-    add_parents(cells.get('4_6', None), cells.get('5_11', None), cells.get('5_12', None))
-    add_parents(cells.get('4_7', None), cells.get('5_13', None), cells.get('5_14', None))
-    add_parents(cells.get('4_8', None), cells.get('5_15', None), cells.get('5_16', None))
-    add_parents(cells.get('4_9', None), cells.get('5_17', None), cells.get('5_18', None))
-    add_parents(cells.get('4_10', None), cells.get('5_19', None), cells.get('5_20', None))
-    add_parents(cells.get('4_11', None), cells.get('5_21', None), cells.get('5_22', None))
-    add_parents(cells.get('4_12', None), cells.get('5_23', None), cells.get('5_24', None))
-    add_parents(cells.get('4_13', None), cells.get('5_25', None), cells.get('5_26', None))
-    add_parents(cells.get('4_14', None), cells.get('5_27', None), cells.get('5_28', None))
-    add_parents(cells.get('4_15', None), cells.get('5_29', None), cells.get('5_30', None))
-    add_parents(cells.get('4_16', None), cells.get('5_31', None), cells.get('5_32', None))
-
-    add_parents(cells.get('3_1', None), cells.get('4_1', None), cells.get('4_2', None))
-    add_parents(cells.get('3_2', None), cells.get('4_3', None), cells.get('4_4', None))
-    add_parents(cells.get('3_3', None), cells.get('4_5', None), cells.get('4_6', None))
-    add_parents(cells.get('3_4', None), cells.get('4_7', None), cells.get('4_8', None))
-    add_parents(cells.get('3_5', None), cells.get('4_9', None), cells.get('4_10', None))
-    add_parents(cells.get('3_6', None), cells.get('4_11', None), cells.get('4_12', None))
-    add_parents(cells.get('3_7', None), cells.get('4_13', None), cells.get('4_14', None))
-    add_parents(cells.get('3_8', None), cells.get('4_15', None), cells.get('4_16', None))
-
-    add_parents(cells.get('2_1', None), cells.get('3_1', None), cells.get('3_2', None))
-    add_parents(cells.get('2_2', None), cells.get('3_3', None), cells.get('3_4', None))
-    add_parents(cells.get('2_3', None), cells.get('3_5', None), cells.get('3_6', None))
-    add_parents(cells.get('2_4', None), cells.get('3_7', None), cells.get('3_8', None))
-
-    add_parents(cells.get('1_1', None), cells.get('2_1', None), cells.get('2_2', None))
-    add_parents(cells.get('1_2', None), cells.get('2_3', None), cells.get('2_4', None))
-
-    add_parents(horse, cells.get('1_1', None), cells.get('1_2', None))
+    ancestors = [cells.get(f'{generation}_{place}') for generation in range(1, 6)
+                 for place in range(1, 2 ** generation + 1)]
+
+    build_pedigree(horse, ancestors, BREADTH_FIRST)
 
 
 def handle_cell(cell):
@@ -74,15 +43,6 @@ def handle_cell(cell):
     return horse
 
 
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 class HorseCollector(Spider):
     """
     Collects horses from 'letrot.com'
@@ -103,14 +63,19 @@ class HorseCollector(Spider):
 
 
     def start_requests(self):
-        yield SplashRequest(
-            url=BASE_URL.format(self.id) + 'courses/dernieres-performances',
-            callback=self.parse,
-            cb_kwargs=dict(id=self.id),
-            args={
-                'wait': 5,
-            }
-        )
+        self.frontier = Frontier.from_crawler(self.crawler, self.id.replace('/', '_'),
+                                              filename=lambda x: x.split('/')[1] + '.json')
+
+        for id in self.frontier.start(self.id):
+            yield SplashRequest(
+                url=BASE_URL.format(id) + 'courses/dernieres-performances',
+                callback=self.parse,
+                cb_kwargs=dict(id=id),
+                args={
+                    'wait': 5,
+                },
+                priority=self.frontier.priority(id)
+            )
 
     def parse(self, response, id):
         horse = ItemLoader(item=HorseItem(), selector=response)
@@ -266,13 +231,12 @@ class HorseCollector(Spider):
                     if sire.get_output_value('name'):
                         offspring.add_value('sire', sire.load_item())
 
-                    filename = offspring.get_output_value('link').split('/')[1] + '.json'
-
-                    if not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', filename)):
+                    if self.frontier.schedule(offspring.get_output_value('link'), parent=id, horse=offspring.load_item()):
                         yield SplashRequest(
                             url=BASE_URL.format(offspring.get_output_value('link')) + 'courses/dernieres-performances',
                             callback=self.parse,
-                            cb_kwargs=dict(id=offspring.get_output_value('link'))
+                            cb_kwargs=dict(id=offspring.get_output_value('link')),
+                            priority=self.frontier.priority(offspring.get_output_value('link'))
                         )
 
                 elif row.xpath('./td[4]/a'):
@@ -342,13 +306,12 @@ class HorseCollector(Spider):
 
                 offspring.add_value('start_summary', start_summary)
 
-            filename = offspring.get_output_value('link').split('/')[1] + '.json'
-
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', filename)):
+            if self.frontier.schedule(offspring.get_output_value('link'), parent=id, horse=offspring.load_item()):
                 yield SplashRequest(
                     url=BASE_URL.format(offspring.get_output_value('link')) + 'courses/dernieres-performances',
                     callback=self.parse,
-                    cb_kwargs=dict(id=offspring.get_output_value('link'))
+                    cb_kwargs=dict(id=offspring.get_output_value('link')),
+                    priority=self.frontier.priority(offspring.get_output_value('link'))
                 )
 
             dam_offspring.append(offspring)
@@ -2,13 +2,13 @@ from scrapy.spiders import Spider
 from scrapy.http import Request
 from scrapy.loader import ItemLoader
 from france.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import RacedayAssembly
 
 from scrapy_splash import SplashRequest
 
 from datetime import date, timedelta, datetime
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/france'
 
 BASE_URL = 'https://www.letrot.com'
 CALENDAR_URL = BASE_URL + '/fr/courses/calendrier-resultats?publish_up={}&publish_down={}'
@@ -31,6 +31,8 @@ class ResultCollector(Spider):
         self.end_date = datetime.strptime(end_date, '%Y-%m-%d') if end_date != '' else yesterday
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         url = CALENDAR_URL.format(self.start_date.strftime('%d-%m-%Y'), self.end_date.strftime('%d-%m-%Y'))
         yield SplashRequest(url, self.parse_days)
 
@@ -49,7 +51,7 @@ class ResultCollector(Spider):
             filename = '_'.join([raceday.get_output_value('date').replace('-', '_'),
                                 raceday.get_output_value('racetrack_code')]) + '.json'
 
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename)):
+            if not self.collected.contains('result', filename):
                 yield SplashRequest(RACEDAY_URL.format(raceday.get_output_value('link')),
                               self.parse_raceday,
                               cb_kwargs = dict(raceday=raceday),
@@ -81,16 +83,22 @@ class ResultCollector(Spider):
 
                 race.add_xpath('racename', './/span[@class="prix"]')
 
-                races.append({'link': race.get_output_value('link'), 'race': race})
+                races.append(race)
+
+            assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
+
+            for race in races:
+                yield SplashRequest(RACE_URL.format(race.get_output_value('link')),
+                                    self.parse_race,
+                                    errback=assembly.errback,
+                                    cb_kwargs=dict(race=race, assembly=assembly),
+                                    meta=assembly.meta(race.get_output_value('link')),
+                                    args = {'wait': 5})
 
-            yield SplashRequest(RACE_URL.format(races[0]['link']),
-                                self.parse_race,
-                                cb_kwargs=dict(raceday=raceday, races=races),
-                                args = {'wait': 5})
+            yield from assembly.start()
 
 
-    def parse_race(self, response, raceday, races):
-        race = races.pop(0)['race']
+    def parse_race(self, response, race, assembly):
 
         for order, row in enumerate(response.xpath('//table[@id="result_table"]//tr')[ 1 : ], 1):
             starter = ItemLoader(item=RaceStarterItem(), selector=row)
@@ -125,13 +133,4 @@ class ResultCollector(Spider):
 
             race.add_value('starters', starter.load_item())
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield SplashRequest(RACE_URL.format(races[0]['link']),
-                                self.parse_race,
-                                cb_kwargs=dict(raceday=raceday, races=races),
-                                args = {'wait': 5})
+        yield from assembly.add(race.get_output_value('link'), race)
@@ -2,14 +2,15 @@ from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from scrapy.selector import Selector
 from germany.items import HorseItem
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree, farthest_first, BREADTH_FIRST
+from standardbred.splashwait import lua_script
 from w3lib.html import remove_tags
 
 from scrapy_splash import SplashRequest
 
 import json
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/germany'
 BASE_URL = 'https://www.hvtonline.de'
 
 
@@ -31,15 +32,6 @@ def handle_cell(cell):
     return horse
 
 
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 class HorseCollector(Spider):
     """
     Collects horses from 'https://www.hvtonline.de'.
@@ -54,13 +46,14 @@ class HorseCollector(Spider):
     def __init__(self, start_id, *args, **kwargs):
         super(HorseCollector, self).__init__(*args, **kwargs)
         self.id = start_id
-        self.lua_source = """
+        self.lua_source = lua_script("""
                           treat = require('treat')
                           function main(splash, args)
                             splash.response_body_enabled = true
                             local htmlList = {}
+                            track_requests(splash)
                             splash:go(args.url)
-                            assert(splash:wait(2))
+                            wait_for_idle(splash)
                             splash:on_response(
                                 function(response)
                                     htmlList[#htmlList + 1] = treat.as_string(response.body)
@@ -71,7 +64,7 @@ class HorseCollector(Spider):
                                 http_method="POST",
                                 body="horseid=" .. args.id .. "&p=1"
                             }
-                            assert(splash:wait(5))
+                            wait_for_idle(splash)
 
                             tabs = {"1", "2", "3", "4"}
                             for _, tabNo in ipairs(tabs) do
@@ -80,27 +73,32 @@ class HorseCollector(Spider):
                                     http_method="POST",
                                     body="horseid=" .. args.id .. "&tab=" ..tabNo
                                 }
-                                assert(splash:wait(5))
+                                wait_for_idle(splash)
                             end
                             return treat.as_array(htmlList)
                           end
-                          """
+                          """)
 
 
     def start_requests(self):
-        yield SplashRequest(
-                url=BASE_URL,
-                callback=self.parse,
-                endpoint='execute',
-                args={
-                    'wait': 5,
-                    'lua_source': self.lua_source,
-                    'id': self.id
-                }
-            )
-
-
-    def parse(self, response):
+        self.frontier = Frontier.from_crawler(self.crawler, self.id)
+
+        for horse_id in self.frontier.start(self.id):
+            yield SplashRequest(
+                    url=BASE_URL,
+                    callback=self.parse,
+                    endpoint='execute',
+                    args={
+                        'wait': 5,
+                        'lua_source': self.lua_source,
+                        'id': horse_id
+                    },
+                    cb_kwargs=dict(horse_id=horse_id),
+                    priority=self.frontier.priority(horse_id)
+                )
+
+
+    def parse(self, response, horse_id):
         for index, res in enumerate(response.data, 1):
             if index == 1:
                 horse_json = json.loads(res)
@@ -232,41 +230,7 @@ class HorseCollector(Spider):
                 if len(dams_offspring_list[2]) != 0:
                     ancestors[55].add_value('offspring', dams_offspring_list[2])
 
-                add_parents(ancestors[32], ancestors[0], ancestors[1])
-                add_parents(ancestors[33], ancestors[2], ancestors[3])
-                add_parents(ancestors[34], ancestors[4], ancestors[5])
-                add_parents(ancestors[35], ancestors[6], ancestors[7])
-                add_parents(ancestors[36], ancestors[8], ancestors[9])
-                add_parents(ancestors[37], ancestors[10], ancestors[11])
-                add_parents(ancestors[38], ancestors[12], ancestors[13])
-                add_parents(ancestors[39], ancestors[14], ancestors[15])
-                add_parents(ancestors[40], ancestors[16], ancestors[17])
-                add_parents(ancestors[41], ancestors[18], ancestors[19])
-                add_parents(ancestors[42], ancestors[20], ancestors[21])
-                add_parents(ancestors[43], ancestors[22], ancestors[23])
-                add_parents(ancestors[44], ancestors[24], ancestors[25])
-                add_parents(ancestors[45], ancestors[26], ancestors[27])
-                add_parents(ancestors[46], ancestors[28], ancestors[29])
-                add_parents(ancestors[47], ancestors[30], ancestors[31])
-
-                add_parents(ancestors[48], ancestors[32], ancestors[33])
-                add_parents(ancestors[49], ancestors[34], ancestors[35])
-                add_parents(ancestors[50], ancestors[36], ancestors[37])
-                add_parents(ancestors[51], ancestors[38], ancestors[39])
-                add_parents(ancestors[52], ancestors[40], ancestors[41])
-                add_parents(ancestors[53], ancestors[42], ancestors[43])
-                add_parents(ancestors[54], ancestors[44], ancestors[45])
-                add_parents(ancestors[55], ancestors[46], ancestors[47])
-
-                add_parents(ancestors[56], ancestors[48], ancestors[49])
-                add_parents(ancestors[57], ancestors[50], ancestors[51])
-                add_parents(ancestors[58], ancestors[52], ancestors[53])
-                add_parents(ancestors[59], ancestors[54], ancestors[55])
-
-                add_parents(ancestors[60], ancestors[56], ancestors[57])
-                add_parents(ancestors[61], ancestors[58], ancestors[59])
-
-                add_parents(horse, ancestors[60], ancestors[61])
+                build_pedigree(horse, farthest_first(ancestors), BREADTH_FIRST)
 
             elif index == 5:
                 offspring_html = Selector(text=res)
@@ -292,9 +256,10 @@ class HorseCollector(Spider):
                         'purse': offspring_row.xpath('.//td[6]/text()').get(),
                     })
 
+                    offspring_id = offspring.get_output_value('link')
+
                     if (horse.get_output_value('sex') == 'mare' and
-                        not os.path.exists(os.path.join(
-                            JSON_DIRECTORY, 'horses', offspring.get_output_value('link') + '.json'))):
+                        self.frontier.schedule(offspring_id, parent=horse_id, horse=offspring.load_item())):
 
                         yield SplashRequest(
                             url=BASE_URL,
@@ -303,8 +268,10 @@ class HorseCollector(Spider):
                             args={
                                 'wait': 5,
                                 'lua_source': self.lua_source,
-                                'id': offspring.get_output_value('link')
-                            }
+                                'id': offspring_id
+                            },
+                            cb_kwargs=dict(horse_id=offspring_id),
+                            priority=self.frontier.priority(offspring_id)
                         )
 
                     horse.add_value('offspring', offspring.load_item())
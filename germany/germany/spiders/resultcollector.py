@@ -1,17 +1,22 @@
 from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from germany.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import RacedayAssembly
 
 from scrapy_splash import SplashRequest
 
 import datetime
-import os
 import calendar
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/germany'
 BASE_URL = 'https://www.hvtonline.de/'
 CALENDAR_URL = BASE_URL + 'monatsrennberichte/{}/'
 
+RACEDAY_LINKS = '//table[@class="rboverview"]//a'
+RACE_LINKS = '//div[@class="rbleftcol"]//a[contains(@href,"https:")]'
+# the browser adds a tbody to the table, the html from the site may not have it
+STARTER_ROWS = '//table[@class="rbfull"]/tbody/tr | //table[@class="rbfull"]/tr'
+
 
 class ResultcollectorSpider(Spider):
     """
@@ -20,6 +25,15 @@ class ResultcollectorSpider(Spider):
     """
     name = 'resultcollector'
     allowed_domains = ['hvtonline.de']
+    # the calendar is asked for a month at a time, wherever the date range
+    # starts, so 'scrapy reparse' can split a range in windows
+    reparse_window_days = 31
+
+    # these pages are fetched without Splash as long as the xpath matches,
+    # the raceday and race pages have the xpath in the meta of their requests
+    splash_fast_path = {
+        r'/monatsrennberichte/\d+/': RACEDAY_LINKS
+    }
 
 
     def __init__(self, start_date = '', end_date = '', *args, **kwargs):
@@ -30,6 +44,8 @@ class ResultcollectorSpider(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         while self.start_date <= self.end_date:
             yield SplashRequest(
                         url=CALENDAR_URL.format(self.start_date.strftime('%Y%m')),
@@ -47,7 +63,7 @@ class ResultcollectorSpider(Spider):
         start_date = response.meta['start_date']
         end_date = response.meta['end_date']
 
-        for raceday_link in response.xpath('//table[@class="rboverview"]//a'):
+        for raceday_link in response.xpath(RACEDAY_LINKS):
             raceday = ItemLoader(item = RacedayItem(), selector=raceday_link)
 
             raceday.add_xpath('date', './@href')
@@ -62,28 +78,32 @@ class ResultcollectorSpider(Spider):
 
             raceday_date = datetime.date(*[int(x) for x in raceday.get_output_value('date').split('-')])
 
-            if (not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename)) and
+            if (not self.collected.contains('result', filename) and
                 response.meta['start_date'] <= raceday_date <= response.meta['end_date']):
                 yield SplashRequest(
                             url=BASE_URL + raceday.get_output_value('link'),
                             callback=self.parse_raceday,
-                            cb_kwargs=dict(raceday=raceday))
+                            cb_kwargs=dict(raceday=raceday),
+                            meta={'splash_fast_path_xpath': RACE_LINKS})
 
 
     def parse_raceday(self, response, raceday):
-        race_links = response.xpath('//div[@class="rbleftcol"]//a[contains(@href,"https:")]/@href').getall()
+        race_links = response.xpath(f'{RACE_LINKS}/@href').getall()
 
-        yield SplashRequest(
-                    url=race_links[0],
-                    callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'race_links': race_links})
+        assembly = RacedayAssembly.from_spider(self, raceday, race_links)
+
+        for race_link in race_links:
+            yield SplashRequest(
+                        url=race_link,
+                        callback=self.parse_race,
+                        errback=assembly.errback,
+                        cb_kwargs=dict(raceday=raceday, race_link=race_link, assembly=assembly),
+                        meta=assembly.meta(race_link, splash_fast_path_xpath=STARTER_ROWS))
 
+        yield from assembly.start()
 
-    def parse_race(self, response, raceday):
-        race_links = response.meta['race_links']
-        race_link = race_links.pop(0)
 
+    def parse_race(self, response, raceday, race_link, assembly):
         race = ItemLoader(item = RaceItem(), selector=response.xpath('//div[@id="fullwidth"]'))
 
         race.add_value('link', race_link)
@@ -112,7 +132,7 @@ class ResultcollectorSpider(Spider):
         starters = []
         order = 0
 
-        for index, row in enumerate(response.xpath('//table[@class="rbfull"]/tbody/tr'), 1):
+        for index, row in enumerate(response.xpath(STARTER_ROWS), 1):
             if index % 3 == 1:
                 order += 1
 
@@ -211,14 +231,4 @@ class ResultcollectorSpider(Spider):
 
         race.add_value('starters', [x.load_item() for x in starters])
 
-        raceday.add_value('races', race.load_item())
-
-        if len(race_links) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield SplashRequest(
-                        url=race_links[0],
-                        callback=self.parse_race,
-                        cb_kwargs=dict(raceday=raceday),
-                        meta={'race_links': race_links})
+        yield from assembly.add(race_link, race)
@@ -1,16 +1,20 @@
 from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from germany.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import RacedayAssembly
 
 from scrapy_splash import SplashRequest
 
 import datetime
-import os
 
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/germany'
 BASE_URL = 'https://www.hvtonline.de/'
 
+RACEDAY_LINKS = '//p[@class="historyitem"]/a[contains(@href,"starter")]'
+RACE_LINKS = '//div[@class="rightcol"]//a'
+STARTER_ROWS = '//div[@id="cardshort"]/div'
+
 
 class StartlistcollectorSpider(Spider):
     """
@@ -19,15 +23,23 @@ class StartlistcollectorSpider(Spider):
     name = 'startlistcollector'
     allowed_domains = ['hvtonline.de']
 
+    # these pages are fetched without Splash as long as the xpath matches,
+    # the raceday and race pages have the xpath in the meta of their requests
+    splash_fast_path = {
+        r'hvtonline\.de/$': RACEDAY_LINKS
+    }
+
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         yield SplashRequest(
                     url=BASE_URL,
                     callback=self.parse)
 
 
     def parse(self, response):
-        for raceday_link in response.xpath('//p[@class="historyitem"]/a[contains(@href,"starter")]'):
+        for raceday_link in response.xpath(RACEDAY_LINKS):
             raceday = ItemLoader(item = RacedayItem(), selector=raceday_link)
 
             raceday.add_xpath('date', './@href')
@@ -40,30 +52,34 @@ class StartlistcollectorSpider(Spider):
             filename = '_'.join([raceday.get_output_value('date').replace('-', '_'),
                                 raceday.get_output_value('racetrack_code')]) + '.json'
 
-            if not os.path.exists(os.path.join(JSON_DIRECTORY, 'startlist', filename)):
+            if not self.collected.contains('startlist', filename):
                 yield SplashRequest(
                             url=BASE_URL + raceday.get_output_value('link'),
                             callback=self.parse_raceday,
-                            cb_kwargs=dict(raceday=raceday))
+                            cb_kwargs=dict(raceday=raceday),
+                            meta={'splash_fast_path_xpath': RACE_LINKS})
 
 
     def parse_raceday(self, response, raceday):
         # The only information we're interested in here is the links, this page
         # does contain basic startlists, there is more information in the pages
         # for each race.
-        race_links = response.xpath('//div[@class="rightcol"]//a/@href').getall()
+        race_links = response.xpath(f'{RACE_LINKS}/@href').getall()
 
-        yield SplashRequest(
-                    url=race_links[0],
-                    callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'race_links': race_links})
+        assembly = RacedayAssembly.from_spider(self, raceday, race_links)
 
+        for race_link in race_links:
+            yield SplashRequest(
+                        url=race_link,
+                        callback=self.parse_race,
+                        errback=assembly.errback,
+                        cb_kwargs=dict(raceday=raceday, race_link=race_link, assembly=assembly),
+                        meta=assembly.meta(race_link, splash_fast_path_xpath=STARTER_ROWS))
 
-    def parse_race(self, response, raceday):
-        race_links = response.meta['race_links']
-        race_link = race_links.pop(0)
+        yield from assembly.start()
 
+
+    def parse_race(self, response, raceday, race_link, assembly):
         race = ItemLoader(item=RaceItem(), selector=response.xpath('//div[@id="raceheaderleft"]'))
 
         race.add_value('link', race_link)
@@ -80,7 +96,7 @@ class StartlistcollectorSpider(Spider):
         distance = str(race.get_output_value('distance'))
         postposition = 1
 
-        for row in response.xpath('//div[@id="cardshort"]/div'):
+        for row in response.xpath(STARTER_ROWS):
             # if the race use the standing startmethod the first horse at each distance
             # is preceded by two divs, one that contains the distance and one empty
             if row.xpath('./@class').get() == 'band':
@@ -142,14 +158,4 @@ class StartlistcollectorSpider(Spider):
 
             postposition += 1
 
-        raceday.add_value('races', race.load_item())
-
-        if len(race_links) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield SplashRequest(
-                        url=race_links[0],
-                        callback=self.parse_race,
-                        cb_kwargs=dict(raceday=raceday),
-                        meta = {'race_links': race_links})
+        yield from assembly.add(race_link, race)
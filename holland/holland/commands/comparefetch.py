@@ -0,0 +1,7 @@
+from standardbred.commands import comparefetch
+
+from holland import fixtures
+
+
+class Command(comparefetch.Command):
+    fixtures = fixtures
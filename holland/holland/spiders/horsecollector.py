@@ -3,6 +3,7 @@ from scrapy.loader import ItemLoader
 from scrapy_splash import SplashRequest
 
 from holland.items import HorseItem
+from standardbred.pedigree import build_pedigree, DEPTH_FIRST
 
 
 JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/holland'
@@ -25,15 +26,6 @@ def handle_cell(cell):
     return horse
 
 
-def add_parent(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 class HorseCollector(Spider):
     """
     Collects information about horses from 'https://www.ndr.nl'.
@@ -139,24 +131,8 @@ class HorseCollector(Spider):
         ancestors = [handle_cell(x) for x in
                 response.xpath('//div[@id="ndr-tab-stamboom"]//td')]
 
-        add_parent(ancestors[3], ancestors[4], ancestors[5])
-        add_parent(ancestors[6], ancestors[7], ancestors[8])
-        add_parent(ancestors[10], ancestors[11], ancestors[12])
-        add_parent(ancestors[13], ancestors[14], ancestors[15])
-        add_parent(ancestors[18], ancestors[19], ancestors[20])
-        add_parent(ancestors[21], ancestors[22], ancestors[23])
-        add_parent(ancestors[25], ancestors[26], ancestors[27])
-        add_parent(ancestors[28], ancestors[29], ancestors[30])
-
-        add_parent(ancestors[2], ancestors[3], ancestors[6])
-        add_parent(ancestors[9], ancestors[10], ancestors[13])
-        add_parent(ancestors[17], ancestors[18], ancestors[21])
-        add_parent(ancestors[24], ancestors[25], ancestors[28])
-
-        add_parent(ancestors[1], ancestors[2], ancestors[9])
-        add_parent(ancestors[16], ancestors[17], ancestors[24])
-
-        add_parent(horse, ancestors[1], ancestors[16])
+        # the first cell is the horse itself
+        build_pedigree(horse, ancestors[1:31], DEPTH_FIRST)
 
         # yield horse.load_item()
         print(horse.load_item())
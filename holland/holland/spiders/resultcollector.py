@@ -1,13 +1,12 @@
 from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from holland.items import RacedayItem, RaceItem, TrotRaceStarterItem, GallopRaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
 
 from scrapy_splash import SplashRequest
 
 from datetime import date, timedelta, datetime
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/holland'
 
 BASE_URL = 'https://www.ndr.nl'
 CALENDAR_BODY = 'action=zoek_koersen&archief=true&jaar={}&maand={}'
@@ -22,6 +21,15 @@ class ResultCollector(Spider):
     """
     name = 'resultcollector'
     allowed_domains = ['ndr.nl']
+    # the calendar is asked for a month at a time, wherever the date range
+    # starts, so 'scrapy reparse' can split a range in windows
+    reparse_window_days = 31
+
+    # these pages are fetched without Splash as long as the xpath matches
+    splash_fast_path = {
+        r'admin-ajax\.php\?action=zoek_koersen': '//li',
+        r'admin-ajax\.php\?action=do_search': '//div[contains(@id,"ndr-tab")]'
+    }
 
     def __init__(self, start_date = '', end_date = '', *args, **kwargs):
         super(ResultCollector, self).__init__(*args, **kwargs)
@@ -31,6 +39,8 @@ class ResultCollector(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         current_date = self.start_date
 
         while current_date <= self.end_date:
@@ -68,7 +78,7 @@ class ResultCollector(Spider):
                 filename = '_'.join([raceday.get_output_value('date').replace('-', '_'),
                             raceday.get_output_value('racetrack').lower()]) + '.json'
 
-                if not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename)):
+                if not self.collected.contains('result', filename):
                     body = RACEDAY_BODY.format(raceday.get_output_value('link'),
                                                 item.xpath('./@data-koersnr').get())
 
@@ -1,13 +1,12 @@
 from scrapy.spiders import Spider
 from scrapy.loader import ItemLoader
 from holland.items import RacedayItem, RaceItem, TrotRaceStarterItem, HorseItem
+from standardbred.collected import CollectedIndex
 
 from scrapy_splash import SplashRequest
 
 from datetime import date, timedelta
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/holland'
 
 BASE_URL = 'https://www.ndr.nl'
 RACEDAY_BODY = 'action=do_search&koersdag={}&koersnr={}&isAgenda=0&paard=false'
@@ -20,6 +19,11 @@ class StartlistCollector(Spider):
     name = 'startlistcollector'
     allowed_domains = ['ndr.nl']
 
+    # these pages are fetched without Splash as long as the xpath matches
+    splash_fast_path = {
+        r'admin-ajax\.php\?action=do_search': '//div[contains(@id,"ndr-tab")]'
+    }
+
 
     def __init__(self, *args, **kwargs):
         super(StartlistCollector, self).__init__(*args, **kwargs)
@@ -28,6 +32,8 @@ class StartlistCollector(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         yield SplashRequest(
                     url=BASE_URL + '/?page_id=3712',
                     callback=self.parse,
@@ -50,7 +56,7 @@ class StartlistCollector(Spider):
                 filename = '_'.join([raceday.get_output_value('date').replace('-', '_'),
                             raceday.get_output_value('racetrack').lower()]) + '.json'
 
-                if not os.path.exists(os.path.join(JSON_DIRECTORY, 'startlist', filename)):
+                if not self.collected.contains('startlist', filename):
                     body = RACEDAY_BODY.format(
                             raceday.get_output_value('link'), raceday_row.xpath('./@data-koersnr').get())
 
@@ -0,0 +1,5 @@
+from standardbred.commands import loadhorse
+
+
+class Command(loadhorse.Command):
+    pass
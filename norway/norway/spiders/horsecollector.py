@@ -1,25 +1,17 @@
 from scrapy.spiders import Spider
-from scrapy.loader import ItemLoader
 from scrapy.http import JsonRequest
 from datetime import date
 
 from norway.items import HorseItem, SummaryItem, RacelineItem
+from standardbred.itemfactory import FastLoader
+from standardbred.assembly import Assembly
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree
 
 import json
-import os
 
 
 BASE_URL = 'https://www.rikstoto.no/api'
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/norway'
-
-
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
 
 
 class HorseCollector(Spider):
@@ -41,10 +33,15 @@ class HorseCollector(Spider):
         """
         Get registration information for the horse specified by start_id.
         """
-        yield JsonRequest(
-            url=f'{BASE_URL}/infopanel/liferow/horse/{self.start_id}',
-            callback=self.parse
-        )
+        self.frontier = Frontier.from_crawler(self.crawler, self.start_id,
+                                              filename=lambda x: f'{x.replace(" ", "_")}.json')
+
+        for registration in self.frontier.start(self.start_id):
+            yield JsonRequest(
+                url=f'{BASE_URL}/infopanel/liferow/horse/{registration}',
+                callback=self.parse,
+                priority=self.frontier.priority(registration)
+            )
 
 
     def parse(self, response):
@@ -55,7 +52,7 @@ class HorseCollector(Spider):
 
         horse_json = response_json['result']
 
-        horse = ItemLoader(item=HorseItem())
+        horse = FastLoader(HorseItem)
 
         horse.add_value('name', horse_json['horseName'])
         horse.add_value('country', horse_json['horseName'])
@@ -75,57 +72,78 @@ class HorseCollector(Spider):
 
     def parse_summary(self, response, horse):
         """
-        Parse the career summary, if the horse has started, get the racelines
-        for each year the horse has made any starts, else continue to the
-        pedigree information.
+        Parse the career summary, then get the racelines for each year the
+        horse has made any starts, the pedigree and the offspring, all at the
+        same time. The horse is loaded by load_horse when all have arrived.
         """
         response_json = json.loads(response.body)
 
-        if len(response_json['result']) == 0:
-            yield JsonRequest(
-                url=f'{BASE_URL}/infopanel/pedigree/{horse.get_output_value("registration")}',
-                callback=self.parse_pedigree,
-                cb_kwargs=dict(horse=horse)
-            )
+        registration = horse.get_output_value('registration')
+
+        summary_years = []
+
+        for summary_json in response_json['result']:
+            summary_years.append(summary_json['year'])
 
-        else:
-            summary_years = []
+            summary = FastLoader(SummaryItem)
 
-            for summary_json in response_json['result']:
-                summary_years.append(summary_json['year'])
+            summary.add_value('year', int(summary_json['year']))
+            summary.add_value('starts', summary_json['numberOfStarts'])
+            summary.add_value('wins', summary_json['numberOfFirstPlaces'])
+            summary.add_value('seconds', summary_json['numberOfSecondPlaces'])
+            summary.add_value('thirds', summary_json['numberOfThirdPlaces'])
+            summary.add_value('mobile_mark', summary_json['autoRecord'])
+            summary.add_value('standing_mark', summary_json['voltRecord'])
+            summary.add_value('purse', summary_json['earnings'] / 100)
 
-                summary = ItemLoader(item=SummaryItem())
+            horse.add_value('start_summary', summary.load_item())
 
-                summary.add_value('year', int(summary_json['year']))
-                summary.add_value('starts', summary_json['numberOfStarts'])
-                summary.add_value('wins', summary_json['numberOfFirstPlaces'])
-                summary.add_value('seconds', summary_json['numberOfSecondPlaces'])
-                summary.add_value('thirds', summary_json['numberOfThirdPlaces'])
-                summary.add_value('mobile_mark', summary_json['autoRecord'])
-                summary.add_value('standing_mark', summary_json['voltRecord'])
-                summary.add_value('purse', summary_json['earnings'] / 100)
+        parts = [(f'{BASE_URL}/infopanel/starts/horse/{registration}/{year}-01-01/{year}-12-31', self.parse_starts)
+                 for year in summary_years]
 
-                horse.add_value('start_summary', summary.load_item())
+        parts.append((f'{BASE_URL}/infopanel/pedigree/{registration}', self.parse_pedigree))
+        parts.append((f'{BASE_URL}/infopanel/offspring/{registration}', self.parse_offspring))
 
+        # the parts are numbered so the starts are added in the order of the
+        # years, before the pedigree and the offspring
+        assembly = Assembly.from_spider(self, range(len(parts)),
+                                        lambda results: self.load_horse(horse, results))
+
+        for part, (url, callback) in enumerate(parts):
             yield JsonRequest(
-                url=f'{BASE_URL}/infopanel/starts/horse/{horse.get_output_value("registration")}/{summary_years[0]}-01-01/{summary_years[0]}-12-31',
-                callback=self.parse_starts,
-                cb_kwargs=dict(horse=horse, summary_years=summary_years)
+                url=url,
+                callback=callback,
+                errback=assembly.errback,
+                cb_kwargs=dict(horse=horse, part=part, assembly=assembly),
+                meta=assembly.meta(part)
             )
 
 
-    def parse_starts(self, response, horse, summary_years):
+    def load_horse(self, horse, results):
+        """
+        Adds the values every part has parsed to the horse, when all parts
+        have arrived.
+        """
+        for values in results:
+            for field, value in values:
+                horse.add_value(field, value)
+
+        return horse.load_item()
+
+
+    def parse_starts(self, response, horse, part, assembly):
         """
-        Parse the racelines from the response, check if there is any yearly
-        summaries left, if so get it and parse it else continue with the pedigree.
+        Parse the racelines for one year.
         """
         response_json = json.loads(response.body)
 
+        values = []
+
         for raceline_json in response_json['result']:
             if raceline_json['raceDayKey'] is None:
                 continue
 
-            raceline = ItemLoader(item=RacelineItem())
+            raceline = FastLoader(RacelineItem)
 
             raceline.add_value('date', raceline_json['raceDate'].split('T')[0])
             raceline.add_value('link', raceline_json['raceDayKey'])
@@ -150,67 +168,41 @@ class HorseCollector(Spider):
                 raceline.add_value('disqualified', raceline_json['kmTime'])
                 raceline.add_value('disqstring', raceline_json['kmTime'])
 
-            horse.add_value('starts', raceline.load_item())
+            values.append(('starts', raceline.load_item()))
 
-        summary_years.pop(0)
+        yield from assembly.add(part, values)
 
-        if len(summary_years) == 0:
-            yield JsonRequest(
-                url=f'{BASE_URL}/infopanel/pedigree/{horse.get_output_value("registration")}',
-                callback=self.parse_pedigree,
-                cb_kwargs=dict(horse=horse)
-            )
 
-        else:
-            yield JsonRequest(
-                url=f'{BASE_URL}/infopanel/starts/horse/{horse.get_output_value("registration")}/{summary_years[0]}-01-01/{summary_years[0]}-12-31',
-                callback=self.parse_starts,
-                cb_kwargs=dict(horse=horse, summary_years=summary_years)
-            )
-
-
-    def parse_pedigree(self, response, horse):
+    def parse_pedigree(self, response, horse, part, assembly):
         """
-        Parse the pedigree then get the list for the horse's offspring.
+        Parse the pedigree, the parents and their ancestors.
         """
         response_json = json.loads(response.body)
 
-        ancestors = []
-
         keys = ['father', 'mother', 'fathersFather', 'fathersMother', 'mothersFather', 'mothersMother',
                 'fathersFathersFather', 'fathersFathersMother', 'fathersMothersFather', 'fathersMothersMother',
                 'mothersFathersFather', 'mothersFathersMother', 'mothersMothersFather', 'mothersMothersMother']
 
-        for key in keys:
-            ancestor_json = response_json['result'][key]
+        ancestors = []
 
-            ancestor = ItemLoader(item=HorseItem())
+        for key in keys:
+            ancestor = FastLoader(HorseItem)
 
-            ancestor.add_value('name', ancestor_json['name'])
-            ancestor.add_value('country', ancestor_json['name'])
+            ancestor.add_value('name', response_json['result'][key]['name'])
+            ancestor.add_value('country', response_json['result'][key]['name'])
             ancestor.add_value('sex', 'horse' if key.endswith('ather') else 'mare')
-            ancestor.add_value('registration', ancestor_json['horseRegistrationNumber'])
+            ancestor.add_value('registration', response_json['result'][key]['horseRegistrationNumber'])
 
             ancestors.append(ancestor)
 
-        add_parents(ancestors[2], ancestors[6], ancestors[7])
-        add_parents(ancestors[3], ancestors[8], ancestors[9])
-        add_parents(ancestors[4], ancestors[10], ancestors[11])
-        add_parents(ancestors[5], ancestors[12], ancestors[13])
-
-        add_parents(ancestors[0], ancestors[2], ancestors[3])
-        add_parents(ancestors[1], ancestors[4], ancestors[5])
+        parents = {}
 
-        add_parents(horse, ancestors[0], ancestors[1])
+        build_pedigree(parents, ancestors)
 
-        yield JsonRequest(
-            url=f'{BASE_URL}/infopanel/offspring/{horse.get_output_value("registration")}',
-            callback=self.parse_offspring,
-            cb_kwargs=dict(horse=horse)
-        )
+        yield from assembly.add(part, list(parents.items()))
 
 
-    def parse_offspring(self, response, horse):
+    def parse_offspring(self, response, horse, part, assembly):
         """
         Parse the list of offspring the horse has. Skip offspring that are
         unregistered. If the horse is a mare and she has offspring that has not
@@ -218,11 +210,13 @@ class HorseCollector(Spider):
         """
         response_json = json.loads(response.body)
 
+        values = []
+
         for offspring_json in response_json['result']:
             if offspring_json['certificationStatus'] == 'Makulert':
                 continue
 
-            offspring = ItemLoader(item=HorseItem())
+            offspring = FastLoader(HorseItem)
 
             offspring.add_value('name', offspring_json['name'])
             offspring.add_value('country', offspring_json['name'])
@@ -230,7 +224,7 @@ class HorseCollector(Spider):
             offspring.add_value('sex', offspring_json['sex'])
             offspring.add_value('birthdate', f'{offspring_json["birthYear"]}-01-01')
 
-            parent = ItemLoader(item=HorseItem())
+            parent = FastLoader(HorseItem)
 
             parent_sex = 'fa' if horse.get_output_value('sex') == 'mare' else 'mo'
 
@@ -242,7 +236,7 @@ class HorseCollector(Spider):
             offspring.add_value('sire' if parent.get_output_value('sex') == 'horse' else 'dam', parent.load_item())
 
             if offspring_json['numberOfStarts'] != 0:
-                summary = ItemLoader(item=SummaryItem())
+                summary = FastLoader(SummaryItem)
 
                 summary.add_value('starts', offspring_json['numberOfStarts'])
                 summary.add_value('wins', offspring_json['numberOfFirstPlaces'])
@@ -254,14 +248,17 @@ class HorseCollector(Spider):
 
                 offspring.add_value('start_summary', summary.load_item())
 
-            outfile = f'{offspring.get_output_value("registration").replace(" ", "_")}.json'
+            registration = offspring.get_output_value('registration')
 
-            if horse.get_output_value('sex') == 'mare' and not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', outfile)):
+            if (horse.get_output_value('sex') == 'mare' and
+                    self.frontier.schedule(registration, parent=horse.get_output_value('registration'),
+                                           horse=offspring.load_item())):
                 yield JsonRequest(
-                    url=f'{BASE_URL}/infopanel/liferow/horse/{offspring.get_output_value("registration")}',
-                    callback=self.parse
+                    url=f'{BASE_URL}/infopanel/liferow/horse/{registration}',
+                    callback=self.parse,
+                    priority=self.frontier.priority(registration)
                 )
 
-            horse.add_value('offspring', offspring.load_item())
+            values.append(('offspring', offspring.load_item()))
 
-        yield horse.load_item()
+        yield from assembly.add(part, values)
@@ -1,14 +1,14 @@
 from scrapy.http import JsonRequest
 from scrapy.spiders import Spider
-from scrapy.loader import ItemLoader
 
 import json
-import os
 from datetime import date, datetime, timedelta
 
 from norway.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import KeyedAssembly, number_order
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/norway'
 BASE_URL = 'https://www.rikstoto.no/Resultater/'
 
 
@@ -35,6 +35,8 @@ class ResultCollector(Spider):
         Get a list of available racedays between start_date and end_date,
         one week at a time.
         """
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         current_date = self.start_date
 
         while current_date <= self.end_date:
@@ -69,7 +71,7 @@ class ResultCollector(Spider):
                     raceday_json['progressStatus'] == 'Finished' and
                     not raceday_json.get('isMultiTrack', False)):
 
-                    raceday = ItemLoader(item=RacedayItem())
+                    raceday = FastLoader(RacedayItem)
 
                     raceday.add_value('status', 'result')
                     raceday.add_value('racetrack', raceday_json['raceDayName'])
@@ -82,52 +84,69 @@ class ResultCollector(Spider):
                         raceday.get_output_value('racetrack').lower() + '.json'
                     ])
 
-                    if not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', outfile)):
-                        yield JsonRequest(
-                            url=f'https://www.rikstoto.no/api/racedays/{raceday.get_output_value("link")}/scratched',
-                            callback=self.parse_scratched,
-                            cb_kwargs=dict(raceday=raceday)
-                        )
+                    if not self.collected.contains('result', outfile):
+                        yield from self.raceday_requests(raceday)
+
 
-    def parse_scratched(self, response, raceday):
+    def raceday_requests(self, raceday):
         """
-        Get a listing of scratched horsese for the current raceday.
+        Get the scratched horses, the odds and the races of the raceday at the
+        same time, the results of the races are requested when the races have
+        arrived. The raceday is loaded by load_raceday when everything has
+        arrived.
+        """
+        link = raceday.get_output_value('link')
+
+        assembly = KeyedAssembly.from_spider(self, ['scratched', 'odds', 'races'],
+                                             lambda results: self.load_raceday(raceday, results))
+
+        for part, url, callback in [
+                ('scratched', f'https://www.rikstoto.no/api/racedays/{link}/scratched', self.parse_scratched),
+                ('odds', f'https://www.rikstoto.no/api/results/racedays/{link}/raceresults', self.parse_odds),
+                ('races', f'https://www.rikstoto.no/api/racedays/{link}/raceInfo', self.parse_races)]:
+            yield JsonRequest(
+                url=url,
+                callback=callback,
+                errback=assembly.errback,
+                cb_kwargs=dict(raceday=raceday, assembly=assembly),
+                meta=assembly.meta(part)
+            )
+
+
+    def parse_scratched(self, response, raceday, assembly):
+        """
+        Get a listing of scratched horses for the current raceday, keyed by
+        racenumber.
         """
         response_json = json.loads(response.body)
 
-        yield JsonRequest(
-            url=f'https://www.rikstoto.no/api/results/racedays/{raceday.get_output_value("link")}/raceresults',
-            callback=self.parse_odds,
-            cb_kwargs=dict(raceday=raceday, scratched=response_json['result'])
-        )
+        yield from assembly.add('scratched', response_json['result'])
 
 
-    def parse_odds(self, response, raceday, scratched):
+    def parse_odds(self, response, raceday, assembly):
         """
-        Get a listing of win and show odds for the current raceday.
+        Get a listing of win and show odds for the current raceday, keyed by
+        racenumber.
         """
         response_json = json.loads(response.body)
 
         odds = {'win': response_json['result']['finalOdds']['winOdds'],
                 'place': response_json['result']['finalOdds']['placeOdds']}
 
-        yield JsonRequest(
-            url=f'https://www.rikstoto.no/api/racedays/{raceday.get_output_value("link")}/raceInfo',
-            callback=self.parse_races,
-            cb_kwargs=dict(raceday=raceday, scratched=scratched, odds=odds)
-        )
+        yield from assembly.add('odds', odds)
 
 
-    def parse_races(self, response, raceday, scratched, odds):
+    def parse_races(self, response, raceday, assembly):
         """
-        Get the list of races for the current raceday.
+        Get the list of races for the current raceday, and request the result
+        of every race.
         """
         response_json = json.loads(response.body)
 
         races = []
 
         for race_json in response_json['result']:
-            race = ItemLoader(item=RaceItem())
+            race = FastLoader(RaceItem)
 
             race.add_value('racenumber', race_json['raceNumber'])
             race.add_value('race_name', race_json['raceName'])
@@ -139,32 +158,54 @@ class ResultCollector(Spider):
 
             races.append(race)
 
-        yield JsonRequest(
-            url=f'https://www.rikstoto.no/api/results/raceDays/{raceday.get_output_value("link")}/{races[0].get_output_value("racenumber")}/completeresults',
-            callback=self.parse_raceresult,
-            cb_kwargs=dict(
-                raceday=raceday,
-                scratched=scratched,
-                odds=odds,
-                races=races
+        assembly.expect(x.get_output_value('racenumber') for x in races)
+
+        for race in races:
+            yield JsonRequest(
+                url=f'https://www.rikstoto.no/api/results/raceDays/{raceday.get_output_value("link")}/{race.get_output_value("racenumber")}/completeresults',
+                callback=self.parse_raceresult,
+                errback=assembly.errback,
+                cb_kwargs=dict(racenumber=race.get_output_value('racenumber'), assembly=assembly),
+                meta=assembly.meta(race.get_output_value('racenumber'))
             )
-        )
 
+        yield from assembly.add('races', races)
+
+
+    def parse_raceresult(self, response, racenumber, assembly):
+        """
+        Get the full result for a race.
+        """
+        response_json = json.loads(response.body)
+
+        yield from assembly.add(racenumber, response_json['result']['results'])
 
-    def parse_raceresult(self, response, raceday, scratched, odds, races):
+
+    def load_raceday(self, raceday, results):
         """
-        Loop through all the races and get the full result for each race.
+        Add the results to the races, with the scratched horses and the odds,
+        and the races to the raceday ordered by racenumber.
         """
-        race = races.pop(0)
+        scratched = results.get('scratched', {})
+        odds = results.get('odds', {'win': {}, 'place': {}})
+
+        races = sorted(results.get('races', []), key=lambda race: number_order(race.get_output_value('racenumber')))
+
+        for race in races:
+            self.add_starters(race, results.get(race.get_output_value('racenumber'), []), scratched, odds)
+
+            raceday.add_value('races', race.load_item())
+
+        return raceday.load_item()
+
 
+    def add_starters(self, race, results_json, scratched, odds):
         race_scratched = scratched.get(str(race.get_output_value('racenumber')), [])
         win_odds = odds['win'].get(str(race.get_output_value('racenumber')), {})
         place_odds = odds['place'].get(str(race.get_output_value('racenumber')), {})
 
-        response_json = json.loads(response.body)
-
-        for starter_json in response_json['result']['results']:
-            starter = ItemLoader(item=RaceStarterItem())
+        for starter_json in results_json:
+            starter = FastLoader(RaceStarterItem)
 
             starter.add_value('finish', starter_json['place'])
             starter.add_value('order', starter_json['order'])
@@ -190,7 +231,7 @@ class ResultCollector(Spider):
                 starter.add_value('show_odds',
                     place_odds[str(starter.get_output_value('startnumber'))]['odds'])
 
-            horse = ItemLoader(item=HorseItem())
+            horse = FastLoader(HorseItem)
 
             horse.add_value('name', starter_json['horseName'])
             horse.add_value('country', starter_json['horseName'])
@@ -201,20 +242,3 @@ class ResultCollector(Spider):
             starter.add_value('horse', horse.load_item())
 
             race.add_value('starters', starter.load_item())
-
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield JsonRequest(
-                url=f'https://www.rikstoto.no/api/results/raceDays/{raceday.get_output_value("link")}/{races[0].get_output_value("racenumber")}/completeresults',
-                callback=self.parse_raceresult,
-                cb_kwargs=dict(
-                    raceday=raceday,
-                    scratched=scratched,
-                    odds=odds,
-                    races=races
-                )
-            )
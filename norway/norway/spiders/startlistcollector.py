@@ -1,15 +1,15 @@
 from scrapy.http import JsonRequest
 from scrapy.spiders import Spider
-from scrapy.loader import ItemLoader
 from scrapy_splash import SplashRequest
 
 import json
-import os
 from datetime import date, timedelta
 
 from norway.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.collected import CollectedIndex
+from standardbred.assembly import KeyedAssembly
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/norway'
 BASE_URL = 'https://www.rikstoto.no/api'
 
 
@@ -25,6 +25,8 @@ class StartlistCollector(Spider):
         """
         Get a list of available racedays.
         """
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         yield JsonRequest(
             url=f'{BASE_URL}/racedays',
             callback=self.parse
@@ -40,7 +42,7 @@ class StartlistCollector(Spider):
 
         for raceday_json in response_json['result']:
             if raceday_json['sportType'] == 'T' and raceday_json['isDomestic'] and not raceday_json['isMultiTrack']:
-                raceday = ItemLoader(item=RacedayItem())
+                raceday = FastLoader(RacedayItem)
 
                 raceday.add_value('racetrack', raceday_json['raceDayName'])
                 raceday.add_value('date', raceday_json['startTime'].split('T')[0])
@@ -53,37 +55,51 @@ class StartlistCollector(Spider):
                     raceday.get_output_value('racetrack').lower() + '.json'
                 ])
 
-                if not os.path.exists(os.path.join(JSON_DIRECTORY, 'startlist', outfile)):
-                    yield JsonRequest(
-                        url=f'{BASE_URL}/racedays/{raceday.get_output_value("link")}/scratched',
-                        callback=self.parse_scratched,
-                        cb_kwargs=dict(raceday=raceday)
-                    )
+                if not self.collected.contains('startlist', outfile):
+                    yield from self.raceday_requests(raceday)
+
+
+    def raceday_requests(self, raceday):
+        """
+        Get the scratched horses and the races of the raceday at the same time,
+        the raceday is loaded by load_raceday when both have arrived.
+        """
+        link = raceday.get_output_value('link')
+
+        assembly = KeyedAssembly.from_spider(self, ['scratched', 'program'],
+                                             lambda results: self.load_raceday(raceday, results))
+
+        for part, url in [('scratched', f'{BASE_URL}/racedays/{link}/scratched'),
+                          ('program', f'{BASE_URL}/game/program/{link}/VP/trot')]:
+            yield JsonRequest(
+                url=url,
+                callback=self.parse_part,
+                errback=assembly.errback,
+                cb_kwargs=dict(part=part, assembly=assembly),
+                meta=assembly.meta(part)
+            )
 
 
-    def parse_scratched(self, response, raceday):
+    def parse_part(self, response, part, assembly):
         """
-        Parse the list of scratched horses for the current raceday.
+        The list of scratched horses keyed by racenumber, or the list of races
+        and entries.
         """
         response_json = json.loads(response.body)
 
-        yield JsonRequest(
-            url=f'{BASE_URL}/game/program/{raceday.get_output_value("link")}/VP/trot',
-            callback=self.parse_raceday,
-            cb_kwargs=dict(raceday=raceday, scratched=response_json['result'])
-        )
+        yield from assembly.add(part, response_json['result'])
 
 
-    def parse_raceday(self, response, raceday, scratched):
+    def load_raceday(self, raceday, results):
         """
         Parse the list of races and entries for the raceday.
         """
-        response_json = json.loads(response.body)
+        scratched = results.get('scratched', {})
 
-        for race_json in response_json['result']:
+        for race_json in results.get('program', []):
             race_scratched = scratched.get(race_json['raceNumber'], [])
 
-            race = ItemLoader(item=RaceItem())
+            race = FastLoader(RaceItem)
 
             race.add_value('racetype', 'race')
             race.add_value('racenumber', race_json['raceNumber'])
@@ -95,7 +111,7 @@ class StartlistCollector(Spider):
             race.add_value('monte', race_json['isMonte'])
 
             for starter_json in race_json['starts']:
-                starter = ItemLoader(item=RaceStarterItem())
+                starter = FastLoader(RaceStarterItem)
 
                 starter.add_value('startnumber', starter_json['startNumber'])
                 starter.add_value('started', starter.get_output_value('startnumber') not in race_scratched)
@@ -104,7 +120,7 @@ class StartlistCollector(Spider):
                 starter.add_value('trainer', starter_json['trainer'])
                 starter.add_value('postposition', starter_json['postPosition'])
 
-                horse = ItemLoader(item=HorseItem())
+                horse = FastLoader(HorseItem)
 
                 horse.add_value('name', starter_json['horseName'])
                 horse.add_value('country', starter_json['horseName'])
@@ -114,7 +130,7 @@ class StartlistCollector(Spider):
                 horse.add_value('link', starter_json['horseRegistrationNumber'])
                 horse.add_value('ueln', starter_json['horseRegistrationNumber'])
 
-                sire = ItemLoader(item=HorseItem())
+                sire = FastLoader(HorseItem)
 
                 sire.add_value('sex', 'horse')
                 sire.add_value('name', starter_json['father'])
@@ -122,13 +138,13 @@ class StartlistCollector(Spider):
 
                 horse.add_value('sire', sire.load_item())
 
-                dam = ItemLoader(item=HorseItem())
+                dam = FastLoader(HorseItem)
 
                 dam.add_value('sex', 'mare')
                 dam.add_value('name', starter_json['mother'])
                 dam.add_value('country', starter_json['mother'])
 
-                dam_sire = ItemLoader(item=HorseItem())
+                dam_sire = FastLoader(HorseItem)
 
                 dam_sire.add_value('sex', 'horse')
                 dam_sire.add_value('name', starter_json['grandfather'])
@@ -144,4 +160,4 @@ class StartlistCollector(Spider):
 
             raceday.add_value('races', race.load_item())
 
-        yield raceday.load_item()
+        return raceday.load_item()
@@ -4,11 +4,11 @@ from scrapy.loader import ItemLoader
 from w3lib.html import remove_tags
 
 from spain.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.frontier import Frontier
+from standardbred.pedigree import build_pedigree
 
-import os
 
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/spain'
 BASE_URL = 'https://www.federaciobaleardetrot.com/'
 HORSE_URL = BASE_URL + 'resultados_por_caballo.php?id={}&pagina=1'
 
@@ -28,15 +28,6 @@ def handle_ancestor_cell(cell, sex):
     return horse
 
 
-def add_parents(horse, sire, dam):
-    if horse is not None:
-        if sire is not None:
-            horse.add_value('sire', sire.load_item())
-
-        if dam is not None:
-            horse.add_value('dam', dam.load_item())
-
-
 class HorsecollectorSpider(Spider):
     """
     Collects horses from 'https://www.federaciobaleardetrot.com'.
@@ -53,12 +44,17 @@ class HorsecollectorSpider(Spider):
 
 
     def start_requests(self):
-        yield Request(
-                    url=HORSE_URL.format(self.start_id),
-                    callback=self.parse)
+        self.frontier = Frontier.from_crawler(self.crawler, self.start_id)
 
+        for horse_id in self.frontier.start(self.start_id):
+            yield Request(
+                        url=HORSE_URL.format(horse_id),
+                        callback=self.parse,
+                        cb_kwargs=dict(horse_id=horse_id),
+                        priority=self.frontier.priority(horse_id))
 
-    def parse(self, response):
+
+    def parse(self, response, horse_id):
         horse = ItemLoader(item = HorseItem(), selector=response)
 
         horse.add_xpath('name', '//h4/span')
@@ -77,26 +73,20 @@ class HorsecollectorSpider(Spider):
 
             horse.add_value('offspring', offspring.load_item())
 
-            filename = f'{offspring.get_output_value("link")}.json'
+            offspring_id = offspring.get_output_value('link')
 
             if (horse.get_output_value('sex') == 'mare' and
-                    not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', filename))):
+                    self.frontier.schedule(offspring_id, parent=horse_id, horse=offspring.load_item())):
                 yield Request(
-                            url=HORSE_URL.format(offspring.get_output_value('link')),
-                            callback=self.parse)
+                            url=HORSE_URL.format(offspring_id),
+                            callback=self.parse,
+                            cb_kwargs=dict(horse_id=offspring_id),
+                            priority=self.frontier.priority(offspring_id))
 
         ancestors = [handle_ancestor_cell(x, 'horse' if index % 2 == 0 else 'mare')
                 for index, x in enumerate(response.xpath('//td[@class="recuadroTD"]'))]
 
-        add_parents(ancestors[2], ancestors[6], ancestors[7])
-        add_parents(ancestors[3], ancestors[8], ancestors[9])
-        add_parents(ancestors[4], ancestors[10], ancestors[11])
-        add_parents(ancestors[5], ancestors[12], ancestors[13])
-
-        add_parents(ancestors[0], ancestors[2], ancestors[3])
-        add_parents(ancestors[1], ancestors[4], ancestors[5])
-
-        add_parents(horse, ancestors[0], ancestors[1])
+        build_pedigree(horse, ancestors)
 
         for start_row in response.xpath('//tr[contains(@id,"aCabTR")]'):
             racedate = remove_tags(start_row.xpath('./td[1]').get())
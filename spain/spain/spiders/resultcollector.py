@@ -6,6 +6,8 @@ from scrapy_splash import SplashRequest
 from w3lib.html import remove_tags
 
 from spain.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.splashwait import lua_script
+from standardbred.assembly import RacedayAssembly
 
 import datetime
 import os
@@ -25,6 +27,9 @@ class ResultcollectorSpider(Spider):
     """
     name = 'resultcollector'
     allowed_domains = ['www.federaciobaleardetrot.com']
+    # the racedays are asked for a year at a time, wherever the date range
+    # starts, so 'scrapy reparse' can split a range in windows
+    reparse_window_days = 31
 
 
     def __init__(self, start_date = '', end_date = '', *args, **kwargs):
@@ -77,25 +82,27 @@ class ResultcollectorSpider(Spider):
                         endpoint='execute',
                         args={
                             'wait': 5,
-                            'lua_source': """
+                            'lua_source': lua_script("""
                                           treat = require('treat')
                                           function main(splash, args)
                                             splash:set_viewport_size(1600,1000)
                                             html_list = {}
+                                            track_requests(splash)
                                             assert(splash:go(args.url))
-                                            assert(splash:wait(0.5))
+                                            wait_for_selector(splash, 'table.table')
                                             html_list[#html_list + 1] = splash:html()
                                             conditions_links = splash:select_all('table.table a[href^="javascript:abrirCondiciones"]')
                                             for _, link in ipairs(conditions_links) do
                                                 link:mouse_click()
-                                                assert(splash:wait(1))
+                                                -- the conditions are loaded when the link is clicked
+                                                wait_for_idle(splash)
                                                 html_list[#html_list + 1] = splash:html()
                                                 splash:mouse_click(10, 10)
-                                                assert(splash:wait(0.5))
+                                                wait_for_idle(splash)
                                             end
                                             return treat.as_array(html_list)
                                           end
-                                          """
+                                          """)
                         })
 
 
@@ -130,17 +137,20 @@ class ResultcollectorSpider(Spider):
 
             races.append(race)
 
-        if len(races) != 0:
+        assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
+
+        for race in races:
             yield Request(
-                    url=RACE_URL.format(races[0].get_output_value('link')),
+                    url=RACE_URL.format(race.get_output_value('link')),
                     callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'races': races})
+                    errback=assembly.errback,
+                    cb_kwargs=dict(race=race, assembly=assembly),
+                    meta=assembly.meta(race.get_output_value('link')))
+
+        yield from assembly.start()
 
 
-    def parse_race(self, response, raceday):
-        races = response.meta['races']
-        race = races.pop(0)
+    def parse_race(self, response, race, assembly):
 
         result_rows = response.xpath('//div[@id="resultados"]//tr')[ 1 : -1]
 
@@ -209,14 +219,4 @@ class ResultcollectorSpider(Spider):
 
         race.add_value('purse', race_purse)
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield Request(
-                    url=RACE_URL.format(races[0].get_output_value('link')),
-                    callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'races': races})
+        yield from assembly.add(race.get_output_value('link'), race)
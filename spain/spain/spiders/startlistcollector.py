@@ -6,6 +6,8 @@ from scrapy.selector import Selector
 from w3lib.html import remove_tags
 
 from spain.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.splashwait import lua_script
+from standardbred.assembly import RacedayAssembly
 
 import datetime
 import os
@@ -74,25 +76,27 @@ class StartlistcollectorSpider(Spider):
                         endpoint='execute',
                         args={
                             'wait': 5,
-                            'lua_source': """
+                            'lua_source': lua_script("""
                                           treat = require('treat')
                                           function main(splash, args)
                                             splash:set_viewport_size(1600,1000)
                                             html_list = {}
+                                            track_requests(splash)
                                             assert(splash:go(args.url))
-                                            assert(splash:wait(2))
+                                            wait_for_selector(splash, 'table.table')
                                             html_list[#html_list + 1] = splash:html()
                                             conditions_links = splash:select_all('table.table a[href^="javascript:abrirCondiciones"]')
                                             for _, link in ipairs(conditions_links) do
                                                 link:mouse_click()
-                                                assert(splash:wait(1))
+                                                -- the conditions are loaded when the link is clicked
+                                                wait_for_idle(splash)
                                                 html_list[#html_list + 1] = splash:html()
                                                 splash:mouse_click(10, 10)
-                                                assert(splash:wait(0.5))
+                                                wait_for_idle(splash)
                                             end
                                             return treat.as_array(html_list)
                                           end
-                                          """
+                                          """)
                         })
 
 
@@ -122,16 +126,20 @@ class StartlistcollectorSpider(Spider):
 
                 races.append(race)
 
-            yield Request(
-                    url=RACE_URL.format(races[0].get_output_value('link')),
-                    callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'races': races})
+            assembly = RacedayAssembly.from_spider(self, raceday, [x.get_output_value('link') for x in races])
+
+            for race in races:
+                yield Request(
+                        url=RACE_URL.format(race.get_output_value('link')),
+                        callback=self.parse_race,
+                        errback=assembly.errback,
+                        cb_kwargs=dict(race=race, assembly=assembly),
+                        meta=assembly.meta(race.get_output_value('link')))
+
+            yield from assembly.start()
 
 
-    def parse_race(self, response, raceday):
-        races = response.meta['races']
-        race = races.pop(0)
+    def parse_race(self, response, race, assembly):
 
         starter_rows = response.xpath('//table[@id="Tablaparticipantes"]//tr[contains(@id,"aCabTR")]')
 
@@ -186,14 +194,4 @@ class StartlistcollectorSpider(Spider):
 
             race.add_value('starters', starter.load_item())
 
-        raceday.add_value('races', race.load_item())
-
-        if len(races) == 0:
-            yield raceday.load_item()
-
-        else:
-            yield Request(
-                    url=RACE_URL.format(races[0].get_output_value('link')),
-                    callback=self.parse_race,
-                    cb_kwargs=dict(raceday=raceday),
-                    meta={'races': races})
+        yield from assembly.add(race.get_output_value('link'), race)
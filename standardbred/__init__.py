@@ -0,0 +1,5 @@
+"""
+The modules that are the same for every country. Every project puts the
+directory above it on the path in its __init__.py, so 'scrapy' in the
+directory of a country can import them.
+"""
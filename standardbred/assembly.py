@@ -0,0 +1,204 @@
+from scrapy.utils.misc import arg_to_iter
+
+
+DEFAULT_TIMEOUT = 180
+
+
+def number_order(value):
+    """
+    Sort key that orders numbers, or strings that are numbers, numerically and
+    puts everything else after them.
+    """
+    if isinstance(value, int):
+        return (0, value, '')
+
+    if isinstance(value, str) and value.strip().isdigit():
+        return (0, int(value), '')
+
+    return (1, 0, str(value))
+
+
+class Assembly(object):
+    """
+    Collects the results of requests that are made concurrently but belong to
+    the same item. Every request is a part, when all parts have either arrived
+    or failed build is called with the results, ordered by part, and whatever
+    it returns is the item, or the items and requests if it returns a list or
+    a generator.
+    If any part failed the item is dropped, so it will be collected on the next
+    run, unless allow_partial is set. A part fails when its request fails or
+    when its callback raises, see AssemblyMiddleware. Every request gets
+    timeout seconds to download, counted from when the downloader sends it
+    and not from when the assembly was created, so the time a request waits
+    in the scheduler for the other parts is not counted.
+    When the item is dropped dropped is called with the failed parts, if it is
+    given, and what it returns, requests to get the item another way, is
+    returned instead of the item. It is called once, by whichever part
+    finished the assembly.
+    """
+
+    def __init__(self, parts, build, allow_partial=False, timeout=DEFAULT_TIMEOUT, logger=None, stats=None,
+                 dropped=None):
+        self.pending = set(parts)
+        self.results = {}
+        self.failed = []
+        self.build = build
+        self.allow_partial = allow_partial
+        self.timeout = timeout
+        self.logger = logger
+        self.stats = stats
+        self.dropped = dropped
+        self.done = False
+
+
+    @classmethod
+    def from_spider(cls, spider, *args, **kwargs):
+        kwargs.setdefault('allow_partial', spider.settings.getbool('ASSEMBLY_ALLOW_PARTIAL'))
+        kwargs.setdefault('timeout', spider.settings.getfloat('ASSEMBLY_TIMEOUT', DEFAULT_TIMEOUT))
+        kwargs.setdefault('logger', spider.logger)
+        kwargs.setdefault('stats', spider.crawler.stats if getattr(spider, 'crawler', None) else None)
+
+        return cls(*args, **kwargs)
+
+
+    def inc_stat(self, name):
+        if self.stats:
+            self.stats.inc_value(f'assembly/{name}')
+
+
+    def start(self):
+        """
+        Call it when the requests for the parts have been made, an assembly
+        without parts is finished right away.
+        """
+        return self.finish()
+
+
+    def expect(self, parts):
+        """
+        Adds parts that can only be requested when an earlier part has
+        arrived, call it before that part is added.
+        """
+        self.pending.update(parts)
+
+
+    def meta(self, part, **meta):
+        """
+        The meta to give the request for a part, errback and AssemblyMiddleware
+        need it to know which part failed.
+        """
+        meta['assembly'] = self
+        meta['assembly_part'] = part
+        meta['download_timeout'] = self.timeout
+
+        return meta
+
+
+    def add(self, part, result):
+        if part not in self.pending:
+            return []
+
+        self.results[part] = result
+        self.pending.discard(part)
+
+        return self.finish()
+
+
+    def fail(self, part):
+        if part not in self.pending:
+            return []
+
+        self.failed.append(part)
+        self.pending.discard(part)
+        self.inc_stat('failed_parts')
+
+        return self.finish()
+
+
+    def errback(self, failure):
+        if self.logger:
+            self.logger.warning(f'Failed to get {failure.request.url}: {failure.value!r}')
+
+        return self.fail(failure.request.meta['assembly_part'])
+
+
+    def finish(self):
+        if self.pending or self.done:
+            return []
+
+        self.done = True
+
+        if self.failed and not self.allow_partial:
+            if self.logger:
+                self.logger.warning(f'Dropping item, {len(self.failed)} of '
+                                    f'{len(self.failed) + len(self.results)} parts failed')
+
+            self.inc_stat('dropped')
+
+            return [] if self.dropped is None else list(self.dropped(list(self.failed)))
+
+        return list(arg_to_iter(self.build(self.collect_results())))
+
+
+    def collect_results(self):
+        return [self.results[x] for x in sorted(self.results, key=number_order)]
+
+
+class KeyedAssembly(Assembly):
+    """
+    Assembles an item from requests to different endpoints, build is called
+    with a dict of part and result instead of a list. Parts that failed are
+    missing from the dict.
+    """
+
+    def collect_results(self):
+        return dict(self.results)
+
+
+class RacedayAssembly(Assembly):
+    """
+    Assembles a raceday from races that are requested at the same time. The
+    results are the RaceItem loaders, these are added to the raceday ordered by
+    racenumber.
+    """
+
+    def __init__(self, raceday, parts, **kwargs):
+        super(RacedayAssembly, self).__init__(parts, self.load_raceday, **kwargs)
+        self.raceday = raceday
+
+
+    def load_raceday(self, races):
+        races = sorted(races, key=lambda race: number_order(race.get_output_value('racenumber')))
+
+        for race in races:
+            self.raceday.add_value('races', race.load_item())
+
+        return self.raceday.load_item()
+
+
+class AssemblyMiddleware(object):
+    """
+    Fails the part of an assembly whose callback raised, without it the part
+    would never be added or failed and the assembly would never finish. The
+    exception is logged here, the items the assembly returns go on to the
+    pipelines one by one.
+    """
+
+    def process_spider_exception(self, response, exception, spider):
+        assembly = response.meta.get('assembly')
+        part = response.meta.get('assembly_part')
+
+        if assembly is None or part not in assembly.pending:
+            return None
+
+        spider.logger.error(f'Part {part!r} of an assembly failed in the callback for {response.url}',
+                            exc_info=exception)
+
+        return self.iterate(assembly.fail(part))
+
+
+    def iterate(self, results):
+        # a generator of its own, process_spider_exception has to return None
+        # for a response that is not a part
+        for result in results:
+            yield result
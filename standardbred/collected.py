@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+
+def collected_key(filename):
+    """
+    The key for a json file, the filename without directory and extension, so
+    '2020_01_01_solvalla' for racedays and the id for horses.
+    """
+    key = os.path.basename(filename)
+
+    if key.endswith('.json'):
+        key = key[ : -len('.json')]
+
+    return key
+
+
+class CollectedIndex(object):
+    """
+    An index of everything that has been collected, the racedays and horses
+    that have a json file, stored in SQLite and keyed by country, kind and key.
+    The kind is the directory the json file is in, 'result', 'startlist' or
+    'horses', so the same index can be shared by all countries.
+    The keys for the country are loaded the first time they are needed, after
+    that checking if something has been collected is a set lookup instead of a
+    stat on the json directory.
+    There is one index per file and country in each process, so what the
+    pipeline adds is seen by the spiders.
+    """
+    _indexes = {}
+
+    def __init__(self, path, country):
+        self.path = path
+        self.country = country
+        self.keys = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS collected ('
+                                'country TEXT NOT NULL, '
+                                'kind TEXT NOT NULL, '
+                                'key TEXT NOT NULL, '
+                                'PRIMARY KEY (country, kind, key))')
+
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get('COLLECTED_INDEX')
+        country = settings.get('BOT_NAME')
+
+        if (path, country) not in cls._indexes:
+            cls._indexes[(path, country)] = cls(path, country)
+
+        return cls._indexes[(path, country)]
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings)
+
+
+    def load(self):
+        rows = self.connection.execute('SELECT kind, key FROM collected WHERE country = ?',
+                                       (self.country,))
+
+        self.keys = set(rows)
+
+
+    def contains(self, kind, filename):
+        if self.keys is None:
+            self.load()
+
+        return (kind, collected_key(filename)) in self.keys
+
+
+    def add(self, kind, filename):
+        """
+        Called after the json file has been written, every statement is its
+        own transaction so a key is either in the index or not.
+        """
+        key = collected_key(filename)
+
+        self.connection.execute('INSERT OR IGNORE INTO collected (country, kind, key) VALUES (?, ?, ?)',
+                                (self.country, kind, key))
+
+        if self.keys is not None:
+            self.keys.add((kind, key))
+
+
+    def rebuild(self, directory, horses=()):
+        """
+        Replaces the keys for the country with the json files and segment
+        indexes in directory, one subdirectory per kind, and the keys of the
+        horses in the registry. Returns the number of keys.
+        """
+        keys = [(self.country, 'horses', x) for x in horses]
+
+        for kind in os.scandir(directory):
+            if not kind.is_dir():
+                continue
+
+            for entry in os.scandir(kind.path):
+                if entry.name.endswith('.json'):
+                    keys.append((self.country, kind.name, collected_key(entry.name)))
+
+                # items written to segments are listed in the segment index
+                elif entry.name.endswith('.index'):
+                    with open(entry.path) as index:
+                        keys.extend((self.country, kind.name, line.split('\t')[0]) for line in index)
+
+        with self.connection:
+            self.connection.execute('BEGIN')
+            self.connection.execute('DELETE FROM collected WHERE country = ?', (self.country,))
+            self.connection.executemany('INSERT OR IGNORE INTO collected (country, kind, key) VALUES (?, ?, ?)',
+                                        keys)
+
+        self.keys = None
+
+        return len(keys)
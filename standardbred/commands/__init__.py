@@ -0,0 +1,3 @@
+# The commands that are the same for every country. Scrapy only runs the
+# commands defined in COMMANDS_MODULE, the command of a project subclasses
+# the one here and gives it what belongs to the project.
@@ -0,0 +1,128 @@
+from scrapy.commands import ScrapyCommand
+
+from standardbred.replay import ResponseArchive
+
+import json
+import os
+import tempfile
+
+
+class Command(ScrapyCommand):
+    """
+    Runs the callback of every fixture on the page fetched without Splash and
+    the page fetched with Splash, and reports the fixtures where the output is
+    not the same. Use it before enabling the fast path for a spider, see
+    standardbred/splashfastpath.py.
+    The pages are plain.html and splash.html in the fixture, most of them are
+    written by hand and say nothing about the site, fixture.json has it in
+    source. With --archive the pages are the last ones the spider got for the
+    url of the fixture in the replay archive instead, a crawl recorded with the
+    fast path on stores the plain pages and one with it off the pages through
+    Splash. Only a spider whose fixtures all matched on pages from the site is
+    reported as one the fast path can be enabled for.
+    The project gives it its fixtures module.
+    """
+    requires_project = True
+    fixtures = None
+
+    def syntax(self):
+        return '[options] [fixture ...]'
+
+
+    def short_desc(self):
+        return 'Compare what callbacks parse from pages fetched with and without Splash'
+
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--archive', action='store_true',
+                            help='compare the pages in the replay archive instead of the ones in the fixtures')
+
+
+    def process_options(self, args, opts):
+        super(Command, self).process_options(args, opts)
+
+        # nothing should be skipped because it has already been collected
+        self.settings.set('COLLECTED_INDEX', ':memory:', priority='cmdline')
+
+
+    def archived_fixture(self, fixture, directory):
+        """
+        The fixture with the pages from the replay archive in directory, None
+        if the archive does not have both.
+        """
+        path = os.path.join(self.settings.get('REPLAY_DIRECTORY'), fixture['spider'])
+
+        if not os.path.exists(os.path.join(path, 'index.jsonl')):
+            return None
+
+        archive = ResponseArchive(path)
+
+        pages = {'plain.html': archive.latest(fixture['url'], False),
+                 'splash.html': archive.latest(fixture['url'], True)}
+
+        if None in pages.values():
+            return None
+
+        for page, body in pages.items():
+            with open(os.path.join(directory, page), 'wb') as outfile:
+                outfile.write(body)
+
+        return dict(fixture, path=directory, source='replay archive')
+
+
+    def run(self, args, opts):
+        checked = 0
+        different = 0
+        spiders = {}
+
+        for fixture in self.fixtures.find_fixtures(self.settings.get('FIXTURES_DIRECTORY'), args):
+            with tempfile.TemporaryDirectory() as directory:
+                if opts.archive:
+                    fixture = self.archived_fixture(fixture, directory)
+
+                    if fixture is None:
+                        continue
+
+                elif not all(os.path.exists(os.path.join(fixture['path'], x)) for x in ['plain.html', 'splash.html']):
+                    continue
+
+                spider = self.fixtures.create_spider(self.crawler_process, fixture)
+
+                plain = self.fixtures.run_fixture(spider, fixture, 'plain.html')
+                splash = self.fixtures.run_fixture(spider, fixture, 'splash.html')
+
+            checked += 1
+
+            # a page written by hand says nothing about the site
+            from_site = not fixture.get('source', '').startswith('synthetic')
+            source = 'pages from the site' if from_site else 'synthetic pages'
+
+            if plain == splash:
+                print(f'{fixture["name"]}: same, {len(plain)} outputs, {source}')
+                spiders.setdefault(fixture['spider'], []).append(from_site)
+                continue
+
+            different += 1
+            spiders.setdefault(fixture['spider'], []).append(False)
+
+            print(f'{fixture["name"]}: different, {len(plain)} outputs without Splash, {len(splash)} with, {source}')
+
+            for index, (plain_output, splash_output) in enumerate(zip(plain, splash)):
+                if plain_output != splash_output:
+                    print(f'  first difference in output {index}')
+                    print('  without Splash: ' + json.dumps(plain_output, sort_keys=True))
+                    print('  with Splash:    ' + json.dumps(splash_output, sort_keys=True))
+                    break
+
+        print(f'{checked} fixtures checked, {different} different')
+
+        enable = sorted(x for x, matched in spiders.items() if all(matched))
+
+        if enable:
+            print(f'the fast path can be enabled with SPLASH_FAST_PATH_SPIDERS = {enable!r}')
+        else:
+            print('no spider matched on pages from the site, the fast path can not be enabled yet')
+
+        if different:
+            self.exitcode = 1
@@ -0,0 +1,52 @@
+from scrapy.commands import ScrapyCommand
+
+from standardbred.collected import collected_key
+from standardbred.identity import IdentityIndex
+from standardbred.registry import Registry
+from standardbred.segments import SegmentReader
+
+import json
+import os
+
+
+class Command(ScrapyCommand):
+    """
+    Adds the horses that have been collected to the identity index, from the
+    json files in JSON_DIRECTORY, the segments and the registry. The pipeline
+    adds every horse it writes, this is for the horses written before.
+    The command of a project sets json_directory, the JSON_DIRECTORY of its
+    pipeline.
+    """
+    requires_project = True
+    json_directory = None
+
+    def short_desc(self):
+        return 'Add the collected horses to the identity index'
+
+
+    def horses(self, horse_key):
+        directory = os.path.join(self.json_directory, 'horses')
+
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.json'):
+                    with open(entry.path) as infile:
+                        yield collected_key(entry.name), json.load(infile)
+
+        for horse in SegmentReader(self.json_directory, self.settings.get('BOT_NAME')).items('horses'):
+            yield horse_key(horse), horse
+
+        if self.settings.get('REGISTRY_PATH') and os.path.exists(self.settings.get('REGISTRY_PATH')):
+            yield from Registry.from_settings(self.settings).items()
+
+
+    def run(self, args, opts):
+        identities = IdentityIndex.from_settings(self.settings)
+        count = 0
+
+        for key, horse in self.horses(identities.horse_key):
+            if key is not None:
+                identities.add(horse, key)
+                count += 1
+
+        print(f'Indexed {count} horses for {identities.country} in {identities.path}')
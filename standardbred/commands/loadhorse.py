@@ -0,0 +1,45 @@
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from standardbred.registry import Registry, GENERATIONS
+
+import json
+
+
+class Command(ScrapyCommand):
+    """
+    Prints a horse from the registry written with OUTPUT_FORMAT 'registry' as
+    json, with its ancestors and offspring in it the way it was collected.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return '[options] <key>'
+
+
+    def short_desc(self):
+        return 'Print a horse from the registry with its pedigree and offspring'
+
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('-g', '--generations', type=int, default=GENERATIONS,
+                            help=f'generations of ancestors, default {GENERATIONS}')
+        parser.add_argument('-c', '--country', help='the country of the horse, default this project')
+
+
+    def run(self, args, opts):
+        if len(args) != 1:
+            raise UsageError()
+
+        registry = Registry.from_settings(self.settings)
+
+        if opts.country:
+            registry.country = opts.country
+
+        if registry.get(args[0]) is None:
+            print(f'{args[0]} is not in {registry.path} for {registry.country}')
+            self.exitcode = 1
+            return
+
+        print(json.dumps(registry.tree(args[0], opts.generations), indent=4))
@@ -0,0 +1,34 @@
+from scrapy.commands import ScrapyCommand
+
+from standardbred.collected import CollectedIndex
+from standardbred.registry import Registry
+
+import os
+
+
+class Command(ScrapyCommand):
+    """
+    Rebuilds the index of collected racedays and horses from the json files in
+    JSON_DIRECTORY and the horses in the registry, use it when json files have
+    been added or removed by hand.
+    The command of a project sets json_directory, the JSON_DIRECTORY of its
+    pipeline.
+    """
+    requires_project = True
+    json_directory = None
+
+    def short_desc(self):
+        return 'Rebuild the index of collected racedays and horses from the json files and segments'
+
+
+    def run(self, args, opts):
+        index = CollectedIndex.from_settings(self.settings)
+
+        horses = []
+
+        if self.settings.get('REGISTRY_PATH') and os.path.exists(self.settings.get('REGISTRY_PATH')):
+            horses = Registry.from_settings(self.settings).collected_keys()
+
+        count = index.rebuild(self.json_directory, horses)
+
+        print(f'Indexed {count} json files for {index.country} in {index.path}')
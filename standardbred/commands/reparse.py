@@ -0,0 +1,157 @@
+from scrapy.commands import ScrapyCommand
+from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import UsageError
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import get_project_settings
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import os
+
+
+def date_windows(start_date, end_date, days):
+    """
+    start_date to end_date, both 'YYYY-mm-dd', as windows of days days.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+    while start <= end:
+        window_end = min(start + timedelta(days=days - 1), end)
+
+        yield start.isoformat(), window_end.isoformat()
+
+        start = window_end + timedelta(days=1)
+
+
+def split_arguments(spider_arguments, days):
+    """
+    The spider arguments of every crawl, a date range is split in windows of
+    days days when days is given and a list of start_ids in single ids,
+    anything else is one crawl.
+    """
+    if days and 'start_date' in spider_arguments and 'end_date' in spider_arguments:
+        for start_date, end_date in date_windows(spider_arguments['start_date'], spider_arguments['end_date'], days):
+            yield dict(spider_arguments, start_date=start_date, end_date=end_date)
+
+    elif ',' in spider_arguments.get('start_id', ''):
+        for start_id in spider_arguments['start_id'].split(','):
+            yield dict(spider_arguments, start_id=start_id)
+
+    else:
+        yield spider_arguments
+
+
+def replay_crawl(spider_name, spider_arguments, overrides):
+    """
+    Runs in a process of its own, a reactor can only be started once.
+    """
+    settings = get_project_settings()
+    settings.setdict(overrides, priority='cmdline')
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spider_name)
+
+    process.crawl(crawler, **spider_arguments)
+    process.start()
+
+    return crawler.stats.get_stats()
+
+
+class Command(ScrapyCommand):
+    """
+    Runs a spider again on the responses stored by a crawl with REPLAY_MODE
+    set to 'record', without downloading anything, so the json files get what
+    the callbacks and the processors in items.py make of the pages now. A json
+    file is only written if it is different from the one that is there.
+    A date range is split in windows, and a comma separated list of start_ids
+    in single horses, that are crawled at the same time in a pool of
+    processes, one per CPU by default. Only a spider with reparse_window_days
+    is split in windows, the others ask for their date range in requests
+    that were recorded for the range as a whole, like a calendar from
+    start_date to end_date, and a window would not be in the archive.
+    Nothing is skipped because it has been collected and the index of collected
+    racedays and horses is not changed.
+    The whole spider is run, every callback and not only the ones that were
+    changed. The callbacks build an item together, a raceday goes through the
+    calendar, the raceday and the races before it is yielded, so one of them
+    can not be run without the ones before it. A crawl without downloading
+    costs what the callbacks cost, and only the json files that change are
+    written.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return '[options] <spider>'
+
+
+    def short_desc(self):
+        return 'Run a spider on the stored responses instead of the sites'
+
+
+    def long_desc(self):
+        return ('Run a spider on the responses stored by a crawl with REPLAY_MODE set to record, '
+                'instead of the sites. The whole spider is run, every callback and not only the ones '
+                'that were changed, the callbacks build the items together. Only json files that '
+                'change are written.')
+
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('-a', dest='spargs', action='append', default=[], metavar='NAME=VALUE',
+                            help='set spider argument (may be repeated)')
+        parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                            help='crawls to run at the same time, default the number of CPUs')
+        parser.add_argument('--days', type=int,
+                            help='days in every window of a date range, for a spider that can be split in '
+                                 'windows, default its reparse_window_days')
+
+
+    def run(self, args, opts):
+        if len(args) != 1:
+            raise UsageError()
+
+        spider_arguments = dict(x.split('=', 1) for x in opts.spargs)
+
+        overrides = {
+            'REPLAY_MODE': 'replay',
+            'COLLECTED_INDEX': ':memory:',
+            'FRONTIER_DIRECTORY': ''
+        }
+
+        jobs = opts.jobs
+
+        # the processes would append to the same segments
+        if self.settings.get('OUTPUT_FORMAT') == 'segments' and jobs > 1:
+            print('OUTPUT_FORMAT is segments, running one crawl at a time')
+            jobs = 1
+
+        days = getattr(SpiderLoader.from_settings(self.settings).load(args[0]), 'reparse_window_days', None)
+
+        if days and opts.days:
+            days = opts.days
+
+        crawls = list(split_arguments(spider_arguments, days))
+
+        totals = {}
+
+        with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+            futures = {executor.submit(replay_crawl, args[0], x, overrides): x for x in crawls}
+
+            for future in as_completed(futures):
+                stats = future.result()
+
+                for key in ['replay/replayed', 'replay/missing', 'item_scraped_count',
+                            'pipeline/written', 'pipeline/unchanged', 'pipeline/failed']:
+                    totals[key] = totals.get(key, 0) + stats.get(key, 0)
+
+                if stats.get('finish_reason') == 'write_failed':
+                    self.exitcode = 1
+
+                print(f'{futures[future]}: {stats.get("finish_reason")}, '
+                      f'{stats.get("item_scraped_count", 0)} items')
+
+        print(f'{len(crawls)} crawls, {totals["replay/replayed"]} responses replayed, '
+              f'{totals["replay/missing"]} not stored, {totals["item_scraped_count"]} items, '
+              f'{totals["pipeline/written"]} json files written, {totals["pipeline/unchanged"]} unchanged, '
+              f'{totals["pipeline/failed"]} writes failed')
@@ -0,0 +1,156 @@
+from scrapy import signals
+
+from standardbred.collected import CollectedIndex
+from standardbred.identity import IdentityIndex, KINDS
+
+import os
+
+
+class Frontier(object):
+    """
+    The horses a horsecollector has scheduled in this run. A horse is only
+    scheduled once, the moment it is found and not when its json file has been
+    written, so a horse that is offspring of several collected mares is only
+    requested once.
+    The start horse is generation 0, its offspring generation 1 and so on.
+    Requests get the negative generation as priority so the family is crawled
+    breadth-first. Horses deeper than FRONTIER_MAX_GENERATIONS, or more than
+    FRONTIER_MAX_HORSES in total, are not scheduled, 0 means no limit.
+    Every scheduled horse is appended to a file in FRONTIER_DIRECTORY, if the
+    crawl is interrupted the next crawl from the same start horse requests the
+    scheduled horses that have not been collected yet instead of starting
+    over. The file is removed when the crawl finishes.
+    With IDENTITY_SKIP_KNOWN a horse that has been collected in another
+    country, by one of the identifiers in IDENTITY_SKIP_KINDS, is not
+    scheduled either, see identity.py.
+    """
+
+    def __init__(self, path, collected, filename=None, max_generations=0, max_horses=0, stats=None,
+                 identities=None, identity_kinds=KINDS):
+        self.path = path
+        self.collected = collected
+        self.identities = identities
+        self.identity_kinds = identity_kinds
+        self.filename = filename or (lambda horse_id: f'{horse_id}.json')
+        self.max_generations = max_generations
+        self.max_horses = max_horses
+        self.stats = stats
+        self.generations = {}
+        self.log = None
+
+        if path and os.path.exists(path):
+            with open(path) as infile:
+                for line in infile:
+                    horse_id, generation = line.rstrip('\n').split('\t')
+                    self.generations[horse_id] = int(generation)
+
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.log = open(path, 'a')
+
+
+    @classmethod
+    def from_crawler(cls, crawler, start_id, filename=None):
+        directory = crawler.settings.get('FRONTIER_DIRECTORY')
+        identities = None
+
+        if crawler.settings.getbool('IDENTITY_SKIP_KNOWN') and crawler.settings.get('IDENTITY_INDEX'):
+            identities = IdentityIndex.from_crawler(crawler)
+        path = os.path.join(directory, f'{crawler.spidercls.name}_{start_id}.frontier') if directory else None
+
+        frontier = cls(
+            path,
+            CollectedIndex.from_crawler(crawler),
+            filename=filename,
+            max_generations=crawler.settings.getint('FRONTIER_MAX_GENERATIONS'),
+            max_horses=crawler.settings.getint('FRONTIER_MAX_HORSES'),
+            stats=crawler.stats,
+            identities=identities,
+            identity_kinds=crawler.settings.getlist('IDENTITY_SKIP_KINDS', KINDS)
+        )
+
+        crawler.signals.connect(frontier.spider_closed, signal=signals.spider_closed)
+
+        return frontier
+
+
+    def inc_stat(self, name):
+        if self.stats:
+            self.stats.inc_value(f'frontier/{name}')
+
+
+    def start(self, start_id):
+        """
+        The horses to request first, the start horse or, when resuming, the
+        scheduled horses that were not collected, in generation order.
+        """
+        if self.generations:
+            pending = [x for x in sorted(self.generations, key=self.generations.get)
+                       if not self.collected.contains('horses', self.filename(x))]
+
+            self.inc_stat('resumed')
+
+            return pending
+
+        self.add(str(start_id), 0)
+
+        return [str(start_id)]
+
+
+    def add(self, horse_id, generation):
+        self.generations[horse_id] = generation
+
+        if self.log:
+            self.log.write(f'{horse_id}\t{generation}\n')
+            self.log.flush()
+
+        self.inc_stat('scheduled')
+
+
+    def schedule(self, horse_id, parent=None, horse=None):
+        """
+        Returns True if the horse should be requested, that is if it has not
+        been scheduled or collected before and is within the limits. parent is
+        the horse it was found through, horse what is known about it, like its
+        name, country, birthdate and registration.
+        """
+        horse_id = str(horse_id)
+
+        if horse_id in self.generations:
+            self.inc_stat('duplicate')
+            return False
+
+        if self.collected.contains('horses', self.filename(horse_id)):
+            self.inc_stat('collected')
+            return False
+
+        if horse is not None and self.identities is not None:
+            if self.identities.known(horse, self.identity_kinds):
+                self.inc_stat('known_elsewhere')
+                return False
+
+        generation = self.generations.get(str(parent), 0) + 1
+
+        if self.max_generations and generation > self.max_generations:
+            self.inc_stat('too_deep')
+            return False
+
+        if self.max_horses and len(self.generations) >= self.max_horses:
+            self.inc_stat('over_budget')
+            return False
+
+        self.add(horse_id, generation)
+
+        return True
+
+
+    def priority(self, horse_id):
+        return -self.generations.get(str(horse_id), 0)
+
+
+    def spider_closed(self, spider, reason):
+        if self.log:
+            self.log.close()
+
+            if reason == 'finished':
+                os.remove(self.path)
@@ -0,0 +1,197 @@
+from standardbred.registry import PARENTS, OFFSPRING, horse_key, load_horse_key
+from standardbred.locks import FileLock
+
+from collections.abc import Mapping
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+
+# the identifiers of a horse, the surest first
+KINDS = ['ueln', 'chip', 'registration', 'name']
+
+
+def normalise_name(name):
+    """
+    The name without accents, a country suffix like ' (SE)' or anything that
+    is not a letter or a digit, in upper case.
+    """
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(x for x in name if not unicodedata.combining(x)).upper()
+    name = re.sub(r'\s*\([A-Z]{2,3}\)\s*$', '', name)
+
+    return re.sub(r'[^A-Z0-9]', '', name)
+
+
+def birth_year(birthdate):
+    match = re.search(r'\b(1[89]\d\d|20\d\d)', str(birthdate or ''))
+
+    return match.group(1) if match else None
+
+
+def identifiers(horse):
+    """
+    The (kind, value) of every identifier horse has. A registration is only
+    unique in the country the horse is registered in, and a name in a country
+    and a year, so they are stored with them.
+    """
+    values = []
+    country = str(horse.get('country') or '').strip().upper()
+
+    ueln = re.sub(r'[^0-9A-Z]', '', str(horse.get('ueln') or '').upper())
+
+    if len(ueln) == 15:
+        values.append(('ueln', ueln))
+
+    chip = re.sub(r'[^0-9A-Z]', '', str(horse.get('chip') or '').upper())
+
+    if len(chip) >= 9:
+        values.append(('chip', chip))
+
+    registration = re.sub(r'[^0-9A-Z]', '', str(horse.get('registration') or '').upper())
+
+    if registration and country:
+        values.append(('registration', f'{country}:{registration}'))
+
+    name = normalise_name(horse.get('name') or '')
+    year = birth_year(horse.get('birthdate'))
+
+    if name and country and year:
+        values.append(('name', f'{name}:{country}:{year}'))
+
+    return values
+
+
+class IdentityIndex(object):
+    """
+    Which horses are the same horse in the data of different countries, by
+    UELN, chip, registration and name with country and year of birth, built
+    from the horses the pipeline writes. The file in IDENTITY_INDEX is shared
+    by all countries like the collected index.
+    A horse an item was loaded for is collected, the horses in its pedigree
+    and offspring are only known. known tells a spider if a horse has been
+    collected in another country, with IDENTITY_SKIP_KNOWN the frontier does
+    not schedule it, see frontier.py.
+    """
+
+    def __init__(self, path, country, horse_key=horse_key):
+        self.path = path
+        self.country = country
+        self.horse_key = horse_key
+        # the file is shared by the crawls of every country
+        self.lock = FileLock(path)
+        # the connection is shared by the reactor and the threads of the writer
+        self.connection_lock = threading.RLock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # written in a thread of the writer, read by the spiders
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS identities ('
+                                'kind TEXT NOT NULL, '
+                                'value TEXT NOT NULL, '
+                                'country TEXT NOT NULL, '
+                                'key TEXT NOT NULL, '
+                                'collected INTEGER NOT NULL DEFAULT 0, '
+                                'PRIMARY KEY (kind, value, country, key))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS identities_horse ON identities (country, key)')
+        self.connection.commit()
+
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get('IDENTITY_INDEX'), settings.get('BOT_NAME'), load_horse_key(settings))
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings)
+
+
+    def rows(self, horse, key, collected, rows):
+        for kind, value in identifiers(horse):
+            rows.append((kind, value, self.country, key, collected))
+
+        for parent in PARENTS:
+            if isinstance(horse.get(parent), Mapping) and self.horse_key(horse[parent]) is not None:
+                self.rows(horse[parent], self.horse_key(horse[parent]), 0, rows)
+
+        for offspring in horse.get(OFFSPRING) or []:
+            if isinstance(offspring, Mapping) and self.horse_key(offspring) is not None:
+                self.rows(offspring, self.horse_key(offspring), 0, rows)
+
+        return rows
+
+
+    def add(self, horse, key):
+        """
+        Adds the identifiers of horse, collected with key, and of the horses
+        in its pedigree and offspring.
+        """
+        rows = self.rows(horse, str(key), 1, [])
+
+        with self.lock, self.connection_lock, self.connection:
+            self.connection.executemany('INSERT INTO identities (kind, value, country, key, collected) '
+                                        'VALUES (?, ?, ?, ?, ?) ON CONFLICT (kind, value, country, key) '
+                                        'DO UPDATE SET collected = MAX(collected, excluded.collected)',
+                                        rows)
+
+
+    def lookup(self, horse, collected=False):
+        """
+        The horses in other countries with an identifier of horse, as
+        (kind, country, key), the surest identifier first. Only collected
+        horses when collected is True.
+        """
+        matches = []
+        found = set()
+
+        for kind, value in identifiers(horse):
+            with self.connection_lock:
+                rows = self.connection.execute('SELECT country, key FROM identities '
+                                               'WHERE kind = ? AND value = ? AND country != ? AND collected >= ?',
+                                               (kind, value, self.country, int(collected))).fetchall()
+
+            for country, key in rows:
+                if (country, key) not in found:
+                    found.add((country, key))
+                    matches.append((kind, country, key))
+
+        return matches
+
+
+    def known(self, horse, kinds=KINDS):
+        """
+        The first horse collected in another country that is horse by one of
+        kinds, as (kind, country, key), or None.
+        """
+        for match in self.lookup(horse, collected=True):
+            if match[0] in kinds:
+                return match
+
+        return None
+
+
+    def same_horses(self, key):
+        """
+        The horses in other countries that share an identifier with the horse
+        with key in this country, as (kind, country, key).
+        """
+        with self.connection_lock:
+            rows = self.connection.execute('SELECT DISTINCT other.kind, other.country, other.key '
+                                           'FROM identities AS this JOIN identities AS other '
+                                           'ON other.kind = this.kind AND other.value = this.value '
+                                           'WHERE this.country = ? AND this.key = ? AND other.country != ?',
+                                           (self.country, str(key), self.country)).fetchall()
+
+        return sorted(rows, key=lambda x: KINDS.index(x[0]))
+
+
+    def close(self):
+        with self.connection_lock:
+            self.connection.close()
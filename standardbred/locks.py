@@ -0,0 +1,31 @@
+import fcntl
+import threading
+
+
+class FileLock(object):
+    """
+    A lock on the file path + '.lock', held by one writer at a time, for the
+    sqlite files the crawls of every country and the processes of 'scrapy
+    reparse' write to. sqlite only waits for another writer for its timeout,
+    and reading what is stored before writing it back merged is not safe
+    without it. The file is opened on every acquire, so the threads of a
+    process wait for each other as well. A database in memory is not locked.
+    """
+
+    def __init__(self, path):
+        self.path = None if path in (None, '', ':memory:') else path + '.lock'
+        self.local = threading.local()
+
+
+    def __enter__(self):
+        if self.path is not None:
+            self.local.file = open(self.path, 'a')
+            fcntl.flock(self.local.file, fcntl.LOCK_EX)
+
+        return self
+
+
+    def __exit__(self, *exc_info):
+        if self.path is not None:
+            fcntl.flock(self.local.file, fcntl.LOCK_UN)
+            self.local.file.close()
@@ -0,0 +1,132 @@
+from scrapy.loader import ItemLoader
+
+from functools import lru_cache
+
+
+BREADTH_FIRST = 'breadth_first'
+DEPTH_FIRST = 'depth_first'
+
+
+@lru_cache(maxsize=None)
+def parent_positions(size, order):
+    """
+    Where the parents of every ancestor are in a flat list of size ancestors,
+    and where the parents of the horse itself are. The list holds whole
+    generations, 2 parents, 4 grandparents and so on, in one of two orders:
+        BREADTH_FIRST  sire, dam, sire's sire, sire's dam, dam's sire, ...
+        DEPTH_FIRST    sire, sire's sire, sire's sire's sire, ..., dam, dam's sire, ...
+    the first is how an API or a pedigree in columns lists them, the second
+    how a pedigree table does, row by row.
+    Returns a list of (sire, dam) positions, (None, None) for the last
+    generation, and the (sire, dam) of the horse.
+    """
+    if size < 2 or (size + 2) & (size + 1):
+        raise ValueError(f'{size} ancestors is not a whole number of generations')
+
+    parents = [(None, None)] * size
+
+    if order == BREADTH_FIRST:
+        for index in range(size):
+            if 2 * index + 3 < size:
+                parents[index] = (2 * index + 2, 2 * index + 3)
+
+        return parents, (0, 1)
+
+    def add_subtree(start, length):
+        if length == 1:
+            return
+
+        half = (length - 1) // 2
+
+        parents[start] = (start + 1, start + 1 + half)
+
+        add_subtree(start + 1, half)
+        add_subtree(start + 1 + half, half)
+
+    add_subtree(0, size // 2)
+    add_subtree(size // 2, size // 2)
+
+    return parents, (0, size // 2)
+
+
+def farthest_first(ancestors):
+    """
+    Reorders ancestors listed one generation at a time starting with the
+    farthest generation, as on hvtonline.de, to BREADTH_FIRST.
+    """
+    generations = []
+    start = 0
+    count = (len(ancestors) + 2) // 2
+
+    while count >= 2:
+        generations.append(ancestors[start : start + count])
+        start += count
+        count //= 2
+
+    return [x for generation in reversed(generations) for x in generation]
+
+
+def add_value(record, field, value):
+    if hasattr(record, 'add_value'):
+        record.add_value(field, value)
+    else:
+        record[field] = value
+
+
+def load_record(record, item=None):
+    """
+    An ancestor as an item. A record is either a loader, an ItemLoader for
+    ancestors parsed from html where the loader has the selector, or a dict of
+    values, which only gets a loader of item, the HorseItem of the project,
+    now so the input processors are run once. Without item the dict is the
+    item.
+    """
+    if hasattr(record, 'load_item'):
+        return record.load_item()
+
+    if item is None:
+        return dict(record)
+
+    loader = ItemLoader(item=item())
+
+    for field, value in record.items():
+        loader.add_value(field, value)
+
+    return loader.load_item()
+
+
+def build_pedigree(horse, ancestors, order=BREADTH_FIRST, item=None):
+    """
+    Adds the ancestors, a flat list in order, to horse as a tree. Missing
+    ancestors are None, ancestors that are dicts are loaded as item, see
+    load_record. Parents always come after their offspring in both orders, so
+    going through the list backwards every ancestor is loaded once, after its
+    own parents have been added to it.
+    """
+    parents, (sire, dam) = parent_positions(len(ancestors), order)
+
+    items = [None] * len(ancestors)
+
+    for index in range(len(ancestors) - 1, -1, -1):
+        record = ancestors[index]
+
+        if record is None:
+            continue
+
+        sire_index, dam_index = parents[index]
+
+        if sire_index is not None:
+            if items[sire_index] is not None:
+                add_value(record, 'sire', items[sire_index])
+
+            if items[dam_index] is not None:
+                add_value(record, 'dam', items[dam_index])
+
+        items[index] = load_record(record, item)
+
+    if horse is not None:
+        if items[sire] is not None:
+            add_value(horse, 'sire', items[sire])
+
+        if items[dam] is not None:
+            add_value(horse, 'dam', items[dam])
@@ -0,0 +1,318 @@
+from scrapy.utils.misc import load_object
+
+from standardbred.locks import FileLock
+
+from collections.abc import Mapping
+import json
+import os
+import sqlite3
+import threading
+
+
+# the fields of a horse that hold other horses
+PARENTS = ['sire', 'dam']
+OFFSPRING = 'offspring'
+
+# stored horses kept parsed by key, the famous sires are in nearly every item
+CACHE_SIZE = 1000
+
+# the generations of ancestors tree loads by default, about what the spiders
+# collect, every generation doubles the horses
+GENERATIONS = 5
+
+
+def horse_key(horse):
+    """
+    The key of a horse in the registry, the same as the key of its json file
+    in the collected index. None when the horse has no link.
+    A project that names its json files by something else sets its own in
+    REGISTRY_HORSE_KEY.
+    """
+    if horse.get('link') in (None, ''):
+        return None
+
+    return str(horse['link'])
+
+
+def load_horse_key(settings):
+    """
+    The function in REGISTRY_HORSE_KEY, horse_key when it is not set.
+    """
+    return load_object(settings.get('REGISTRY_HORSE_KEY') or horse_key)
+
+
+def is_reference(value):
+    return isinstance(value, Mapping) and len(value) == 1 and 'ref' in value
+
+
+def merge(record, values, replace):
+    """
+    Adds values to record, a value that is None does not overwrite anything.
+    The horse an item was loaded for replaces the values there, a horse
+    nested in it, that usually has a name and a link only, fills in what is
+    missing.
+    """
+    for field, value in values.items():
+        if value is None:
+            continue
+
+        if replace or record.get(field) is None:
+            record[field] = value
+
+
+def flatten(horse, country, records, horse_key=horse_key, replace=True):
+    """
+    Adds horse and the horses in its sire, dam and offspring to records, a
+    dict keyed by (country, key), with every horse in them replaced by a
+    reference, {'ref': [country, key]}. Returns the reference to horse, or
+    the horse when it has no key and stays where it is. horse_key is the
+    function that gives the key of a horse.
+    """
+    record = dict(horse)
+
+    for parent in PARENTS:
+        if isinstance(record.get(parent), Mapping):
+            record[parent] = flatten(record[parent], country, records, horse_key, replace=False)
+
+    if isinstance(record.get(OFFSPRING), list):
+        record[OFFSPRING] = [flatten(x, country, records, horse_key, replace=False) if isinstance(x, Mapping) else x
+                             for x in record[OFFSPRING]]
+
+    key = horse_key(horse)
+
+    if key is None:
+        return record
+
+    if (country, key) in records:
+        merge(records[(country, key)], record, replace)
+    else:
+        records[(country, key)] = record
+
+    return {'ref': [country, key]}
+
+
+class Registry(object):
+    """
+    Every horse once, keyed by country and key, with sire, dam and offspring
+    as references to other horses instead of the whole horse. Written when
+    OUTPUT_FORMAT is 'registry', a famous sire is then stored once and not
+    in the pedigree of every horse that has him in it.
+    The file in REGISTRY_PATH can be shared by all countries, like the
+    collected index. tree loads a horse with its ancestors and offspring the
+    way it was collected.
+    """
+
+    def __init__(self, path, country, horse_key=horse_key):
+        self.path = path
+        self.country = country
+        self.horse_key = horse_key
+        self.parsed = {}
+        # the file is shared by the crawls of every country
+        self.lock = FileLock(path)
+        # the connection is shared by the reactor and the threads of the writer
+        self.connection_lock = threading.RLock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # written in a thread of the writer, one write at a time
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        # a commit per item, without waiting for the disk every time
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS horses ('
+                                'country TEXT NOT NULL, '
+                                'key TEXT NOT NULL, '
+                                'collected INTEGER NOT NULL DEFAULT 0, '
+                                'data TEXT NOT NULL, '
+                                'PRIMARY KEY (country, key))')
+        self.connection.commit()
+
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get('REGISTRY_PATH'), settings.get('BOT_NAME'), load_horse_key(settings))
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings)
+
+
+    def add(self, horse):
+        """
+        Stores horse and the horses in it, merged with what is stored for
+        them, in one transaction.
+        """
+        records = {}
+        reference = flatten(dict(horse), self.country, records, self.horse_key)
+
+        # what is stored is read and written back merged, another process
+        # must not write in between
+        with self.lock, self.connection_lock:
+            self.write(records, reference)
+
+
+    def write(self, records, reference):
+        """
+        Stores the flattened horses in records merged with what is stored
+        for them, reference is the horse the item was loaded for.
+        """
+        keys = list(records)
+        stored = {}
+
+        for start in range(0, len(keys), 400):
+            chunk = keys[start : start + 400]
+            conditions = ' OR '.join(['(country = ? AND key = ?)'] * len(chunk))
+
+            for country, key, data in self.connection.execute(
+                    f'SELECT country, key, data FROM horses WHERE {conditions}',
+                    [value for x in chunk for value in x]):
+                stored[(country, key)] = self.loads((country, key), data)
+
+        # the horse the item was loaded for has been collected, replaces what
+        # is stored and the horses in it only fill in
+        collected = tuple(reference['ref']) if is_reference(reference) else None
+        rows = []
+
+        for key, record in records.items():
+            replace = key == collected
+
+            data = dict(stored.get(key, {}))
+            merge(data, record, replace)
+
+            # most of the horses in an item have not changed
+            if key in stored and data == stored[key] and not replace:
+                continue
+
+            rows.append((key[0], key[1], int(replace), json.dumps(data)))
+
+        with self.connection:
+            self.connection.executemany('INSERT INTO horses (country, key, collected, data) VALUES (?, ?, ?, ?) '
+                                        'ON CONFLICT (country, key) DO UPDATE SET data = excluded.data, '
+                                        'collected = MAX(collected, excluded.collected)',
+                                        rows)
+
+
+    def loads(self, key, data):
+        """
+        json.loads of the stored horse with key, parsed again only when what
+        is stored for it has changed. The result is shared and must not be
+        changed.
+        """
+        cached = self.parsed.get(key)
+
+        if cached is None or cached[0] != data:
+            if len(self.parsed) >= CACHE_SIZE:
+                self.parsed.clear()
+
+            cached = self.parsed[key] = (data, json.loads(data))
+
+        return cached[1]
+
+
+    def get(self, key, country=None):
+        """
+        The stored horse, with references in it, or None.
+        """
+        with self.connection_lock:
+            row = self.connection.execute('SELECT data FROM horses WHERE country = ? AND key = ?',
+                                          (country or self.country, str(key))).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+
+    def items(self):
+        """
+        The key and the stored horse of every collected horse of the country.
+        """
+        with self.connection_lock:
+            cursor = self.connection.execute('SELECT key, data FROM horses WHERE country = ? AND collected = 1',
+                                             (self.country,))
+
+        while True:
+            # the lock is not held while the caller has the horses
+            with self.connection_lock:
+                rows = cursor.fetchmany(1000)
+
+            if not rows:
+                break
+
+            for key, data in rows:
+                yield key, json.loads(data)
+
+
+    def collected_keys(self):
+        with self.connection_lock:
+            rows = self.connection.execute('SELECT key FROM horses WHERE country = ? AND collected = 1',
+                                           (self.country,)).fetchall()
+
+        return [x[0] for x in rows]
+
+
+    def load(self, value):
+        """
+        The stored horse value refers to and its (country, key), value itself
+        when it is a horse and not a reference.
+        """
+        if not is_reference(value):
+            return dict(value), (self.country, self.horse_key(value))
+
+        country, key = value['ref']
+        horse = self.get(key, country)
+
+        return (horse if horse is not None else {'link': key}), (country, key)
+
+
+    def stub(self, value):
+        """
+        The horse value refers to without the horses in it.
+        """
+        horse, _ = self.load(value)
+
+        for field in PARENTS + [OFFSPRING]:
+            horse.pop(field, None)
+
+        return horse
+
+
+    def resolve(self, value, generations, path=frozenset(), top=True):
+        """
+        The horse value refers to with generations of ancestors and its
+        offspring. The offspring of the horse get their sire and dam, the
+        offspring of an ancestor only themselves.
+        """
+        horse, key = self.load(value)
+
+        # a horse that is its own ancestor in bad data
+        if key in path:
+            return self.stub(value)
+
+        for parent in PARENTS:
+            if not isinstance(horse.get(parent), Mapping):
+                continue
+
+            if generations <= 1:
+                horse[parent] = self.stub(horse[parent])
+            else:
+                horse[parent] = self.resolve(horse[parent], generations - 1, path | {key}, top=False)
+
+        if isinstance(horse.get(OFFSPRING), list):
+            horse[OFFSPRING] = [x if not isinstance(x, Mapping) else
+                                self.resolve(x, 1, path | {key}, top=False) if top else self.stub(x)
+                                for x in horse[OFFSPRING]]
+
+        return horse
+
+
+    def tree(self, key, generations=GENERATIONS):
+        """
+        The horse with key as it was collected, its sire and dam with theirs
+        and so on for generations, and its offspring.
+        """
+        return self.resolve({'ref': [self.country, str(key)]}, generations)
+
+
+    def close(self):
+        with self.connection_lock:
+            self.connection.close()
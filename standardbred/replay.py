@@ -0,0 +1,188 @@
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+
+import hashlib
+import json
+import os
+import zlib
+
+
+class ResponseArchive(object):
+    """
+    Responses stored by the request they answer. The key of a request is a
+    hash of its method, url and body, the body of a request to Splash has the
+    url, the Splash args and the lua_source.
+    The bodies are stored compressed by the hash of their content, in
+    objects/, so a page that is the answer to several requests is only stored
+    once. index.jsonl has a line for every request with the url, status,
+    headers and body hash of the response, and the url the spider asked for
+    and if it was through Splash, a later line for the same key replaces an
+    earlier one. The index is only read when it is opened for replaying,
+    recording only appends to it.
+    """
+
+    def __init__(self, path, replay=True):
+        self.path = path
+        self.entries = {}
+
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+
+        if replay and os.path.exists(os.path.join(path, 'index.jsonl')):
+            with open(os.path.join(path, 'index.jsonl')) as infile:
+                for line in infile:
+                    entry = json.loads(line)
+                    self.entries[entry['key']] = entry
+
+        self.index = None
+
+
+    @staticmethod
+    def request_key(request):
+        return hashlib.sha1(b'\n'.join([request.method.encode(),
+                                        request.url.encode(),
+                                        request.body])).hexdigest()
+
+
+    def object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[ : 2 ], digest[ 2 : ])
+
+
+    def add(self, request, response):
+        digest = hashlib.sha1(response.body).hexdigest()
+
+        if not os.path.exists(self.object_path(digest)):
+            os.makedirs(os.path.dirname(self.object_path(digest)), exist_ok=True)
+
+            with open(self.object_path(digest), 'wb') as outfile:
+                outfile.write(zlib.compress(response.body))
+
+        # the body is stored decompressed
+        headers = {k.decode('latin-1'): [x.decode('latin-1') for x in v]
+                   for k, v in response.headers.items() if k.lower() != b'content-encoding'}
+
+        splash = request.meta.get('splash')
+
+        entry = {
+            'key': self.request_key(request),
+            'request_url': splash['args'].get('url', request.url) if splash else request.url,
+            'splash': bool(splash),
+            'url': response.url,
+            'status': response.status,
+            'headers': headers,
+            'body': digest
+        }
+
+        if self.index is None:
+            self.index = open(os.path.join(self.path, 'index.jsonl'), 'a')
+
+        self.index.write(json.dumps(entry) + '\n')
+
+
+    def read(self, digest):
+        with open(self.object_path(digest), 'rb') as infile:
+            return zlib.decompress(infile.read())
+
+
+    def latest(self, url, splash):
+        """
+        The body of the last response with status 200 to a request the spider
+        made for url, through Splash or not, None if there is none.
+        """
+        entries = [x for x in self.entries.values()
+                   if x.get('request_url') == url and x.get('splash') == splash and x['status'] == 200]
+
+        return self.read(entries[-1]['body']) if entries else None
+
+
+    def get(self, request):
+        entry = self.entries.get(self.request_key(request))
+
+        if entry is None:
+            return None
+
+        body = self.read(entry['body'])
+
+        headers = Headers(entry['headers'])
+        respcls = responsetypes.from_args(headers=headers, url=entry['url'], body=body)
+
+        return respcls(url=entry['url'], status=entry['status'], headers=headers, body=body,
+                       request=request, flags=['replayed'])
+
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+
+
+class ReplayMiddleware(object):
+    """
+    Records every response in an archive, or answers every request from the
+    archive without going to the site or to Splash, depending on REPLAY_MODE:
+        ''        the default, nothing is recorded or replayed
+        record    crawl as usual and store the responses in REPLAY_DIRECTORY
+        replay    answer from REPLAY_DIRECTORY, a request that was not
+                  recorded is ignored
+    One archive per spider, REPLAY_DIRECTORY/<spider>. Has to come after
+    SplashMiddleware in DOWNLOADER_MIDDLEWARES so the request to Splash, with
+    the Splash args, is what is recorded, and before HttpCompressionMiddleware
+    so the body is stored decompressed.
+    A replayed response never reaches the downloader, so there is no download
+    delay or throttling and a crawl runs as fast as the callbacks.
+    """
+
+    def __init__(self, mode, directory, stats):
+        self.mode = mode
+        self.directory = directory
+        self.stats = stats
+        self.archive = None
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get('REPLAY_MODE')
+
+        if not mode:
+            raise NotConfigured
+
+        if mode not in ['record', 'replay']:
+            raise NotConfigured(f'unknown REPLAY_MODE {mode}')
+
+        s = cls(mode, crawler.settings.get('REPLAY_DIRECTORY'), crawler.stats)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+
+    def process_request(self, request, spider=None):
+        if self.mode != 'replay':
+            return None
+
+        response = self.archive.get(request)
+
+        if response is None:
+            self.stats.inc_value('replay/missing')
+            raise IgnoreRequest(f'{request.url} is not in the archive')
+
+        self.stats.inc_value('replay/replayed')
+
+        return response
+
+
+    def process_response(self, request, response, spider=None):
+        if self.mode == 'record' and 'replayed' not in response.flags:
+            self.archive.add(request, response)
+            self.stats.inc_value('replay/recorded')
+
+        return response
+
+
+    def spider_opened(self, spider):
+        self.archive = ResponseArchive(os.path.join(self.directory, spider.name), self.mode == 'replay')
+
+        spider.logger.info(f'Spider opened: {spider.name}, {self.mode} {self.archive.path}')
+
+
+    def spider_closed(self, spider):
+        self.archive.close()
@@ -0,0 +1,198 @@
+from standardbred.collected import collected_key
+
+import glob
+import gzip
+import json
+import os
+
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENT_FSYNC_ITEMS = 100
+
+
+def segment_pattern(directory, country, kind):
+    return os.path.join(directory, kind, f'{country}_{kind}_*.jsonl.gz')
+
+
+def index_path(directory, country, kind):
+    return os.path.join(directory, kind, f'{country}_{kind}.index')
+
+
+class Segment(object):
+    """
+    The segment items of one kind are appended to, every item is one line of
+    json compressed as its own gzip member. The whole file can be read with
+    gzip as JSON Lines, and a single item can be decompressed from its offset
+    and length.
+    Index entries are kept until the segment has been synced, so the index
+    never points at data that is not on disk. write and sync return the keys
+    that have been synced, only those can go in the collected index.
+    """
+
+    def __init__(self, directory, country, kind, max_bytes, fsync_items):
+        self.directory = directory
+        self.country = country
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.fsync_items = fsync_items
+        self.pending = []
+
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+
+        existing = sorted(glob.glob(segment_pattern(directory, country, kind)))
+        self.number = int(existing[-1][-len('000000.jsonl.gz') : -len('.jsonl.gz')]) if existing else 0
+
+        self.index = open(index_path(directory, country, kind), 'a')
+        self.open_next()
+
+
+    def open_next(self):
+        self.number += 1
+        self.path = segment_pattern(self.directory, self.country, self.kind).replace('*', f'{self.number:06}')
+        self.file = open(self.path, 'ab')
+
+
+    def write(self, key, item):
+        data = gzip.compress(json.dumps(dict(item)).encode('utf-8') + b'\n')
+        offset = self.file.tell()
+
+        self.file.write(data)
+        self.pending.append((key, f'{key}\t{os.path.basename(self.path)}\t{offset}\t{len(data)}\n'))
+
+        synced = []
+
+        if len(self.pending) >= self.fsync_items or self.file.tell() >= self.max_bytes:
+            synced = self.sync()
+
+        if self.file.tell() >= self.max_bytes:
+            self.file.close()
+            self.open_next()
+
+        return synced
+
+
+    def sync(self):
+        """
+        Syncs the segment and then the index, returns the keys of the items
+        that are on disk now.
+        """
+        if not self.pending:
+            return []
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        self.index.writelines(x[1] for x in self.pending)
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+        synced, self.pending = [x[0] for x in self.pending], []
+
+        return synced
+
+
+    def close(self):
+        synced = self.sync()
+        self.file.close()
+        self.index.close()
+
+        # do not leave an empty segment behind
+        if os.path.getsize(self.path) == 0:
+            os.remove(self.path)
+
+        return synced
+
+
+class SegmentWriter(object):
+    """
+    Writes items to rotating segments of compressed JSON Lines instead of one
+    json file per item, one set of segments for each kind, 'result',
+    'startlist' or 'horses', in the json directory of the country. A segment
+    is rotated when it is larger than SEGMENT_MAX_BYTES, and the segment and
+    the index are synced every SEGMENT_FSYNC_ITEMS items. write and close
+    return the (kind, key) of the items that have been synced, the pipeline
+    adds them to the collected index then and not when they are written.
+    """
+
+    def __init__(self, directory, country, max_bytes=SEGMENT_MAX_BYTES, fsync_items=SEGMENT_FSYNC_ITEMS):
+        self.directory = directory
+        self.country = country
+        self.max_bytes = max_bytes
+        self.fsync_items = fsync_items
+        self.segments = {}
+
+
+    @classmethod
+    def from_crawler(cls, crawler, directory):
+        return cls(
+            directory,
+            crawler.settings.get('BOT_NAME'),
+            max_bytes=crawler.settings.getint('SEGMENT_MAX_BYTES', SEGMENT_MAX_BYTES),
+            fsync_items=crawler.settings.getint('SEGMENT_FSYNC_ITEMS', SEGMENT_FSYNC_ITEMS)
+        )
+
+
+    def write(self, kind, filename, item):
+        if kind not in self.segments:
+            self.segments[kind] = Segment(self.directory, self.country, kind,
+                                          self.max_bytes, self.fsync_items)
+
+        return [(kind, x) for x in self.segments[kind].write(collected_key(filename), item)]
+
+
+    def close(self):
+        synced = []
+
+        for kind, segment in self.segments.items():
+            synced += [(kind, x) for x in segment.close()]
+
+        self.segments = {}
+
+        return synced
+
+
+class SegmentReader(object):
+    """
+    Reads items written by SegmentWriter. get finds a single item through the
+    index, the last entry for a key is the latest version of the item.
+    """
+
+    def __init__(self, directory, country):
+        self.directory = directory
+        self.country = country
+        self.indexes = {}
+
+
+    def index(self, kind):
+        if kind not in self.indexes:
+            self.indexes[kind] = {}
+
+            if os.path.exists(index_path(self.directory, self.country, kind)):
+                with open(index_path(self.directory, self.country, kind)) as index:
+                    for line in index:
+                        key, segment, offset, length = line.rstrip('\n').split('\t')
+                        self.indexes[kind][key] = (segment, int(offset), int(length))
+
+        return self.indexes[kind]
+
+
+    def get(self, kind, key):
+        if collected_key(key) not in self.index(kind):
+            return None
+
+        segment, offset, length = self.index(kind)[collected_key(key)]
+
+        with open(os.path.join(self.directory, kind, segment), 'rb') as infile:
+            infile.seek(offset)
+
+            return json.loads(gzip.decompress(infile.read(length)))
+
+
+    def items(self, kind):
+        """
+        All items of a kind, in the order they were written.
+        """
+        for path in sorted(glob.glob(segment_pattern(self.directory, self.country, kind))):
+            with gzip.open(path, 'rt', encoding='utf-8') as infile:
+                for line in infile:
+                    yield json.loads(line)
@@ -0,0 +1,102 @@
+from scrapy.http import Request
+
+import re
+
+
+class SplashFastPathMiddleware(object):
+    """
+    Fetches Splash requests without Splash when the page does not need to be
+    rendered. The spider lists the pages in splash_fast_path, a dict of url
+    pattern to an xpath that has to match in the page, a POST made through
+    Splash is matched as 'url?body'. A request can also have the xpath in
+    splash_fast_path_xpath in its meta, for pages whose url does not tell
+    them apart. The xpath has to be the one the callback reads, a page fetched
+    without Splash has no tbody the browser would have added.
+    A matching request is sent as a plain request first, if the xpath does not
+    match in the response it is sent through Splash as before. Only requests
+    to the render.html endpoint are considered, scripts run by the execute
+    endpoint always need Splash.
+    Off unless SPLASH_FAST_PATH_ENABLED is set, for every spider, or the
+    spider is in SPLASH_FAST_PATH_SPIDERS. 'scrapy comparefetch --archive'
+    shows if a callback gets the same from both pages fetched from the site.
+    Has to come before SplashMiddleware in DOWNLOADER_MIDDLEWARES.
+    """
+
+    def __init__(self, stats, enabled=False):
+        self.stats = stats
+        self.enabled = enabled
+
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        enabled = (crawler.settings.getbool('SPLASH_FAST_PATH_ENABLED')
+                   or crawler.spidercls.name in crawler.settings.getlist('SPLASH_FAST_PATH_SPIDERS'))
+
+        return cls(crawler.stats, enabled)
+
+
+    def required_xpath(self, request, spider):
+        splash = request.meta.get('splash')
+
+        if (not self.enabled
+                or not splash
+                or request.meta.get('splash_fast_path_fallback')
+                or splash.get('endpoint', 'render.html').strip('/') != 'render.html'):
+            return None
+
+        if request.meta.get('splash_fast_path_xpath'):
+            return request.meta['splash_fast_path_xpath']
+
+        args = splash.get('args', {})
+        target = request.url
+
+        if args.get('http_method', 'GET').upper() == 'POST':
+            target = f'{request.url}?{args.get("body", "")}'
+
+        for pattern, xpath in getattr(spider, 'splash_fast_path', {}).items():
+            if re.search(pattern, target):
+                return xpath
+
+
+    def process_request(self, request, spider):
+        xpath = self.required_xpath(request, spider)
+
+        if xpath is None:
+            return None
+
+        args = request.meta['splash'].get('args', {})
+        meta = dict(request.meta, splash_fast_path=(xpath, request))
+        del meta['splash']
+
+        headers = request.headers.copy()
+
+        if args.get('http_method', 'GET').upper() == 'POST':
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+
+        self.stats.inc_value('splash_fast_path/plain')
+
+        return request.replace(
+                    cls=Request,
+                    url=args.get('url', request.url),
+                    method=args.get('http_method', 'GET'),
+                    body=args.get('body', b''),
+                    headers=headers,
+                    meta=meta,
+                    dont_filter=True)
+
+
+    def process_response(self, request, response, spider):
+        if 'splash_fast_path' not in request.meta:
+            return response
+
+        xpath, original = request.meta['splash_fast_path']
+
+        if response.status == 200 and hasattr(response, 'xpath') and response.xpath(xpath):
+            return response
+
+        spider.logger.debug(f'{xpath} not found without Splash, falling back for {original.url}')
+        self.stats.inc_value('splash_fast_path/fallback')
+
+        return original.replace(
+                    meta=dict(original.meta, splash_fast_path_fallback=True),
+                    dont_filter=True)
@@ -0,0 +1,81 @@
+import textwrap
+
+
+MAX_WAIT = 10
+
+WAIT_FUNCTIONS = """
+function wait_for(splash, condition, timeout)
+    -- wait until condition returns true, or give up after timeout seconds
+    local waited = 0
+    timeout = timeout or MAX_WAIT
+    while not condition() do
+        if waited >= timeout then
+            return false
+        end
+        splash:wait(0.1)
+        waited = waited + 0.1
+    end
+    return true
+end
+
+function wait_for_selector(splash, selector, timeout)
+    return wait_for(splash, function()
+        return splash:select(selector) ~= nil
+    end, timeout)
+end
+
+function wait_for_text(splash, selector, text, timeout)
+    return wait_for(splash, function()
+        local element = splash:select(selector)
+        return element ~= nil and element:text() == text
+    end, timeout)
+end
+
+function wait_for_class(splash, element, class, timeout)
+    return wait_for(splash, function()
+        local classes = ' ' .. (element.node.className or '') .. ' '
+        return string.find(classes, ' ' .. class .. ' ', 1, true) ~= nil
+    end, timeout)
+end
+
+local pending_requests = 0
+
+function request_finished()
+    if pending_requests > 0 then
+        pending_requests = pending_requests - 1
+    end
+end
+
+function track_requests(splash)
+    -- has to be called before splash:go for wait_for_idle to work, a request
+    -- that fails never gets a response and is counted as finished too
+    splash:on_request(function(request)
+        pending_requests = pending_requests + 1
+    end)
+    splash:on_response(function(response)
+        request_finished()
+    end)
+    splash:on_request_failed(function(request)
+        request_finished()
+    end)
+end
+
+function wait_for_idle(splash, timeout)
+    -- give the page a moment to start any requests, then wait for them
+    splash:wait(0.1)
+    return wait_for(splash, function()
+        return pending_requests <= 0
+    end, timeout)
+end
+"""
+
+
+def lua_script(source, max_wait=MAX_WAIT):
+    """
+    Adds the wait functions to a Splash script. Instead of sleeping for a
+    fixed time the script waits for something on the page, a selector to
+    appear, a text or class to change or the requests to finish. Every wait
+    gives up after max_wait seconds, the script then carries on with the page
+    as it is.
+    """
+    return f'MAX_WAIT = {max_wait}\n' + WAIT_FUNCTIONS + textwrap.dedent(source)
@@ -0,0 +1,86 @@
+"""
+AdaptiveThrottle replaces Scrapy's AutoThrottle and overrides two of its
+private methods, _response_downloaded, which AutoThrottle connects to the
+response_downloaded signal, and _adjust_delay, which sets the delay of a
+slot, and calls a third, _get_slot. They are not part of the API Scrapy
+keeps stable, check them when Scrapy is upgraded.
+"""
+from scrapy.extensions.throttle import AutoThrottle
+
+from email.utils import parsedate_to_datetime
+import datetime
+
+
+BACKOFF_STATUSES = [429, 500, 502, 503, 504]
+
+
+def retry_after(response):
+    """
+    The number of seconds in the Retry-After header, which is either a number
+    of seconds or a date, or None.
+    """
+    value = response.headers.get('Retry-After')
+
+    if not value:
+        return None
+
+    value = value.decode('latin-1').strip()
+
+    if value.isdigit():
+        return int(value)
+
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0, (retry_date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class AdaptiveThrottle(AutoThrottle):
+    """
+    AutoThrottle that also backs off when a host is in trouble. Like
+    AutoThrottle the delay is per download slot, that is per host, and comes
+    closer to latency / AUTOTHROTTLE_TARGET_CONCURRENCY with every response, so
+    it goes down when the responses are fast.
+    When a host answers 429 or 5xx the delay is multiplied by
+    AUTOTHROTTLE_BACKOFF_FACTOR, or set to Retry-After if that is longer. Splash
+    answers 503 when its render queue is full and 504 when a render times out,
+    the slot of a Splash request is the host of the page so that host is
+    slowed down.
+    The current delay and rate of every host are in the stats as
+    throttle/<host>/delay and throttle/<host>/rate.
+    """
+
+    def __init__(self, crawler):
+        super(AdaptiveThrottle, self).__init__(crawler)
+        self.backoff_factor = crawler.settings.getfloat('AUTOTHROTTLE_BACKOFF_FACTOR', 2.0)
+
+
+    def _response_downloaded(self, response, request, spider):
+        super(AdaptiveThrottle, self)._response_downloaded(response, request, spider)
+
+        key, slot = self._get_slot(request, spider)
+
+        if slot is None:
+            return
+
+        self.crawler.stats.set_value(f'throttle/{key}/delay', round(slot.delay, 3))
+        self.crawler.stats.set_value(f'throttle/{key}/rate',
+                                     round(1 / slot.delay, 3) if slot.delay else None)
+
+        if response.status in BACKOFF_STATUSES:
+            self.crawler.stats.inc_value(f'throttle/{key}/backoff')
+
+
+    def _adjust_delay(self, slot, latency, response):
+        if response.status not in BACKOFF_STATUSES:
+            super(AdaptiveThrottle, self)._adjust_delay(slot, latency, response)
+            return
+
+        new_delay = max(slot.delay, self.mindelay, 1.0) * self.backoff_factor
+
+        if retry_after(response) is not None:
+            new_delay = max(new_delay, retry_after(response))
+
+        slot.delay = min(new_delay, self.maxdelay)
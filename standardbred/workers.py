@@ -0,0 +1,211 @@
+from scrapy import signals
+
+from twisted.internet.defer import Deferred, DeferredList, succeed
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+
+
+PIPELINE_THREADS = 4
+PIPELINE_PROCESSES = 2
+PIPELINE_MAX_PENDING = 100
+
+
+def dumps(item):
+    """
+    The json of an item as the pipelines write it, runs in a process of the
+    pool when there is one.
+    """
+    return json.dumps(item, indent=4)
+
+
+class Workers(object):
+    """
+    The threads and processes the writer pools with the same numbers of them
+    run their jobs in, one of each in a process. The collectors of every
+    country crawled in one process by crawl.py share them, instead of a pool
+    of threads and processes for every pipeline. Stopped when the last writer
+    pool using them stops.
+    """
+    _workers = {}
+
+    def __init__(self, reactor, threads, processes):
+        self.reactor = reactor
+        self.key = (threads, processes)
+        self.users = 0
+
+        self.threadpool = ThreadPool(1, threads, name='writer')
+        self.threadpool.start()
+        self.shutdown = self.reactor.addSystemEventTrigger('during', 'shutdown', self.threadpool.stop)
+
+        # the processes are started from a thread of the writer, a fork there
+        # could copy a lock another thread holds
+        self.executor = (ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+                         if processes else None)
+
+
+    @classmethod
+    def acquire(cls, reactor, threads, processes):
+        if (threads, processes) not in cls._workers:
+            cls._workers[(threads, processes)] = cls(reactor, threads, processes)
+
+        workers = cls._workers[(threads, processes)]
+        workers.users += 1
+
+        return workers
+
+
+    def release(self):
+        self.users -= 1
+
+        if self.users == 0:
+            del self._workers[self.key]
+
+            self.reactor.removeSystemEventTrigger(self.shutdown)
+            self.threadpool.stop()
+
+            if self.executor is not None:
+                self.executor.shutdown()
+
+
+class WriterPool(object):
+    """
+    Runs the writes of a pipeline in PIPELINE_THREADS threads instead of in
+    the reactor, so downloads go on while items are written. json.dumps with
+    indent does not use the C encoder and holds the GIL, it is done in a pool
+    of PIPELINE_PROCESSES processes, 0 does it in the thread.
+    Jobs with the same key, the same file or the same segments, run one at a
+    time in the order they were submitted. When PIPELINE_MAX_PENDING jobs are
+    waiting room returns a Deferred that fires when one of them is done, the
+    pipeline returns it from process_item so the engine stops taking more
+    responses until the writes have caught up.
+    A crawl where a write failed finishes with the reason 'write_failed'
+    instead of 'finished', the pipelines count the failures in stats.
+    The threads and processes are shared with the other writer pools of the
+    process, see Workers, the jobs, their order and the failures are not.
+    """
+
+    def __init__(self, threads=PIPELINE_THREADS, processes=PIPELINE_PROCESSES, max_pending=PIPELINE_MAX_PENDING):
+        # imported here so the reactor Scrapy chose is installed first
+        from twisted.internet import reactor
+
+        self.reactor = reactor
+        self.max_pending = max_pending
+        self.pending = 0
+        self.chains = {}
+        self.waiting = []
+        self.failed = 0
+
+        self.workers = Workers.acquire(reactor, threads, processes)
+        self.threadpool = self.workers.threadpool
+        self.executor = self.workers.executor
+
+
+    @classmethod
+    def from_crawler(cls, crawler, **kwargs):
+        kwargs.setdefault('threads', crawler.settings.getint('PIPELINE_THREADS', PIPELINE_THREADS))
+        kwargs.setdefault('processes', crawler.settings.getint('PIPELINE_PROCESSES', PIPELINE_PROCESSES))
+        kwargs.setdefault('max_pending', crawler.settings.getint('PIPELINE_MAX_PENDING', PIPELINE_MAX_PENDING))
+
+        s = cls(**kwargs)
+        s.crawler = crawler
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+
+    def submit(self, key, function, *args):
+        """
+        Runs function(*args) in a thread once the jobs submitted before with
+        the same key are done, returns a Deferred with what it returns.
+        """
+        self.pending += 1
+
+        previous = self.chains.get(key)
+        done = Deferred()
+        result = Deferred()
+
+        self.chains[key] = done
+
+        def run(_):
+            job = deferToThreadPool(self.reactor, self.threadpool, function, *args)
+            job.addBoth(self.finished, key, done)
+            job.chainDeferred(result)
+
+        if previous is None:
+            run(None)
+        else:
+            previous.addCallback(run)
+
+        return result
+
+
+    def finished(self, result, key, done):
+        self.pending -= 1
+
+        if isinstance(result, Failure):
+            self.failed += 1
+
+        if self.chains.get(key) is done:
+            del self.chains[key]
+
+        done.callback(None)
+
+        while self.waiting and self.pending < self.max_pending:
+            self.waiting.pop(0).callback(None)
+
+        return result
+
+
+    def room(self):
+        """
+        A Deferred that fires when fewer than max_pending jobs are waiting.
+        """
+        if self.pending < self.max_pending:
+            return succeed(None)
+
+        waiting = Deferred()
+        self.waiting.append(waiting)
+
+        return waiting
+
+
+    def dumps(self, item):
+        """
+        The json of item, called in a thread of the pool.
+        """
+        if self.executor is None:
+            return dumps(dict(item))
+
+        return self.executor.submit(dumps, dict(item)).result()
+
+
+    def close(self):
+        """
+        Waits for every job, the last job of a key is done after the ones
+        before it, and then stops the threads and processes when no other
+        writer pool uses them.
+        """
+        closed = DeferredList(list(self.chains.values()))
+        closed.addBoth(self.stop)
+
+        return closed
+
+
+    def spider_closed(self, spider, reason):
+        """
+        Connected after CoreStats, so the reason it has put in stats is
+        replaced.
+        """
+        if self.failed and reason == 'finished':
+            spider.logger.error(f'{self.failed} writes failed')
+            self.crawler.stats.set_value('finish_reason', 'write_failed')
+
+
+    def stop(self, _=None):
+        if self.workers is not None:
+            self.workers.release()
+            self.workers = None
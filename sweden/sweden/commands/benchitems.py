@@ -0,0 +1,91 @@
+from scrapy.commands import ScrapyCommand
+
+from sweden.fixtures import find_fixtures, create_spider, run_fixture
+from standardbred.itemfactory import item_loader
+
+import json
+import sys
+import time
+
+
+class Command(ScrapyCommand):
+    """
+    Runs the callback of every fixture on its saved API response, response.json,
+    a number of times with the items loaded by FastLoader and the same number
+    of times with ItemLoader, checks that the output is the same and reports
+    how long both took.
+    """
+    requires_project = True
+
+    def syntax(self):
+        return '[options] [fixture ...]'
+
+
+    def short_desc(self):
+        return 'Compare the time callbacks take with FastLoader and with ItemLoader'
+
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('-n', '--repeat', type=int, default=100,
+                            help='times to run every callback with each loader, default 100')
+
+
+    def process_options(self, args, opts):
+        super(Command, self).process_options(args, opts)
+
+        # nothing should be skipped because it has already been collected
+        self.settings.set('COLLECTED_INDEX', ':memory:', priority='cmdline')
+
+
+    def time_fixture(self, spider, fixture, repeat):
+        start = time.perf_counter()
+
+        for _ in range(repeat):
+            output = run_fixture(spider, fixture, 'response.json')
+
+        return output, time.perf_counter() - start
+
+
+    def run(self, args, opts):
+        fast_total = 0
+        loader_total = 0
+        different = 0
+
+        for fixture in find_fixtures(self.settings.get('FIXTURES_DIRECTORY'), args):
+            spider = create_spider(self.crawler_process, fixture)
+            spider_module = sys.modules[type(spider).__module__]
+
+            fast_output, fast_time = self.time_fixture(spider, fixture, opts.repeat)
+
+            # the spider module gets ItemLoaders where it asks for a FastLoader
+            fast_loader = spider_module.FastLoader
+            spider_module.FastLoader = item_loader
+
+            try:
+                loader_output, loader_time = self.time_fixture(spider, fixture, opts.repeat)
+            finally:
+                spider_module.FastLoader = fast_loader
+
+            fast_total += fast_time
+            loader_total += loader_time
+
+            print(f'{fixture["name"]}: FastLoader {fast_time / opts.repeat * 1000:.2f} ms, '
+                  f'ItemLoader {loader_time / opts.repeat * 1000:.2f} ms, '
+                  f'{loader_time / fast_time:.1f} times faster')
+
+            if fast_output != loader_output:
+                different += 1
+
+                for index, (fast, loader) in enumerate(zip(fast_output, loader_output)):
+                    if fast != loader:
+                        print(f'  different output {index}')
+                        print('  FastLoader: ' + json.dumps(fast, sort_keys=True))
+                        print('  ItemLoader: ' + json.dumps(loader, sort_keys=True))
+                        break
+
+        if fast_total:
+            print(f'in total {loader_total / fast_total:.1f} times faster, {different} fixtures with different output')
+
+        if different:
+            self.exitcode = 1
@@ -0,0 +1,164 @@
+from scrapy.http import HtmlResponse, TextResponse, Request
+from scrapy.item import Item
+from scrapy.loader import ItemLoader
+from scrapy.utils.misc import load_object
+from scrapy.utils.spider import iterate_spider_output
+
+from standardbred.assembly import Assembly
+from standardbred.collected import CollectedIndex
+from standardbred.frontier import Frontier
+
+import datetime
+import importlib
+import json
+import os
+
+
+class SplashJsonResponse(HtmlResponse):
+    """
+    A response to a Splash script like scrapy_splash has it, the html the
+    script returned as the body and everything it returned in data.
+    """
+
+    def __init__(self, *args, data=None, **kwargs):
+        super(SplashJsonResponse, self).__init__(*args, **kwargs)
+        self.data = data
+
+
+def find_fixtures(directory, names=None):
+    """
+    Saved pages for running a callback without downloading anything. Every
+    fixture is a directory, FIXTURES_DIRECTORY/<spider>/<name>, with
+    fixture.json and the page as it was fetched, plain.html without Splash,
+    splash.html through Splash, splash.json from a Splash script or
+    response.json from an API.
+    fixture.json has the url, the spider and the callback, and the meta,
+    cb_kwargs and spider_kwargs to use. Values are used as they are except for
+    dicts with one of these keys:
+        {"date": "2020-01-01"}                     a datetime.date
+        {"loader": "RacedayItem", "values": {}}    an ItemLoader for an item in items.py
+        {"assembly": part}                         an Assembly that loads the result for part
+    """
+    if not os.path.isdir(directory):
+        return
+
+    for spider in sorted(os.listdir(directory)):
+        for name in sorted(os.listdir(os.path.join(directory, spider))):
+            path = os.path.join(directory, spider, name)
+
+            if names and name not in names and f'{spider}/{name}' not in names:
+                continue
+
+            with open(os.path.join(path, 'fixture.json')) as infile:
+                fixture = json.load(infile)
+
+            fixture.setdefault('spider', spider)
+            fixture['name'] = f'{spider}/{name}'
+            fixture['path'] = path
+
+            yield fixture
+
+
+def build_value(value, project):
+    if isinstance(value, list):
+        return [build_value(x, project) for x in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    if 'date' in value and len(value) == 1:
+        return datetime.date.fromisoformat(value['date'])
+
+    if 'loader' in value:
+        items = importlib.import_module(f'{project}.items')
+        loader = ItemLoader(item=getattr(items, value['loader'])())
+
+        for field, field_value in value.get('values', {}).items():
+            loader.add_value(field, build_value(field_value, project))
+
+        return loader
+
+    if 'assembly' in value and len(value) == 1:
+        return Assembly([value['assembly']], lambda results: results[0].load_item())
+
+    return {k: build_value(v, project) for k, v in value.items()}
+
+
+def create_spider(crawler_process, fixture):
+    spidercls = crawler_process.spider_loader.load(fixture['spider'])
+    crawler = crawler_process.create_crawler(spidercls)
+
+    # a crawler only gets its stats when it crawls, assemblies count in them
+    crawler.stats = load_object(crawler.settings.get('STATS_CLASS'))(crawler)
+
+    spider = spidercls.from_crawler(crawler, **fixture.get('spider_kwargs', {}))
+
+    spider.collected = CollectedIndex.from_crawler(crawler)
+
+    # horsecollectors schedule offspring through a frontier that is not saved
+    if getattr(importlib.import_module(spidercls.__module__), 'Frontier', None) is Frontier:
+        spider.frontier = Frontier(None, spider.collected)
+
+    return spider
+
+
+def plain_output(value):
+    """
+    What a callback returned, as something that can be compared and printed.
+    """
+    if isinstance(value, Request):
+        return {
+            'request': value.url,
+            'method': value.method,
+            'body': value.body.decode('utf-8', 'replace'),
+            'callback': getattr(value.callback, '__name__', None),
+            'splash': plain_output(value.meta.get('splash', {}).get('args'))
+        }
+
+    if isinstance(value, (dict, Item)):
+        return {k: plain_output(v) for k, v in dict(value).items()}
+
+    if isinstance(value, (list, tuple)):
+        return [plain_output(x) for x in value]
+
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+
+    return str(value)
+
+
+def fixture_response(fixture, page, project):
+    """
+    The page of the fixture as the response to its request, with new meta and
+    cb_kwargs every time as callbacks add to the loaders in them.
+    splash.json is what a Splash script returned, as response.data like
+    scrapy_splash has it, with the html it returned, if any, as the body.
+    """
+    with open(os.path.join(fixture['path'], page), 'rb') as infile:
+        body = infile.read()
+
+    request = Request(fixture['url'],
+                      meta=build_value(fixture.get('meta', {}), project),
+                      cb_kwargs=build_value(fixture.get('cb_kwargs', {}), project))
+
+    if page == 'splash.json':
+        data = json.loads(body)
+        html = data.get('html', '') if isinstance(data, dict) else ''
+
+        return SplashJsonResponse(fixture['url'], body=html, encoding='utf-8', request=request, data=data)
+
+    response_class = TextResponse if page.endswith('.json') else HtmlResponse
+
+    return response_class(fixture['url'], body=body, encoding='utf-8', request=request)
+
+
+def run_fixture(spider, fixture, page):
+    """
+    Runs the callback of the fixture on one of its pages and returns what it
+    produced.
+    """
+    response = fixture_response(fixture, page, spider.settings.get('BOT_NAME'))
+
+    callback = getattr(spider, fixture.get('callback', 'parse'))
+
+    return [plain_output(x) for x in iterate_spider_output(callback(response, **response.request.cb_kwargs))]
@@ -0,0 +1,140 @@
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.extensions.httpcache import DbmCacheStorage, RFC2616Policy
+from scrapy.http import Response
+
+from time import time
+
+import pickle
+import zlib
+
+
+# the endpoints are those of the horses in the API, raceinfo has a results
+# endpoint too that is not cached
+HORSE_API = '/webapi/horses/'
+
+
+def endpoint_for(url, ttls):
+    """
+    The first endpoint in ttls that url is a request to, or None. More
+    specific endpoints, 'pedigree/description', have to come before the ones
+    they contain, 'pedigree'.
+    """
+    for endpoint in ttls:
+        if f'{HORSE_API}{endpoint}/' in url:
+            return endpoint
+
+    return None
+
+
+class EndpointPolicy(RFC2616Policy):
+    """
+    Caches the GET requests to the horse endpoints in HTTPCACHE_ENDPOINT_TTLS, a
+    dict of endpoint and the number of seconds a response is fresh. Everything else
+    is downloaded as usual.
+    A stale response is revalidated with If-None-Match and If-Modified-Since
+    when the response had an ETag or Last-Modified, if the server answers 304
+    the cached response is used and is fresh again.
+    """
+
+    def __init__(self, settings):
+        super(EndpointPolicy, self).__init__(settings)
+        self.ttls = settings.getdict('HTTPCACHE_ENDPOINT_TTLS')
+
+
+    def should_cache_request(self, request):
+        if request.method != 'GET' or endpoint_for(request.url, self.ttls) is None:
+            return False
+
+        return super(EndpointPolicy, self).should_cache_request(request)
+
+
+    def should_cache_response(self, response, request):
+        return response.status == 200
+
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        ttl = self.ttls[endpoint_for(request.url, self.ttls)]
+
+        # the time the response was stored, or refreshed by a revalidation
+        stored = request.meta.get('cache_timestamp')
+
+        if stored is not None:
+            age = time() - stored
+        else:
+            age = self._compute_current_age(cachedresponse, request, time())
+
+        if age < ttl:
+            return True
+
+        self._set_conditional_validators(request, cachedresponse)
+
+        return False
+
+
+class CompressedDbmCacheStorage(DbmCacheStorage):
+    """
+    DbmCacheStorage with the responses compressed, the json from the API
+    compresses to a fraction of its size.
+    """
+
+    def store_response(self, spider, request, response):
+        key = self._fingerprinter.fingerprint(request).hex()
+
+        self.db[f'{key}_data'] = zlib.compress(pickle.dumps(response.to_dict(), protocol=4))
+        self.db[f'{key}_time'] = str(time())
+
+
+    def _read_data(self, spider, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+
+        if f'{key}_time' not in self.db:
+            return None
+
+        timestamp = float(self.db[f'{key}_time'])
+
+        if 0 < self.expiration_secs < time() - timestamp:
+            return None
+
+        return pickle.loads(zlib.decompress(self.db[f'{key}_data'])), timestamp
+
+
+class EndpointCacheMiddleware(HttpCacheMiddleware):
+    """
+    HttpCacheMiddleware that also counts hits, misses and revalidations per
+    endpoint, httpcache/<endpoint>/hit and so on in the stats.
+    """
+
+    def __init__(self, settings, stats):
+        super(EndpointCacheMiddleware, self).__init__(settings, stats)
+        self.ttls = settings.getdict('HTTPCACHE_ENDPOINT_TTLS')
+
+
+    def inc_endpoint(self, request, name):
+        endpoint = endpoint_for(request.url, self.ttls)
+
+        if endpoint is not None:
+            self.stats.inc_value(f'httpcache/{endpoint}/{name}')
+
+
+    def process_request(self, request, spider=None):
+        result = super(EndpointCacheMiddleware, self).process_request(request)
+
+        if isinstance(result, Response):
+            self.inc_endpoint(request, 'hit')
+        elif 'cached_response' in request.meta:
+            self.inc_endpoint(request, 'stale')
+        elif '_dont_cache' not in request.meta and not request.meta.get('dont_cache'):
+            self.inc_endpoint(request, 'miss')
+
+        return result
+
+
+    def process_response(self, request, response, spider=None):
+        cachedresponse = request.meta.get('cached_response')
+
+        result = super(EndpointCacheMiddleware, self).process_response(request, response)
+
+        if cachedresponse is not None and result is cachedresponse:
+            self.inc_endpoint(request, 'revalidated')
+
+        return result
@@ -3,8 +3,9 @@ import scrapy
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import Spider, Rule
 from scrapy.http import Request, JsonRequest
-from scrapy.loader import ItemLoader
 from sweden.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.frontier import Frontier
 
 from scrapy_splash import SplashFormRequest, SplashRequest
 
@@ -12,9 +13,7 @@ from datetime import date, timedelta
 import json
 import pprint
 import re
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/sweden'
 
 BASE_URL = 'https://api.travsport.se/webapi/horses/'
 BASIC_INFO_URL = '{}basicinformation/organisation/TROT/sourceofdata/SPORT/horseid/{}'
@@ -26,8 +25,8 @@ RESULT_SUMMARY_URL = '{}statistics/organisation/TROT/sourceofdata/SPORT/horseid/
 
 
 def handle_pedigree(pedigree):
-    sire = ItemLoader(item=HorseItem())
-    dam = ItemLoader(item=HorseItem())
+    sire = FastLoader(HorseItem)
+    dam = FastLoader(HorseItem)
 
     if 'father' in pedigree:
 
@@ -54,7 +53,9 @@ def handle_pedigree(pedigree):
         dam.add_value('sire', grand_sire)
         dam.add_value('dam', grand_dam)
 
-    return sire.load_item() if sire.load_item() else None, dam.load_item() if dam.load_item() else None
+    sire, dam = sire.load_item(), dam.load_item()
+
+    return sire if sire else None, dam if dam else None
 
 
 def handle_racetime(timevalue):
@@ -72,6 +73,7 @@ class HorseCollector(Spider):
     Collects horses from https://sportapp.travsport.se
     It takes a start_id as starting point.
     If the horse collected is a mare and it has offspring, all these are also collected.
+    The offspring are scheduled through the frontier, see standardbred/frontier.py.
     """
     name = 'horsecollector'
     allowed_domains = ['travsport.se']
@@ -82,15 +84,19 @@ class HorseCollector(Spider):
 
 
     def start_requests(self):
-        yield JsonRequest(
-                    url=BASIC_INFO_URL.format(BASE_URL, self.start_id),
-                    callback=self.parse_basic_info)
+        self.frontier = Frontier.from_crawler(self.crawler, self.start_id)
+
+        for horse_id in self.frontier.start(self.start_id):
+            yield JsonRequest(
+                        url=BASIC_INFO_URL.format(BASE_URL, horse_id),
+                        callback=self.parse_basic_info,
+                        priority=self.frontier.priority(horse_id))
 
 
     def parse_basic_info(self, response):
         response_json = json.loads(response.body)
 
-        horse = ItemLoader(item = HorseItem())
+        horse = FastLoader(HorseItem)
 
         horse.add_value('name', response_json['name'])
         horse.add_value('country', response_json['birthCountryCode'])
@@ -159,7 +165,7 @@ class HorseCollector(Spider):
         response_json = json.loads(response.body)
 
         for offspring in response_json['offspring']:
-            progeny = ItemLoader(item=HorseItem())
+            progeny = FastLoader(HorseItem)
 
             progeny.add_value('name', offspring['horse']['name'])
             progeny.add_value('country', offspring['horse']['name'])
@@ -180,7 +186,7 @@ class HorseCollector(Spider):
                 })
 
             if horse.get_output_value('sex') == 'mare':
-                sire = ItemLoader(item=HorseItem())
+                sire = FastLoader(HorseItem)
 
                 sire.add_value('name', offspring['horsesParent']['name'])
                 sire.add_value('country', offspring['horsesParent']['name'])
@@ -189,14 +195,16 @@ class HorseCollector(Spider):
 
                 progeny.add_value('sire', sire.load_item())
 
-                if not os.path.exists(os.path.join(JSON_DIRECTORY, 'horses', str(offspring['horse']['id']) + '.json')):
+                if self.frontier.schedule(offspring['horse']['id'], parent=horse.get_output_value('link'),
+                                          horse=progeny.load_item()):
                     yield JsonRequest(
                                 url=BASIC_INFO_URL.format(BASE_URL, offspring['horse']['id']),
-                                callback=self.parse_basic_info)
+                                callback=self.parse_basic_info,
+                                priority=self.frontier.priority(offspring['horse']['id']))
 
             else:
                 if offspring['horsesParent']['id'] != 0:
-                    dam = ItemLoader(item=HorseItem())
+                    dam = FastLoader(HorseItem)
 
                     dam.add_value('name', offspring['horsesParent']['name'])
                     dam.add_value('country', offspring['horsesParent']['name'])
@@ -204,7 +212,7 @@ class HorseCollector(Spider):
                     dam.add_value('sex', 'mare')
 
                     if offspring['horsesParentsFather']['id'] != 0:
-                        dam_sire = ItemLoader(item=HorseItem())
+                        dam_sire = FastLoader(HorseItem)
 
                         dam_sire.add_value('name', offspring['horsesParentsFather']['name'])
                         dam_sire.add_value('country', offspring['horsesParentsFather']['name'])
@@ -1,14 +1,13 @@
 from scrapy.spiders import Spider
 from scrapy.http import JsonRequest
-from scrapy.loader import ItemLoader
 from sweden.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.collected import CollectedIndex
 
 from datetime import date, timedelta, datetime
 import json
-import os
 
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/sweden'
 
 BASE_URL_ATG = 'https://www.atg.se/services/racinginfo/v1/api/'
 CALENDAR_URL_ATG = BASE_URL_ATG + 'calendar/day/{}'
@@ -29,6 +28,9 @@ class ResultCollector(Spider):
     """
     name = 'resultcollector'
     allowed_domains = ['atg.se', 'travsport.se']
+    # the racedays are asked for a day at a time, so 'scrapy reparse' can
+    # split a date range in windows
+    reparse_window_days = 7
 
     def __init__(self, start_date = '', end_date = '', *args, **kwargs):
         super(ResultCollector, self).__init__(*args, **kwargs)
@@ -38,15 +40,15 @@ class ResultCollector(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         current_date = self.start_date
-        urls = []
+
         while current_date <= self.end_date:
-            urls.append(CALENDAR_URL_ATG.format(current_date.strftime('%Y-%m-%d')))
-            current_date += timedelta(days = 1)
+            yield JsonRequest(url=CALENDAR_URL_ATG.format(current_date.strftime('%Y-%m-%d')),
+                              callback=self.parse_day_atg)
 
-        yield JsonRequest(url=urls.pop(0),
-                          callback=self.parse_day_atg,
-                          meta={'urls': urls, 'racedays': []})
+            current_date += timedelta(days = 1)
 
 
     def parse_day_atg(self, response):
@@ -54,50 +56,34 @@ class ResultCollector(Spider):
 
         current_date = day_json['date']
 
-        racedays = response.meta['racedays']
-
         for raceday_json in day_json['tracks']:
             filename = '_'.join([current_date.replace('-', '_'),
                                  raceday_json['name'].lower() + '.json'])
 
             if (raceday_json['countryCode'] == 'SE'
                     and raceday_json['sport'] == 'trot'
-                    and not os.path.exists(os.path.join(JSON_DIRECTORY, 'result', filename))
+                    and not self.collected.contains('result', filename)
                     and 'races' in raceday_json):
 
-                raceday = ItemLoader(item = RacedayItem())
+                raceday = FastLoader(RacedayItem)
 
                 raceday.add_value('status', 'result')
                 raceday.add_value('date', current_date)
                 raceday.add_value('racetrack', raceday_json['name'])
                 raceday.add_value('racetrack_code', raceday_json['id'])
 
-                racedays.append({
-                    'url': RESULT_URL_ATG.format(current_date, raceday_json['id']),
-                    'raceday': raceday,
-                    'races': {}
-                })
+                yield JsonRequest(url=RESULT_URL_ATG.format(current_date, raceday_json['id']),
+                                  callback=self.parse_raceday_atg,
+                                  cb_kwargs=dict(raceday=raceday))
 
 
-        if len(response.meta['urls']) != 0:
-            yield JsonRequest(url=response.meta['urls'].pop(0),
-                              callback=self.parse_day_atg,
-                              meta={'urls': response.meta['urls'],
-                                    'racedays': racedays})
-
-        elif len(racedays) != 0:
-            yield JsonRequest(url=racedays[0]['url'],
-                              callback=self.parse_raceday_atg,
-                              meta = {'racedays': racedays})
-
-
-    def parse_raceday_atg(self, response):
-        raceday = [x for x in response.meta['racedays'] if x['url'] == response.url][0]
+    def parse_raceday_atg(self, response, raceday):
+        races = {}
 
         raceday_json = json.loads(response.body)
 
         for race_json in raceday_json['races']:
-            race = ItemLoader(item = RaceItem())
+            race = FastLoader(RaceItem)
 
             race.add_value('racetype', 'race')
             race.add_value('racenumber', race_json['number'])
@@ -117,7 +103,7 @@ class ResultCollector(Spider):
             race_purse = 0
 
             for order, starter_json in enumerate(starts, 1):
-                starter         = ItemLoader(item = RaceStarterItem())
+                starter         = FastLoader(RaceStarterItem)
 
                 starter.add_value('startnumber', starter_json['number'])
                 starter.add_value('postposition', starter_json['postPosition'])
@@ -129,28 +115,28 @@ class ResultCollector(Spider):
                     starter.add_value('trainer',
                         ' '.join([starter_json['horse']['trainer']['lastName'], starter_json['horse']['trainer']['firstName']]))
 
-                horse = ItemLoader(item = HorseItem())
+                horse = FastLoader(HorseItem)
 
                 horse.add_value('name', starter_json['horse']['name'])
                 horse.add_value('link', starter_json['horse']['id'])
                 horse.add_value('country', starter_json['horse'].get('nationality', 'SE'))
                 horse.add_value('sex', starter_json['horse']['sex'])
 
-                sire = ItemLoader(item = HorseItem())
+                sire = FastLoader(HorseItem)
 
                 sire.add_value('name', starter_json['horse']['pedigree']['father']['name'])
                 sire.add_value('link', starter_json['horse']['pedigree']['father']['id'])
                 sire.add_value('sex', 'horse')
                 sire.add_value('country', starter_json['horse']['pedigree']['father'].get('nationality', 'SE'))
 
-                dam = ItemLoader(item = HorseItem())
+                dam = FastLoader(HorseItem)
 
                 dam.add_value('name', starter_json['horse']['pedigree']['mother']['name'])
                 dam.add_value('link', starter_json['horse']['pedigree']['mother']['id'])
                 dam.add_value('sex', 'mare')
                 dam.add_value('country', starter_json['horse']['pedigree']['mother'].get('nationality', 'SE'))
 
-                dam_sire = ItemLoader(item = HorseItem())
+                dam_sire = FastLoader(HorseItem)
 
                 dam_sire.add_value('name', starter_json['horse']['pedigree']['grandfather']['name'])
                 dam_sire.add_value('link', starter_json['horse']['pedigree']['grandfather']['id'])
@@ -199,41 +185,34 @@ class ResultCollector(Spider):
 
             race.add_value('purse', race_purse)
 
-            raceday['races'][race.get_output_value('racenumber')] = race
+            races[race.get_output_value('racenumber')] = race
 
-        # if races has been added to all racedays, head over to ST to get
-        # ids, qualifiers and premium races
-        if all(bool(x['races']) for x in response.meta['racedays']):
-            yield JsonRequest(
-                url=CALENDAR_URL_ST.format(self.start_date, self.end_date, self.end_date),
-                callback=self.parse_calendar_st,
-                meta={'racedays': response.meta['racedays']})
+        # head over to ST to get ids, qualifiers and premium races, several
+        # racedays can share the same date so the calendar is not filtered
+        racedate = raceday.get_output_value('date')
 
-        else:
-            url = [x['url'] for x in response.meta['racedays'] if not bool(x['races'])][0]
-            yield JsonRequest(url=url,
-                              callback=self.parse_raceday_atg,
-                              meta = {'racedays': response.meta['racedays']})
+        yield JsonRequest(
+            url=CALENDAR_URL_ST.format(racedate, racedate, racedate),
+            callback=self.parse_calendar_st,
+            cb_kwargs=dict(raceday=raceday),
+            meta={'races': races},
+            dont_filter=True)
 
 
-    def parse_calendar_st(self, response):
+    def parse_calendar_st(self, response, raceday):
         response_json = json.loads(response.body)
 
         for raceday_json in response_json:
-            # find the raceday in response.meta['racedays']
-            for raceday_atg in response.meta['racedays']:
-                if (raceday_json['raceDayDate'] == raceday_atg['raceday'].get_output_value('date') and
-                    raceday_json['trackName'] == raceday_atg['raceday'].get_output_value('racetrack')):
-
-                    raceday = raceday_atg['raceday']
+            if (raceday_json['raceDayDate'] == raceday.get_output_value('date') and
+                raceday_json['trackName'] == raceday.get_output_value('racetrack')):
 
-                    raceday.add_value('link', raceday_json['raceDayId'])
+                raceday.add_value('link', raceday_json['raceDayId'])
 
-                    yield JsonRequest(
-                        url=RESULT_URL_ST.format(raceday_json['raceDayId']),
-                        callback=self.parse_raceday_st,
-                        cb_kwargs=dict(raceday=raceday),
-                        meta={'races': raceday_atg['races']})
+                yield JsonRequest(
+                    url=RESULT_URL_ST.format(raceday_json['raceDayId']),
+                    callback=self.parse_raceday_st,
+                    cb_kwargs=dict(raceday=raceday),
+                    meta={'races': response.meta['races']})
 
 
     def parse_raceday_st(self, response, raceday):
@@ -246,7 +225,7 @@ class ResultCollector(Spider):
                 race.add_value('link', race_json['raceId'])
 
             else:
-                race = ItemLoader(item=RaceItem())
+                race = FastLoader(RaceItem)
 
                 race.add_value('link', race_json['raceId'])
                 race.add_value('racenumber', race_json['generalInfo']['raceNumber'])
@@ -261,7 +240,7 @@ class ResultCollector(Spider):
                 race_purse = 0
 
                 for starter_json in race_json.get('raceResultRows', []):
-                    starter = ItemLoader(item=RaceStarterItem())
+                    starter = FastLoader(RaceStarterItem)
 
                     starter.add_value('order', order)
                     starter.add_value('driver', starter_json['driver']['name'])
@@ -293,7 +272,7 @@ class ResultCollector(Spider):
                     else:
                         starter.add_value('approved', starter_json['placementDisplay'])
 
-                    horse = ItemLoader(item=HorseItem())
+                    horse = FastLoader(HorseItem)
 
                     horse.add_value('name', starter_json['horse']['name'])
                     horse.add_value('country', starter_json['horse']['name'])
@@ -309,13 +288,13 @@ class ResultCollector(Spider):
                     race.add_value('purse', race_purse)
 
                 for non_starter_json in race_json.get('withdrawnHorses', []):
-                    starter = ItemLoader(item=RaceStarterItem())
+                    starter = FastLoader(RaceStarterItem)
 
                     starter.add_value('startnumber', non_starter_json['programNumber'])
                     starter.add_value('started', False)
                     starter.add_value('order', order)
 
-                    horse = ItemLoader(item=HorseItem())
+                    horse = FastLoader(HorseItem)
 
                     horse.add_value('name', non_starter_json['name'])
                     horse.add_value('country', non_starter_json['name'])
@@ -1,13 +1,12 @@
 from scrapy.spiders import Spider
 from scrapy.http import JsonRequest
-from scrapy.loader import ItemLoader
 from sweden.items import RacedayItem, RaceItem, RaceStarterItem, HorseItem
+from standardbred.itemfactory import FastLoader
+from standardbred.collected import CollectedIndex
 
 from datetime import date, timedelta
 import json
-import os
 
-JSON_DIRECTORY = '/home/youreakim/dokument/hastar/standardbred/json/scrapy/sweden'
 
 BASE_URL = 'https://api.travsport.se/webapi/raceinfo'
 CALENDAR_URL = BASE_URL + '/organisation/TROT/sourceofdata/BOTH?fromracedate={}&tosubmissiondate={}&toracedate={}'
@@ -28,6 +27,8 @@ class StartlistCollector(Spider):
 
 
     def start_requests(self):
+        self.collected = CollectedIndex.from_crawler(self.crawler)
+
         yield JsonRequest(
             url=CALENDAR_URL.format(self.start_date, self.end_date, self.end_date),
             callback=self.parse)
@@ -40,10 +41,8 @@ class StartlistCollector(Spider):
             filename = '_'.join([raceday_json['raceDayDate'].replace('-', '_'),
                                 raceday_json['trackName'].lower()]) + '.json'
 
-            outfile = os.path.join(JSON_DIRECTORY, 'startlist', filename)
-
-            if raceday_json['hasNewStartList'] and not os.path.exists(outfile):
-                raceday = ItemLoader(item=RacedayItem())
+            if raceday_json['hasNewStartList'] and not self.collected.contains('startlist', filename):
+                raceday = FastLoader(RacedayItem)
 
                 raceday.add_value('date', raceday_json['raceDayDate'])
                 raceday.add_value('racetrack', raceday_json['trackName'])
@@ -60,7 +59,7 @@ class StartlistCollector(Spider):
         response_json = json.loads(response.body)
 
         for race_json in response_json['raceList']:
-            race = ItemLoader(item=RaceItem())
+            race = FastLoader(RaceItem)
 
             race.add_value('link', race_json['raceId'])
             race.add_value('racenumber', race_json['raceNumber'])
@@ -71,7 +70,7 @@ class StartlistCollector(Spider):
             race.add_value('monte', [x['text'] for x in race_json['propTexts'] if x['typ'] == 'T'][0])
 
             for starter_json in race_json['horses']:
-                starter = ItemLoader(item=RaceStarterItem())
+                starter = FastLoader(RaceStarterItem)
 
                 starter.add_value('driver', starter_json['driver']['name'])
                 starter.add_value('trainer', starter_json['trainer']['name'])
@@ -80,7 +79,7 @@ class StartlistCollector(Spider):
                 starter.add_value('distance', starter_json['actualDistance'])
                 starter.add_value('started', not starter_json['horseWithdrawn'])
 
-                horse = ItemLoader(item=HorseItem())
+                horse = FastLoader(HorseItem)
 
                 horse.add_value('link', starter_json['id'])
                 horse.add_value('name', starter_json['name'])
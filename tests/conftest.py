@@ -0,0 +1,16 @@
+"""
+The countries are separate Scrapy projects, every project directory is put on
+the path the way 'scrapy' does it in the directory of the project, so the
+tests can import belgium.pipelines, sweden.httpcache and so on.
+"""
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COUNTRIES = ['belgium', 'denmark', 'finland', 'france', 'germany', 'holland', 'norway', 'spain', 'sweden']
+
+for directory in [ROOT] + [os.path.join(ROOT, x) for x in COUNTRIES]:
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
@@ -0,0 +1,177 @@
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+from scrapy.spiders import Spider
+
+from standardbred import assembly
+
+
+def build(results):
+    return {'results': results}
+
+
+def response_for(meta):
+    return Response('https://example.com/race', request=Request('https://example.com/race', meta=meta))
+
+
+def test_builds_when_every_part_has_arrived():
+    parts = assembly.Assembly(['b', 'a'], build)
+
+    assert parts.add('a', 1) == []
+    assert parts.add('b', 2) == [{'results': [1, 2]}]
+
+
+def test_drops_the_item_when_a_part_failed():
+    parts = assembly.Assembly(['a', 'b'], build)
+
+    assert parts.add('a', 1) == []
+    assert parts.fail('b') == []
+    assert parts.done
+
+
+def test_partial_item_without_the_failed_parts():
+    parts = assembly.Assembly(['a', 'b'], build, allow_partial=True)
+
+    assert parts.fail('b') == []
+    assert parts.add('a', 1) == [{'results': [1]}]
+
+
+def test_empty_part_list_finishes_right_away():
+    parts = assembly.Assembly([], build)
+
+    assert parts.start() == [{'results': []}]
+    assert parts.start() == []
+
+
+def test_start_waits_for_the_parts():
+    parts = assembly.Assembly(['a'], build)
+
+    assert parts.start() == []
+    assert parts.add('a', 1) == [{'results': [1]}]
+
+
+def test_a_part_is_only_counted_once():
+    parts = assembly.Assembly(['a', 'b'], build)
+
+    assert parts.add('a', 1) == []
+    assert parts.add('a', 1) == []
+    assert parts.fail('a') == []
+    assert parts.add('b', 2) == [{'results': [1, 2]}]
+    assert parts.add('b', 2) == []
+
+
+def test_every_part_gets_the_whole_timeout_to_download():
+    parts = assembly.Assembly(['a', 'b'], build, timeout=10)
+
+    assert parts.meta('a')['download_timeout'] == 10
+    assert parts.meta('b')['download_timeout'] == 10
+
+
+def test_build_can_return_several_items():
+    parts = assembly.Assembly(['a', 'b'], lambda results: (x * 10 for x in results), allow_partial=True)
+
+    assert parts.add('a', 1) == []
+    assert parts.add('b', 2) == [10, 20]
+
+
+def test_middleware_yields_the_items_one_by_one():
+    parts = assembly.Assembly(['a', 'b'], lambda results: [{'part': x} for x in results], allow_partial=True)
+    spider = Spider('test')
+
+    assert parts.add('a', 1) == []
+    assert list(assembly.AssemblyMiddleware().process_spider_exception(
+        response_for(parts.meta('b')), ValueError(), spider)) == [{'part': 1}]
+
+
+def test_errback_fails_the_part():
+    parts = assembly.Assembly(['a', 'b'], build, allow_partial=True)
+
+    class Failure(object):
+        request = Request('https://example.com/race', meta=parts.meta('a'))
+        value = Exception('timeout')
+
+    assert parts.errback(Failure()) == []
+    assert parts.add('b', 2) == [{'results': [2]}]
+
+
+def test_middleware_fails_the_part_whose_callback_raised():
+    spider = Spider.from_crawler(get_crawler(Spider), 'test')
+    parts = assembly.Assembly(['a', 'b'], build, allow_partial=True)
+    middleware = assembly.AssemblyMiddleware()
+
+    assert list(middleware.process_spider_exception(response_for(parts.meta('a')), ValueError(), spider)) == []
+    assert parts.failed == ['a']
+    assert parts.add('b', 2) == [{'results': [2]}]
+
+    # the part is no longer pending, the exception goes on to Scrapy
+    assert middleware.process_spider_exception(response_for(parts.meta('a')), ValueError(), spider) is None
+
+
+def test_middleware_ignores_other_responses():
+    spider = Spider.from_crawler(get_crawler(Spider), 'test')
+
+    assert assembly.AssemblyMiddleware().process_spider_exception(response_for({}), ValueError(), spider) is None
+
+
+def test_raceday_races_in_racenumber_order():
+    class Loader(object):
+        def __init__(self, values):
+            self.values = values
+
+
+        def get_output_value(self, field):
+            return self.values.get(field)
+
+
+        def add_value(self, field, value):
+            self.values.setdefault(field, []).append(value)
+
+
+        def load_item(self):
+            return self.values
+
+    class Race(Loader):
+        def load_item(self):
+            return self.values['racenumber']
+
+    raceday = assembly.RacedayAssembly(Loader({}), ['x', 'y', 'z'])
+
+    raceday.add('x', Race({'racenumber': '10'}))
+    raceday.add('y', Race({'racenumber': '2'}))
+
+    assert raceday.add('z', Race({'racenumber': '1'})) == [{'races': ['1', '2', '10']}]
+
+
+def test_dropped_is_called_once_by_the_part_that_finished():
+    calls = []
+
+    def dropped(failed):
+        calls.append(failed)
+        return ['retry']
+
+    parts = assembly.Assembly(['a', 'b', 'c'], build, dropped=dropped)
+
+    assert parts.fail('a') == []
+    assert parts.add('b', 2) == []
+    assert calls == []
+
+    # the part that failed was not the last one
+    assert parts.add('c', 3) == ['retry']
+    assert calls == [['a']]
+
+    assert parts.fail('c') == []
+    assert calls == [['a']]
+
+
+def test_dropped_is_not_called_for_a_complete_item():
+    parts = assembly.Assembly(['a'], build, dropped=lambda failed: ['retry'])
+
+    assert parts.add('a', 1) == [{'results': [1]}]
+
+
+def test_middleware_returns_what_dropped_returns():
+    parts = assembly.Assembly(['a', 'b'], build, dropped=lambda failed: ['retry'])
+    spider = Spider('test')
+
+    assert parts.add('a', 1) == []
+    assert list(assembly.AssemblyMiddleware().process_spider_exception(
+        response_for(parts.meta('b')), ValueError(), spider)) == ['retry']
@@ -0,0 +1,35 @@
+from standardbred.collected import CollectedIndex, collected_key
+
+import os
+
+
+def test_collected_key():
+    assert collected_key('/json/result/2020_01_01_solvalla.json') == '2020_01_01_solvalla'
+    assert collected_key('123.json') == '123'
+
+
+def test_countries_are_kept_apart(tmp_path):
+    path = str(tmp_path / 'collected.sqlite')
+
+    sweden = CollectedIndex(path, 'sweden')
+    sweden.add('horses', '1.json')
+
+    assert sweden.contains('horses', '1.json')
+    assert not CollectedIndex(path, 'norway').contains('horses', '1.json')
+
+
+def test_rebuild_from_json_files_segments_and_registry(tmp_path):
+    os.makedirs(tmp_path / 'json' / 'result')
+    os.makedirs(tmp_path / 'json' / 'horses')
+    (tmp_path / 'json' / 'result' / '2020_01_01_solvalla.json').write_text('{}')
+    (tmp_path / 'json' / 'horses' / 'sweden-0001.index').write_text('2\t0\t10\n')
+
+    index = CollectedIndex(str(tmp_path / 'collected.sqlite'), 'sweden')
+    index.add('horses', '99.json')
+
+    assert index.rebuild(str(tmp_path / 'json'), horses=['3']) == 3
+
+    assert index.contains('result', '2020_01_01_solvalla.json')
+    assert index.contains('horses', '2.json')
+    assert index.contains('horses', '3.json')
+    assert not index.contains('horses', '99.json')
@@ -0,0 +1,180 @@
+from standardbred import database
+from standardbred.database import Batch, Database, DBPipeline
+
+from scrapy import signals
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+import json
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    db = Database(sqlite3.connect(':memory:'))
+    db.create_tables()
+
+    yield db
+
+    db.close()
+
+
+def rows(db, table):
+    cursor = db.connection.execute(f'SELECT * FROM {table} ORDER BY 1, 2, 3')
+    columns = [x[0] for x in cursor.description]
+
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def write(db, *horses, organisation='sweden'):
+    batch = Batch(organisation)
+
+    for horse in horses:
+        batch.add(horse)
+
+    db.write(batch)
+
+
+def test_inserts_horse_with_pedigree_starts_and_summaries(db):
+    write(db, {
+        'link': 1,
+        'name': 'Horse',
+        'sex': 'mare',
+        'sire': {'link': 2, 'name': 'Sire', 'sire': {'link': 4, 'name': 'Grandsire'}},
+        'dam': {'link': 3, 'name': 'Dam'},
+        'offspring': [{'link': 5, 'name': 'Foal', 'sire': {'link': 6, 'name': 'Foal Sire'}}],
+        'starts': [{'race_date': '2020-01-01', 'racetrack_code': 'S', 'racenumber': 4, 'finish': 1}],
+        'start_summary': {'starts': 10, 'wins': 2}
+    })
+
+    assert [x['link'] for x in rows(db, 'horses')] == ['1', '2', '3', '4', '5', '6']
+
+    assert [(x['link'], x['parent'], x['parent_link']) for x in rows(db, 'pedigree')] == [
+        ('1', 'dam', '3'), ('1', 'sire', '2'), ('2', 'sire', '4'), ('5', 'dam', '1'), ('5', 'sire', '6')
+    ]
+
+    start, = rows(db, 'starts')
+    assert (start['racedate'], start['racetrack'], start['racenumber']) == ('2020-01-01', 'S', '4')
+    assert json.loads(start['data'])['finish'] == 1
+
+    summary, = rows(db, 'summaries')
+    assert summary['year'] == '0'
+    assert json.loads(summary['data']) == {'starts': 10, 'wins': 2}
+
+
+def test_upsert_updates_and_keeps_what_is_not_given(db):
+    write(db, {'link': 1, 'name': 'Horse', 'country': 'SE', 'birthdate': '2010-05-01'})
+    write(db, {'link': 1, 'name': 'Horse (SE)', 'country': None, 'registration': 'S-123'})
+
+    horse, = rows(db, 'horses')
+
+    assert horse['name'] == 'Horse (SE)'
+    assert horse['country'] == 'SE'
+    assert horse['birthdate'] == '2010-05-01'
+    assert horse['registration'] == 'S-123'
+
+
+def test_ancestor_does_not_overwrite_collected_horse_with_none(db):
+    write(db, {'link': 2, 'name': 'Sire', 'birthdate': '2000-01-01', 'country': 'US'})
+    write(db, {'link': 1, 'name': 'Horse', 'sire': {'link': 2, 'name': 'Sire'}})
+
+    sire = [x for x in rows(db, 'horses') if x['link'] == '2'][0]
+
+    assert sire['birthdate'] == '2000-01-01'
+    assert sire['country'] == 'US'
+
+
+def test_same_row_twice_in_a_batch_is_merged(db):
+    write(db, {'link': 1, 'name': 'Horse', 'country': 'SE'},
+              {'link': 1, 'name': 'Horse', 'birthdate': '2010-05-01'})
+
+    horse, = rows(db, 'horses')
+
+    assert (horse['country'], horse['birthdate']) == ('SE', '2010-05-01')
+
+
+def test_rows_are_kept_apart_by_organisation(db):
+    write(db, {'link': 1, 'name': 'Swedish'}, organisation='sweden')
+    write(db, {'link': 1, 'name': 'Norwegian'}, organisation='norway')
+
+    assert [(x['organisation'], x['name']) for x in rows(db, 'horses')] == [('norway', 'Norwegian'),
+                                                                              ('sweden', 'Swedish')]
+
+
+def test_summaries_per_year_are_upserted(db):
+    write(db, {'link': 1, 'start_summary': [{'year': 2019, 'starts': 1}, {'year': 2020, 'starts': 2}]})
+    write(db, {'link': 1, 'start_summary': [{'year': 2020, 'starts': 5}]})
+
+    assert [(x['year'], json.loads(x['data'])['starts']) for x in rows(db, 'summaries')] == [('2019', 1),
+                                                                                              ('2020', 5)]
+
+
+def test_batch_larger_than_one_statement(db, monkeypatch):
+    monkeypatch.setattr(database, 'MAX_VARIABLES', 30)
+
+    write(db, *[{'link': x, 'name': f'Horse {x}'} for x in range(50)])
+
+    assert len(rows(db, 'horses')) == 50
+
+
+def test_failed_batch_is_rolled_back(db):
+    write(db, {'link': 1, 'name': 'Horse'})
+
+    batch = Batch('sweden')
+    batch.add({'link': 2, 'name': 'Other'})
+    # a value sqlite can not store
+    batch.add({'link': 3, 'name': object()})
+
+    with pytest.raises(sqlite3.Error):
+        db.write(batch)
+
+    assert [x['link'] for x in rows(db, 'horses')] == ['1']
+
+
+def test_connect_sqlite_uri(tmp_path):
+    db = Database.from_uri(f'sqlite:///{tmp_path}/horses.sqlite')
+    db.create_tables()
+    write(db, {'link': 1, 'name': 'Horse'})
+    db.close()
+
+    assert sqlite3.connect(tmp_path / 'horses.sqlite').execute('SELECT name FROM horses').fetchall() == [('Horse',)]
+
+
+def test_items_of_the_same_horse_are_merged():
+    batch = Batch('sweden')
+    batch.add({'link': 1, 'name': 'Mare', 'offspring': [{'link': 2}, {'link': 3}]})
+    batch.add({'link': 4, 'name': 'Other'})
+    batch.add({'link': 1, 'name': None, 'sex': 'mare', 'offspring': [{'link': 3}, {'link': 5}]})
+
+    assert batch.merged() == [
+        {'link': 1, 'name': 'Mare', 'sex': 'mare', 'offspring': [{'link': 2}, {'link': 3}, {'link': 5}]},
+        {'link': 4, 'name': 'Other'}
+    ]
+
+
+def test_failed_batch_is_the_finish_reason():
+    crawler = get_crawler(Spider, {'BOT_NAME': 'sweden', 'DB_SCHEMA': 'tables', 'DB_URI': 'sqlite://'})
+    crawler.stats = MemoryStatsCollector(crawler)
+    spider = crawler._create_spider('test')
+
+    pipeline = DBPipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+
+    try:
+        pipeline.writer.pending += 1
+        pipeline.writer.finished(Failure(sqlite3.OperationalError('database is locked')), 'database', Deferred())
+
+        crawler.stats.set_value('finish_reason', 'finished')
+        crawler.signals.send_catch_log(signal=signals.spider_closed, spider=spider, reason='finished')
+
+        assert crawler.stats.get_value('finish_reason') == 'write_failed'
+    finally:
+        pipeline.timer.stop()
+        pipeline.writer.stop()
+        pipeline.db.close()
@@ -0,0 +1,137 @@
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from sweden import httpcache
+from sweden.httpcache import EndpointCacheMiddleware, EndpointPolicy, endpoint_for
+from sweden.settings import HTTPCACHE_ENDPOINT_TTLS
+
+from time import time
+
+
+TTLS = HTTPCACHE_ENDPOINT_TTLS
+HORSE = 'https://api.travsport.se/webapi/horses/{}/organisation/TROT/sourceofdata/SPORT/horseid/123'
+PEDIGREE = HORSE.format('pedigree')
+RESULTS = HORSE.format('results')
+RACEDAY = 'https://api.travsport.se/webapi/raceinfo/results/organisation/TROT/sourceofdata/SPORT/racedayid/123'
+
+
+def test_horse_endpoints():
+    url = 'https://api.travsport.se/webapi/horses/{}/organisation/TROT/sourceofdata/SPORT/horseid/123'
+
+    assert endpoint_for(url.format('results'), HTTPCACHE_ENDPOINT_TTLS) == 'results'
+    assert endpoint_for(url.format('pedigree'), HTTPCACHE_ENDPOINT_TTLS) == 'pedigree'
+    assert endpoint_for(url.format('pedigree/description'), HTTPCACHE_ENDPOINT_TTLS) == 'pedigree/description'
+
+
+def test_raceday_results_are_not_cached():
+    url = 'https://api.travsport.se/webapi/raceinfo/results/organisation/TROT/sourceofdata/SPORT/racedayid/123'
+
+    assert endpoint_for(url, HTTPCACHE_ENDPOINT_TTLS) is None
+
+
+def crawler(tmp_path):
+    crawler = get_crawler(Spider, {
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_DIR': str(tmp_path),
+        'HTTPCACHE_POLICY': 'sweden.httpcache.EndpointPolicy',
+        'HTTPCACHE_STORAGE': 'sweden.httpcache.CompressedDbmCacheStorage',
+        'HTTPCACHE_ENDPOINT_TTLS': TTLS,
+    })
+    crawler.stats = MemoryStatsCollector(crawler)
+    crawler.spider = crawler._create_spider('horsecollector')
+
+    return crawler
+
+
+def test_only_the_horse_endpoints_are_cached():
+    policy = EndpointPolicy(Settings({'HTTPCACHE_ENDPOINT_TTLS': TTLS}))
+
+    assert policy.should_cache_request(Request(PEDIGREE))
+    assert not policy.should_cache_request(Request(PEDIGREE, method='POST'))
+    assert not policy.should_cache_request(Request(RACEDAY))
+
+
+def test_fresh_for_the_ttl_of_the_endpoint_from_when_it_was_stored():
+    policy = EndpointPolicy(Settings({'HTTPCACHE_ENDPOINT_TTLS': TTLS}))
+    cached = Response(PEDIGREE, headers={'ETag': '"1"', 'Last-Modified': 'Mon, 01 Jun 2020 00:00:00 GMT'})
+
+    fresh = Request(PEDIGREE, meta={'cache_timestamp': time() - TTLS['pedigree'] + 60})
+
+    assert policy.is_cached_response_fresh(cached, fresh)
+    assert b'If-None-Match' not in fresh.headers
+
+    stale = Request(PEDIGREE, meta={'cache_timestamp': time() - TTLS['pedigree'] - 60})
+
+    assert not policy.is_cached_response_fresh(cached, stale)
+    assert stale.headers['If-None-Match'] == b'"1"'
+    assert stale.headers['If-Modified-Since'] == b'Mon, 01 Jun 2020 00:00:00 GMT'
+
+
+def test_results_are_stale_before_the_pedigree():
+    policy = EndpointPolicy(Settings({'HTTPCACHE_ENDPOINT_TTLS': TTLS}))
+    stored = time() - TTLS['results'] - 60
+
+    assert not policy.is_cached_response_fresh(Response(RESULTS), Request(RESULTS, meta={'cache_timestamp': stored}))
+    assert policy.is_cached_response_fresh(Response(PEDIGREE), Request(PEDIGREE, meta={'cache_timestamp': stored}))
+
+
+def test_stale_response_is_revalidated(tmp_path, monkeypatch):
+    c = crawler(tmp_path)
+    middleware = EndpointCacheMiddleware.from_crawler(c)
+    middleware.spider_opened(c.spider)
+
+    try:
+        request = Request(PEDIGREE)
+        assert middleware.process_request(request) is None
+        middleware.process_response(request, Response(PEDIGREE, body=b'{"sire": 1}', headers={'ETag': '"1"'}))
+
+        cached = middleware.process_request(Request(PEDIGREE))
+        assert cached.body == b'{"sire": 1}'
+        assert 'cached' in cached.flags
+
+        # a day after the ttl of the pedigree
+        later = time() + TTLS['pedigree'] + 24 * 3600
+        monkeypatch.setattr(httpcache, 'time', lambda: later)
+
+        request = Request(PEDIGREE)
+        assert middleware.process_request(request) is None
+        assert request.headers['If-None-Match'] == b'"1"'
+
+        revalidated = middleware.process_response(request, Response(PEDIGREE, status=304))
+        assert revalidated.body == b'{"sire": 1}'
+
+        # fresh again from the revalidation
+        assert middleware.process_request(Request(PEDIGREE)).body == b'{"sire": 1}'
+
+        assert c.stats.get_value('httpcache/pedigree/miss') == 1
+        assert c.stats.get_value('httpcache/pedigree/hit') == 2
+        assert c.stats.get_value('httpcache/pedigree/stale') == 1
+        assert c.stats.get_value('httpcache/pedigree/revalidated') == 1
+    finally:
+        middleware.spider_closed(c.spider)
+
+
+def test_changed_response_replaces_the_cached_one(tmp_path, monkeypatch):
+    c = crawler(tmp_path)
+    middleware = EndpointCacheMiddleware.from_crawler(c)
+    middleware.spider_opened(c.spider)
+
+    try:
+        request = Request(RESULTS)
+        middleware.process_request(request)
+        middleware.process_response(request, Response(RESULTS, body=b'[1]', headers={'ETag': '"1"'}))
+
+        later = time() + TTLS['results'] + 60
+        monkeypatch.setattr(httpcache, 'time', lambda: later)
+
+        request = Request(RESULTS)
+        middleware.process_request(request)
+        assert middleware.process_response(request, Response(RESULTS, body=b'[1, 2]')).body == b'[1, 2]'
+
+        assert middleware.process_request(Request(RESULTS)).body == b'[1, 2]'
+        assert c.stats.get_value('httpcache/results/revalidated') is None
+    finally:
+        middleware.spider_closed(c.spider)
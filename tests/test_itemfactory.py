@@ -0,0 +1,74 @@
+from scrapy.loader import ItemLoader
+
+from standardbred.itemfactory import FastLoader
+
+import importlib
+import inspect
+
+import pytest
+import scrapy
+
+
+COUNTRIES = ['belgium', 'norway', 'sweden']
+
+# values like the ones the spiders load from the APIs, and some that the
+# processors of a field do not expect
+VALUES = [None, '', 'Horse', 'Horse (SE)', ' Horse* ', 'S', 'H', 'V', 'mare', 'stallion', '2010-05-01', '2010',
+          '1.15,5', '15,5', '1 234 kr', 0, 1, 1155, 74.5, True, False, [1, 2], ['a', ''], {'name': 'Sire'}]
+
+
+def item_classes(country):
+    items = importlib.import_module(f'{country}.items')
+
+    return [x for _, x in inspect.getmembers(items, inspect.isclass)
+            if issubclass(x, scrapy.Item) and x.__module__ == items.__name__]
+
+
+def fields():
+    for country in COUNTRIES:
+        for item_class in item_classes(country):
+            for field in item_class.fields:
+                yield pytest.param(country, item_class, field, id=f'{country}-{item_class.__name__}-{field}')
+
+
+def load(loader, field, values):
+    """
+    The item and the output value of field after values are added one at a
+    time, or 'error' when a processor raised. ItemLoader wraps what the
+    processor raised in a ValueError, FastLoader does not.
+    """
+    try:
+        for value in values:
+            loader.add_value(field, value)
+
+        return dict(loader.load_item()), loader.get_output_value(field)
+
+    except Exception:
+        return 'error'
+
+
+@pytest.mark.parametrize('country, item_class, field', list(fields()))
+def test_same_item_as_item_loader(country, item_class, field):
+    for value in VALUES:
+        assert load(FastLoader(item_class), field, [value]) == load(ItemLoader(item=item_class()), field, [value]), \
+            value
+
+    for first, second in zip(VALUES, VALUES[1:] + VALUES[:1]):
+        assert load(FastLoader(item_class), field, [first, second]) == \
+            load(ItemLoader(item=item_class()), field, [first, second]), (first, second)
+
+
+@pytest.mark.parametrize('country', COUNTRIES)
+def test_replace_value(country):
+    HorseItem = importlib.import_module(f'{country}.items').HorseItem
+
+    fast = FastLoader(HorseItem)
+    loader = ItemLoader(item=HorseItem())
+
+    for horse in (fast, loader):
+        horse.add_value('name', 'Horse')
+        horse.add_value('link', '1')
+        horse.get_output_value('name')
+        horse.replace_value('name', 'Other')
+
+    assert dict(fast.load_item()) == dict(loader.load_item())
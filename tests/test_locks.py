@@ -0,0 +1,30 @@
+from standardbred.locks import FileLock
+
+import threading
+
+
+def test_second_writer_waits(tmp_path):
+    path = str(tmp_path / 'registry.sqlite')
+    acquired = threading.Event()
+    order = []
+
+    def write():
+        with FileLock(path):
+            acquired.set()
+            order.append('second')
+
+    with FileLock(path):
+        thread = threading.Thread(target=write)
+        thread.start()
+
+        assert not acquired.wait(0.2)
+        order.append('first')
+
+    thread.join(5)
+
+    assert order == ['first', 'second']
+
+
+def test_database_in_memory_is_not_locked():
+    with FileLock(':memory:'), FileLock(':memory:'):
+        pass
@@ -0,0 +1,56 @@
+from standardbred.pedigree import build_pedigree, farthest_first, parent_positions, BREADTH_FIRST, DEPTH_FIRST
+
+import pytest
+
+
+def names(horse):
+    """
+    The tree as nested (name, sire, dam) tuples.
+    """
+    if horse is None:
+        return None
+
+    return (horse['name'], names(horse.get('sire')), names(horse.get('dam')))
+
+
+TREE = ('horse',
+        ('s', ('ss', None, None), ('sd', None, None)),
+        ('d', ('ds', None, None), ('dd', None, None)))
+
+
+def build(order, ancestors):
+    horse = {'name': 'horse'}
+
+    build_pedigree(horse, [None if x is None else {'name': x} for x in ancestors], order)
+
+    return names(horse)
+
+
+def test_breadth_first():
+    assert build(BREADTH_FIRST, ['s', 'd', 'ss', 'sd', 'ds', 'dd']) == TREE
+
+
+def test_depth_first():
+    assert build(DEPTH_FIRST, ['s', 'ss', 'sd', 'd', 'ds', 'dd']) == TREE
+
+
+def test_farthest_first():
+    horse = {'name': 'horse'}
+
+    build_pedigree(horse, farthest_first([{'name': x} for x in ['ss', 'sd', 'ds', 'dd', 's', 'd']]))
+
+    assert names(horse) == TREE
+
+
+def test_missing_ancestor_is_left_out():
+    assert build(BREADTH_FIRST, ['s', 'd', 'ss', None, None, 'dd']) == \
+        ('horse', ('s', ('ss', None, None), None), ('d', None, ('dd', None, None)))
+
+
+def test_four_generations_are_thirty_ancestors():
+    parents, _ = parent_positions(30, DEPTH_FIRST)
+
+    assert len([x for x in parents if x == (None, None)]) == 16
+
+    with pytest.raises(ValueError):
+        parent_positions(31, DEPTH_FIRST)
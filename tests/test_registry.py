@@ -0,0 +1,56 @@
+from scrapy.settings import Settings
+
+from standardbred.identity import IdentityIndex
+from standardbred.registry import Registry, CACHE_SIZE
+
+
+def norway_key(horse):
+    return horse['registration'].replace(' ', '_') if horse.get('registration') else None
+
+
+def test_tree_is_the_horse_as_collected(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.sqlite'), 'sweden')
+    registry.add({'link': '1', 'name': 'A', 'sire': {'link': '2', 'name': 'B'},
+                  'offspring': [{'link': '3', 'name': 'C'}]})
+
+    assert registry.get('2') == {'link': '2', 'name': 'B'}
+    assert registry.tree('1') == {'link': '1', 'name': 'A', 'sire': {'link': '2', 'name': 'B'},
+                                  'offspring': [{'link': '3', 'name': 'C'}]}
+    assert registry.collected_keys() == ['1']
+
+
+def test_horses_are_keyed_by_the_key_function(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.sqlite'), 'norway', norway_key)
+    registry.add({'registration': 'N 1', 'name': 'A', 'dam': {'registration': 'N 2', 'name': 'B'}})
+
+    assert registry.collected_keys() == ['N_1']
+    assert registry.tree('N_1')['dam'] == {'registration': 'N 2', 'name': 'B'}
+
+
+def test_key_function_from_the_settings(tmp_path):
+    settings = Settings({'REGISTRY_PATH': str(tmp_path / 'registry.sqlite'),
+                         'IDENTITY_INDEX': str(tmp_path / 'identity.sqlite'),
+                         'BOT_NAME': 'norway',
+                         'REGISTRY_HORSE_KEY': 'norway.pipelines.horse_key'})
+
+    assert Registry.from_settings(settings).horse_key({'registration': 'N 1'}) == 'N_1'
+    assert IdentityIndex.from_settings(settings).horse_key({'registration': 'N 1'}) == 'N_1'
+
+    settings.set('REGISTRY_HORSE_KEY', None)
+
+    assert Registry.from_settings(settings).horse_key({'link': '1'}) == '1'
+
+
+def test_stored_horses_are_cached_by_key(tmp_path):
+    registry = Registry(str(tmp_path / 'registry.sqlite'), 'sweden')
+
+    for link in range(CACHE_SIZE + 10):
+        registry.add({'link': str(link), 'sire': {'link': 'famous'}})
+
+    assert len(registry.parsed) <= CACHE_SIZE
+
+    registry.add({'link': '1', 'sire': {'link': 'famous', 'name': 'Famous'}})
+    registry.add({'link': '2', 'sire': {'link': 'famous'}})
+
+    assert registry.get('famous') == {'link': 'famous', 'name': 'Famous'}
+    assert registry.parsed[('sweden', 'famous')][1] == {'link': 'famous', 'name': 'Famous'}
@@ -0,0 +1,33 @@
+from standardbred.commands.reparse import split_arguments
+
+from crawl import ROOT, country_settings
+
+import os
+
+
+def test_date_range_is_split_in_windows_when_days_are_given():
+    crawls = list(split_arguments({'start_date': '2020-01-01', 'end_date': '2020-01-10'}, 7))
+
+    assert crawls == [{'start_date': '2020-01-01', 'end_date': '2020-01-07'},
+                      {'start_date': '2020-01-08', 'end_date': '2020-01-10'}]
+
+
+def test_date_range_is_one_crawl_without_days():
+    arguments = {'start_date': '2020-01-01', 'end_date': '2020-03-31'}
+
+    assert list(split_arguments(arguments, None)) == [arguments]
+
+
+def test_start_ids_are_split():
+    assert list(split_arguments({'start_id': '1,2'}, None)) == [{'start_id': '1'}, {'start_id': '2'}]
+
+
+def test_directories_are_in_the_project_of_the_country():
+    france = country_settings('france')
+    sweden = country_settings('sweden')
+
+    assert france.get('REPLAY_DIRECTORY') == os.path.join(ROOT, 'france', 'replay')
+    assert sweden.get('REPLAY_DIRECTORY') == os.path.join(ROOT, 'sweden', 'replay')
+    assert sweden.get('FRONTIER_DIRECTORY') == os.path.join(ROOT, 'sweden', 'frontier')
+    assert sweden.get('FIXTURES_DIRECTORY') == os.path.join(ROOT, 'sweden', 'fixtures')
+    assert sweden.get('HTTPCACHE_DIR') == os.path.join(ROOT, 'sweden', '.scrapy', 'httpcache')
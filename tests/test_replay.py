@@ -0,0 +1,112 @@
+from standardbred.replay import ReplayMiddleware, ResponseArchive
+from sweden.settings import DOWNLOADER_MIDDLEWARES, REPLAY_MODE
+
+from scrapy.downloadermiddlewares.httpcompression import HttpCompressionMiddleware
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+import gzip
+import json
+
+import pytest
+
+
+BODY = json.dumps({'horseId': 123, 'name': 'Horse'}).encode()
+
+COMPRESSION = 'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware'
+ARCHIVE = 'standardbred.replay.ReplayMiddleware'
+
+
+@pytest.fixture
+def spider():
+    crawler = get_crawler(Spider)
+    crawler.stats = MemoryStatsCollector(crawler)
+
+    return crawler._create_spider('horsecollector')
+
+
+def download(spider, directory, mode, request, response):
+    """
+    The response as the spider gets it, through HttpCompressionMiddleware and
+    the archive in the order of DOWNLOADER_MIDDLEWARES.
+    """
+    middlewares = {
+        COMPRESSION: HttpCompressionMiddleware.from_crawler(spider.crawler),
+        ARCHIVE: ReplayMiddleware(mode, str(directory), spider.crawler.stats),
+    }
+    middlewares[ARCHIVE].spider_opened(spider)
+
+    try:
+        for name in sorted(middlewares, key=DOWNLOADER_MIDDLEWARES.get):
+            replayed = middlewares[name].process_request(request)
+
+            if replayed is not None:
+                response = replayed
+                break
+
+        for name in sorted(middlewares, key=DOWNLOADER_MIDDLEWARES.get, reverse=True):
+            response = middlewares[name].process_response(request, response)
+
+    finally:
+        middlewares[ARCHIVE].spider_closed(spider)
+
+    return response
+
+
+def test_gzipped_response_is_recorded_and_replayed_decompressed(spider, tmp_path):
+    request = Request('https://api.travsport.se/webapi/horses/basicinformation/organisation/TROT/horseid/123')
+    response = Response(request.url, request=request, body=gzip.compress(BODY),
+                        headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+
+    recorded = download(spider, tmp_path, 'record', request, response)
+    replayed = download(spider, tmp_path, 'replay', request, None)
+
+    assert recorded.body == BODY
+    assert 'replayed' in replayed.flags
+    assert replayed.body == BODY
+    assert b'Content-Encoding' not in replayed.headers
+    assert json.loads(replayed.text) == json.loads(BODY)
+
+
+def test_archive_knows_the_url_the_spider_asked_for(tmp_path):
+    url = 'https://www.hippos.fi/heppa/racing/RaceResults'
+    splash = Request('http://localhost:8050/execute', method='POST', body=b'{}',
+                     meta={'splash': {'args': {'url': url}}})
+
+    archive = ResponseArchive(str(tmp_path))
+    archive.add(splash, Response(splash.url, body=b'<html></html>'))
+    archive.add(Request(url), Response(url, body=b'<html></html>'))
+    archive.close()
+
+    entries = list(ResponseArchive(str(tmp_path)).entries.values())
+
+    assert [(x['request_url'], x['splash']) for x in entries] == [(url, True), (url, False)]
+
+
+def test_nothing_is_recorded_by_default():
+    crawler = get_crawler(Spider, {'REPLAY_MODE': REPLAY_MODE})
+
+    with pytest.raises(NotConfigured):
+        ReplayMiddleware.from_crawler(crawler)
+
+
+def test_latest_page_for_a_url(tmp_path):
+    url = 'https://www.hippos.fi/heppa/racing/RaceResults'
+    splash = Request('http://localhost:8050/render.html', method='POST', body=b'{}',
+                     meta={'splash': {'args': {'url': url}}})
+
+    archive = ResponseArchive(str(tmp_path))
+    archive.add(Request(url), Response(url, body=b'old'))
+    archive.add(Request(url, method='HEAD'), Response(url, status=404, body=b'missing'))
+    archive.add(Request(url, headers={'Accept': 'text/html'}, body=b'x'), Response(url, body=b'new'))
+    archive.add(splash, Response(splash.url, body=b'rendered'))
+    archive.close()
+
+    archive = ResponseArchive(str(tmp_path))
+
+    assert archive.latest(url, False) == b'new'
+    assert archive.latest(url, True) == b'rendered'
+    assert archive.latest(url + '/other', False) is None
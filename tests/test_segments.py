@@ -0,0 +1,42 @@
+from standardbred.segments import SegmentReader, SegmentWriter
+
+
+def index_keys(directory, kind):
+    return list(SegmentReader(str(directory), 'test').index(kind))
+
+
+def test_keys_are_returned_when_synced(tmp_path):
+    writer = SegmentWriter(str(tmp_path), 'test', fsync_items=3)
+
+    assert writer.write('horses', '1.json', {'link': 1}) == []
+    assert writer.write('horses', '2.json', {'link': 2}) == []
+    assert index_keys(tmp_path, 'horses') == []
+
+    assert writer.write('horses', '3.json', {'link': 3}) == [('horses', '1'), ('horses', '2'), ('horses', '3')]
+    assert index_keys(tmp_path, 'horses') == ['1', '2', '3']
+
+    assert writer.write('horses', '4.json', {'link': 4}) == []
+    assert writer.close() == [('horses', '4')]
+    assert index_keys(tmp_path, 'horses') == ['1', '2', '3', '4']
+
+
+def test_rotated_segment_is_synced_first(tmp_path):
+    writer = SegmentWriter(str(tmp_path), 'test', max_bytes=1, fsync_items=100)
+
+    assert writer.write('result', '2020_01_01_solvalla.json', {'date': '2020-01-01'}) == [('result', '2020_01_01_solvalla')]
+    assert writer.write('result', '2020_01_02_solvalla.json', {'date': '2020-01-02'}) == [('result', '2020_01_02_solvalla')]
+    assert writer.close() == []
+
+    reader = SegmentReader(str(tmp_path), 'test')
+
+    assert [x['date'] for x in reader.items('result')] == ['2020-01-01', '2020-01-02']
+    assert reader.get('result', '2020_01_02_solvalla.json') == {'date': '2020-01-02'}
+
+
+def test_kinds_are_kept_apart(tmp_path):
+    writer = SegmentWriter(str(tmp_path), 'test')
+
+    writer.write('horses', '1.json', {'link': 1})
+    writer.write('startlist', '2020_01_01_solvalla.json', {'date': '2020-01-01'})
+
+    assert sorted(writer.close()) == [('horses', '1'), ('startlist', '2020_01_01_solvalla')]
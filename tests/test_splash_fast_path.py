@@ -0,0 +1,57 @@
+from standardbred.splashfastpath import SplashFastPathMiddleware
+
+from scrapy.http import Request
+from scrapy.selector import Selector
+from scrapy.spiders import Spider as ScrapySpider
+from scrapy.utils.test import get_crawler
+
+import pytest
+
+
+class Spider(object):
+    splash_fast_path = {r'/races/': '//table[@class="races"]'}
+
+
+def splash_request(url, **meta):
+    return Request(url, meta=dict(meta, splash={'endpoint': 'render.html', 'args': {'url': url}}))
+
+
+def test_off_by_default():
+    middleware = SplashFastPathMiddleware(stats=None)
+
+    assert middleware.required_xpath(splash_request('https://example.com/races/1'), Spider()) is None
+
+
+@pytest.mark.parametrize('settings, enabled', [
+    ({}, False),
+    ({'SPLASH_FAST_PATH_ENABLED': True}, True),
+    ({'SPLASH_FAST_PATH_SPIDERS': ['resultcollector']}, True),
+    ({'SPLASH_FAST_PATH_SPIDERS': ['startlistcollector']}, False),
+])
+def test_enabled_for_every_spider_or_for_some(settings, enabled):
+    class ResultCollector(ScrapySpider):
+        name = 'resultcollector'
+
+    assert SplashFastPathMiddleware.from_crawler(get_crawler(ResultCollector, settings)).enabled == enabled
+
+
+def test_xpath_of_the_request_comes_first():
+    middleware = SplashFastPathMiddleware(stats=None, enabled=True)
+
+    assert middleware.required_xpath(splash_request('https://example.com/races/1'), Spider()) == \
+        '//table[@class="races"]'
+    assert middleware.required_xpath(splash_request('https://example.com/races/1', splash_fast_path_xpath='//tr'),
+                                     Spider()) == '//tr'
+    assert middleware.required_xpath(splash_request('https://example.com/other', splash_fast_path_xpath='//tr'),
+                                     Spider()) == '//tr'
+
+
+def test_germany_starter_rows_match_with_and_without_tbody():
+    STARTER_ROWS = pytest.importorskip('germany.spiders.resultcollector', exc_type=ImportError).STARTER_ROWS
+
+    rows = '<tr><td>1</td></tr><tr><td>2</td></tr>'
+    rendered = Selector(text=f'<table class="rbfull"><tbody>{rows}</tbody></table>', type='xml')
+    plain = Selector(text=f'<table class="rbfull">{rows}</table>', type='xml')
+
+    assert rendered.xpath(STARTER_ROWS).xpath('./td/text()').getall() == ['1', '2']
+    assert plain.xpath(STARTER_ROWS).xpath('./td/text()').getall() == ['1', '2']
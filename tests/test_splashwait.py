@@ -0,0 +1,20 @@
+from standardbred.splashwait import lua_script
+
+
+def test_script_gets_the_wait_functions():
+    script = lua_script('''
+        function main(splash)
+            track_requests(splash)
+            return splash:html()
+        end
+    ''', max_wait=5)
+
+    assert script.startswith('MAX_WAIT = 5\n')
+    assert 'function wait_for_idle(splash, timeout)' in script
+    assert script.endswith('\nfunction main(splash)\n    track_requests(splash)\n    return splash:html()\nend\n')
+
+
+def test_failed_request_is_no_longer_waited_for():
+    script = lua_script('')
+
+    assert 'splash:on_request_failed(function(request)\n        request_finished()' in script
@@ -0,0 +1,90 @@
+from standardbred.throttle import AdaptiveThrottle, retry_after
+
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from email.utils import format_datetime
+from types import SimpleNamespace
+import datetime
+
+import pytest
+
+
+HOST = 'www.travsport.se'
+
+
+@pytest.fixture
+def throttle():
+    crawler = get_crawler(Spider, {
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_START_DELAY': 3,
+        'AUTOTHROTTLE_MAX_DELAY': 300,
+        'AUTOTHROTTLE_BACKOFF_FACTOR': 2,
+        'DOWNLOAD_DELAY': 0.5,
+    })
+    crawler.stats = MemoryStatsCollector(crawler)
+    crawler.engine = SimpleNamespace(downloader=SimpleNamespace(slots={HOST: SimpleNamespace(delay=3, transferring=set())}))
+
+    throttle = AdaptiveThrottle.from_crawler(crawler)
+    throttle.spider = crawler._create_spider('test')
+    throttle._spider_opened(throttle.spider)
+
+    return throttle
+
+
+def download(throttle, status, latency=0.2, headers=None):
+    """
+    The delay of the slot after a response, the way Scrapy hands it to the
+    throttle with the response_downloaded signal.
+    """
+    request = Request(f'https://{HOST}/', meta={'download_slot': HOST, 'download_latency': latency})
+    response = Response(request.url, status=status, headers=headers, request=request)
+
+    throttle._response_downloaded(response, request, throttle.spider)
+
+    return throttle.crawler.engine.downloader.slots[HOST].delay
+
+
+def stats(throttle):
+    return {k: v for k, v in throttle.crawler.stats.get_stats().items() if k.startswith('throttle/')}
+
+
+def test_fast_responses_lower_the_delay(throttle):
+    assert download(throttle, 200) == 1.6
+    assert download(throttle, 200) == 0.9
+
+    assert stats(throttle) == {f'throttle/{HOST}/delay': 0.9, f'throttle/{HOST}/rate': 1.111}
+
+
+@pytest.mark.parametrize('status', [429, 500, 502, 503, 504])
+def test_backoff(throttle, status):
+    assert download(throttle, status) == 6
+    assert download(throttle, status) == 12
+
+    assert stats(throttle) == {f'throttle/{HOST}/delay': 12, f'throttle/{HOST}/rate': 0.083,
+                               f'throttle/{HOST}/backoff': 2}
+
+
+def test_not_found_does_not_back_off(throttle):
+    assert download(throttle, 404) == 3
+    assert f'throttle/{HOST}/backoff' not in stats(throttle)
+
+
+def test_retry_after_longer_than_backoff(throttle):
+    assert download(throttle, 429, headers={'Retry-After': '120'}) == 120
+    assert download(throttle, 429, headers={'Retry-After': '1'}) == 240
+
+
+def test_backoff_stops_at_max_delay(throttle):
+    assert download(throttle, 503, headers={'Retry-After': '3600'}) == 300
+
+
+def test_retry_after_date():
+    in_a_minute = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=60)
+    response = Response('https://www.travsport.se/', headers={'Retry-After': format_datetime(in_a_minute)})
+
+    assert 55 < retry_after(response) <= 60
+    assert retry_after(Response('https://www.travsport.se/', headers={'Retry-After': 'soon'})) is None
+    assert retry_after(Response('https://www.travsport.se/')) is None
@@ -0,0 +1,68 @@
+from standardbred.workers import WriterPool, dumps
+
+from scrapy import signals
+from scrapy.spiders import Spider
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+import pytest
+
+
+def crawler(processes):
+    crawler = get_crawler(Spider, {'PIPELINE_PROCESSES': processes})
+    crawler.stats = MemoryStatsCollector(crawler)
+    crawler.spider = crawler._create_spider('test')
+
+    return crawler
+
+
+@pytest.mark.parametrize('failed, reason', [(False, 'finished'), (True, 'write_failed')])
+def test_failed_write_is_the_finish_reason(failed, reason):
+    c = crawler(0)
+    writer = WriterPool.from_crawler(c)
+
+    try:
+        writer.pending += 1
+        writer.finished(Failure(OSError('No space left on device')) if failed else 'written', 'key', Deferred())
+
+        c.stats.set_value('finish_reason', 'finished')
+        c.signals.send_catch_log(signal=signals.spider_closed, spider=c.spider, reason='finished')
+
+        assert c.stats.get_value('finish_reason') == reason
+    finally:
+        writer.stop()
+
+
+def test_dumps_in_a_spawned_process():
+    writer = WriterPool.from_crawler(crawler(1))
+
+    try:
+        assert writer.dumps({'link': 1, 'name': 'Horse'}) == dumps({'link': 1, 'name': 'Horse'})
+    finally:
+        writer.stop()
+
+
+def test_crawlers_share_the_threads_and_processes():
+    first = WriterPool.from_crawler(crawler(0))
+    second = WriterPool.from_crawler(crawler(0))
+
+    try:
+        assert first.threadpool is second.threadpool
+
+        first.pending += 1
+        first.finished(Failure(OSError('No space left on device')), 'key', Deferred())
+
+        assert first.failed == 1
+        assert second.failed == 0
+
+        first.stop()
+
+        assert second.threadpool.started
+    finally:
+        first.stop()
+        second.stop()
+
+    assert not second.threadpool.started